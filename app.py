@@ -1,5 +1,14 @@
 import streamlit as st
-from winter.modules.database import verify_credentials, initialize_database, get_user_id, get_user_points
+import streamlit.components.v1 as components
+from winter.modules.auth import (
+    authenticate, check_session_secret, cookie_script, end_session, restore_session, start_session
+)
+from winter.modules.database import get_user_points
+from winter.modules.debug_panel import render_debug_panel
+from winter.modules.instrumentation import page_run
+from winter.modules.profiler import profiled
+from winter.modules.streaks import ALL, get_user_streaks
+from winter.scripts.bootstrap import bootstrap
 from winter.settings import APP_CONFIG
 
 # Configurar la página
@@ -9,21 +18,28 @@ st.set_page_config(
     layout=APP_CONFIG["layout"]
 )
 
-# Inicializar la base de datos al inicio
-initialize_database()
+# Preparar la base de datos una sola vez por proceso
+bootstrap()
+check_session_secret()
 
-# Gestión de sesión
+# Gestión de sesión: el token va en una cookie, nunca en la URL
 if 'authenticated' not in st.session_state:
     st.session_state['authenticated'] = False
+restore_session(st.session_state, st.context.cookies)
+
+# Guardar o borrar la cookie tras un login o un logout
+session_cookie = st.session_state.pop('session_cookie', None)
+if session_cookie is not None:
+    components.html(cookie_script(session_cookie), height=0)
 
 def login():
     st.title("Login")
     username = st.text_input("Username")
     password = st.text_input("Password", type="password")
     if st.button("Login"):
-        if verify_credentials(username, password):
-            st.session_state['authenticated'] = True
-            st.session_state['user_id'] = get_user_id(username)
+        user_id = authenticate(username, password)
+        if user_id is not None:
+            start_session(st.session_state, user_id)
             st.success("Login successful!")
             st.rerun()
         else:
@@ -88,10 +104,20 @@ def main_app():
         # Barra de progreso (máximo 120 puntos)
         st.progress(min(puntos/120, 1.0))
 
+        # Racha de días con las cuatro actividades
+        racha = get_user_streaks(st.session_state['user_id'])[ALL]
+        st.markdown(f"""
+        #### 🔥 Racha actual: {racha.current} días
+        Mejor racha: {racha.longest} días
+        """)
+
     st.markdown("Utiliza la barra lateral para navegar entre las diferentes secciones de la aplicación.")
 
     # Agregar versión en el sidebar
     with st.sidebar:
+        if st.button("Cerrar sesión"):
+            end_session(st.session_state)
+            st.rerun()
         try:
             import toml
             with open("pyproject.toml", "r") as f:
@@ -110,4 +136,9 @@ def main_app():
 if not st.session_state['authenticated']:
     login()
 else:
-    main_app()
\ No newline at end of file
+    with (
+        page_run("home", st.session_state.get('user_id')),
+        profiled("home", st.session_state.get('user_id')),
+    ):
+        main_app()
+    render_debug_panel("home")
@@ -0,0 +1,65 @@
+"""
+Seeded synthetic data for the benchmarks: N users × D days of
+DailyActivity and WeightEntry rows.
+"""
+import random
+from datetime import date, timedelta
+
+import bcrypt
+
+from winter.modules.database import (
+    Base, DailyActivity, User, WeightEntry, get_engine, rebuild_monthly_points
+)
+from winter.modules.scoring import day_points
+from winter.settings import POINTS_PER_ACTIVITY
+
+BENCHMARK_PASSWORD = "benchmark"
+
+
+def seed(users: int, days: int, end_date: date, seed: int = 0, chunk_size: int = 5000):
+    """
+    Recreates the schema and fills it with deterministic data ending on
+    `end_date`. Every user logs activities with their own completion rate
+    and weighs in on most days.
+    """
+    rng = random.Random(seed)
+    engine = get_engine()
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    # Un único hash con coste bajo: el benchmark mide la consulta, no bcrypt
+    password_hash = bcrypt.hashpw(BENCHMARK_PASSWORD.encode('utf-8'), bcrypt.gensalt(4)).decode('utf-8')
+    start_date = end_date - timedelta(days=days - 1)
+
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {'id': user_id, 'username': f"user{user_id:05d}", 'password_hash': password_hash}
+            for user_id in range(1, users + 1)
+        ])
+
+        activities, weights = [], []
+        for user_id in range(1, users + 1):
+            completion = rng.uniform(0.3, 0.95)
+            weight = rng.uniform(60, 100)
+            for offset in range(days):
+                day = start_date + timedelta(days=offset)
+                flags = {activity: rng.random() < completion for activity in POINTS_PER_ACTIVITY}
+                activities.append({'user_id': user_id, 'date': day, **flags, 'points': day_points(flags)})
+                if rng.random() < 0.8:
+                    weight += rng.gauss(-0.02, 0.3)
+                    weights.append({'user_id': user_id, 'date': day, 'weight': round(weight, 1)})
+
+                if len(activities) >= chunk_size:
+                    connection.execute(DailyActivity.__table__.insert(), activities)
+                    activities = []
+                if len(weights) >= chunk_size:
+                    connection.execute(WeightEntry.__table__.insert(), weights)
+                    weights = []
+
+        if activities:
+            connection.execute(DailyActivity.__table__.insert(), activities)
+        if weights:
+            connection.execute(WeightEntry.__table__.insert(), weights)
+
+    rebuild_monthly_points()
+    return start_date
@@ -0,0 +1,241 @@
+"""
+Benchmarks for the ranking, tracker and login paths.
+
+Seeds N users × D days of synthetic data into a local database, times every
+query and DataFrame-building stage separately and reports p50/p95 latency
+and peak Python memory. Each run is appended to benchmarks/results.jsonl and
+compared with the previous run of the same size and backend.
+
+The target database is dropped and recreated: never point it at real data.
+
+    python -m benchmarks.run --users 50 --days 90
+    python -m benchmarks.run --database-url postgresql://localhost/winter_bench
+    python -m benchmarks.run --latency-ms 20   # simulate a remote database
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from sqlalchemy import event
+
+from benchmarks.data import BENCHMARK_PASSWORD, seed
+from winter.modules.auth import authenticate
+from winter.modules.bitsets import MASK_POINTS, MonthBits, day_masks, get_month_bits, get_range_bits
+from winter.modules.cache import query_cache
+from winter.modules.database import (
+    configure_database, get_engine, get_group_weights, get_monthly_leaderboard, get_usernames, get_user_points,
+    month_start, save_daily_activity
+)
+from winter.modules.downsample import downsample
+from winter.modules.figures import group_weight_figure, heatmap_figure
+from winter.modules.prefetch import prefetch
+from winter.modules.scoring import ranks
+from winter.modules.streaks import get_streaks
+from winter.settings import CHART_CONFIG, POINTS_PER_ACTIVITY
+
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), 'results.jsonl')
+
+
+def _project_version() -> str:
+    try:
+        import toml
+        path = os.path.join(os.path.dirname(__file__), '..', 'pyproject.toml')
+        return toml.load(path)["tool"]["poetry"]["version"]
+    except Exception:
+        return "unknown"
+
+
+def build_stages(users: int, end_date: date) -> list:
+    """
+    Returns (name, callable) pairs. Query stages clear the read cache first
+    so they measure the database, not the cache.
+    """
+    month = month_start(end_date)
+    week_start = end_date - timedelta(days=6)
+    heatmap_dates = pd.date_range(month, end_date)
+
+    # Entradas precalculadas para las etapas de DataFrame
+    leaderboard_rows = get_monthly_leaderboard(month)
+    usernames = get_usernames()
+    month_bits = get_range_bits(month, end_date)
+    user_ids = sorted(usernames)
+    weight_rows = get_group_weights()
+
+    # Clasificación grande sintética para la puntuación vectorizada
+    rng = np.random.default_rng(0)
+    large_points = rng.integers(0, 125, 100_000)
+    large_bits = MonthBits(month, np.arange(100_000), rng.integers(0, 2 ** 31, (100_000, len(POINTS_PER_ACTIVITY))))
+
+    def uncached(loader):
+        def run():
+            query_cache.clear()
+            return loader()
+        return run
+
+    def leaderboard_frame():
+        return pd.DataFrame(leaderboard_rows).sort_values('total_points', ascending=False)
+
+    def heatmap_bits():
+        return MASK_POINTS[day_masks(month_bits, month, end_date, user_ids)]
+
+    heatmap_args = (heatmap_bits(), [f"{d:%d}" for d in heatmap_dates], [usernames[u] for u in user_ids], "heatmap")
+    weight_max_points = CHART_CONFIG["group_weight_max_points"]
+
+    def tracker_bits():
+        return day_masks(month_bits, week_start, end_date, [1])
+
+    def weight_frame():
+        return pd.DataFrame(weight_rows, columns=['date', 'weight', 'username'])
+
+    def weight_chart_frame():
+        return downsample(weight_frame(), CHART_CONFIG["group_weight_max_points"], by='username')
+
+    ranking_queries = {
+        'leaderboard': (get_monthly_leaderboard, month),
+        'usernames': (get_usernames,),
+        'streaks': (get_streaks, end_date),
+        'activity_bits': (get_range_bits, month, end_date),
+        'weights': (get_group_weights,),
+    }
+
+    def ranking_fetch_serial():
+        query_cache.clear()
+        return {name: loader(*args) for name, (loader, *args) in ranking_queries.items()}
+
+    def ranking_fetch_concurrent():
+        query_cache.clear()
+        data = prefetch(**ranking_queries)
+        return {name: data.get(name, loader, *args) for name, (loader, *args) in ranking_queries.items()}
+
+    save_counter = iter(range(10 ** 9))
+
+    def tracker_save():
+        user_id = next(save_counter) % users + 1
+        save_daily_activity(user_id, end_date, {activity: True for activity in POINTS_PER_ACTIVITY})
+
+    return [
+        ('leaderboard_query', uncached(lambda: get_monthly_leaderboard(month))),
+        ('leaderboard_frame', leaderboard_frame),
+        ('ranks_100k', lambda: ranks(large_points)),
+        ('usernames_query', uncached(get_usernames)),
+        ('month_bits_query', uncached(lambda: get_month_bits(month))),
+        ('heatmap_bits', heatmap_bits),
+        ('points_bits_100k', large_bits.total_points),
+        ('streaks_bits_100k', large_bits.streaks),
+        ('user_points_query', uncached(lambda: get_user_points(1))),
+        ('streaks_query', uncached(lambda: get_streaks(end_date))),
+        ('tracker_week_bits', tracker_bits),
+        ('tracker_save', tracker_save),
+        ('weight_query', uncached(get_group_weights)),
+        ('weight_frame', weight_frame),
+        ('weight_chart_frame', weight_chart_frame),
+        ('heatmap_fig_build', lambda: heatmap_figure.__wrapped__(*heatmap_args).to_dict()),
+        ('heatmap_fig_cached', lambda: heatmap_figure(*heatmap_args).to_dict()),
+        ('weight_fig_build', lambda: group_weight_figure.__wrapped__(weight_frame(), weight_max_points).to_dict()),
+        ('weight_fig_cached', lambda: group_weight_figure(weight_frame(), weight_max_points).to_dict()),
+        ('ranking_serial', ranking_fetch_serial),
+        ('ranking_concurrent', ranking_fetch_concurrent),
+        ('login', lambda: authenticate('user00001', BENCHMARK_PASSWORD)),
+    ]
+
+
+def measure(stage, repeat: int) -> dict:
+    """
+    Times `repeat` runs of a stage, then runs it once more under
+    tracemalloc to record its peak memory.
+    """
+    stage()  # calentamiento
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    stage()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))], 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def _previous_run(record: dict):
+    if not os.path.exists(RESULTS_PATH):
+        return None
+    previous = None
+    with open(RESULTS_PATH) as f:
+        for line in f:
+            run = json.loads(line)
+            if all(run.get(k, 0) == record[k] for k in ('backend', 'users', 'days', 'latency_ms')):
+                previous = run
+    return previous
+
+
+def report(record: dict, previous: dict = None):
+    header = f"{'stage':<20}{'p50 ms':>10}{'p95 ms':>10}{'peak KiB':>11}"
+    if previous:
+        header += f"{'Δp95 vs v' + previous['version']:>20}"
+    print(header)
+    for name, stats in record['stages'].items():
+        line = f"{name:<20}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['peak_kib']:>11.1f}"
+        before = previous['stages'].get(name) if previous else None
+        if before and before['p95_ms']:
+            change = (stats['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100
+            line += f"{change:>+19.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ranking, tracker and login paths.")
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--end-date', type=date.fromisoformat, default=date(2024, 12, 31))
+    parser.add_argument('--database-url', help="defaults to a temporary SQLite file")
+    parser.add_argument('--latency-ms', type=float, default=0, help="simulated round trip added to every statement")
+    parser.add_argument('--no-save', action='store_true', help="do not append the results")
+    args = parser.parse_args()
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    configure_database(url)
+    backend = url.split(':', 1)[0]
+
+    print(f"Seeding {args.users} users × {args.days} days into {backend}...")
+    seed(args.users, args.days, args.end_date, seed=args.seed)
+    if args.latency_ms:
+        event.listen(get_engine(), "before_cursor_execute", lambda *_: time.sleep(args.latency_ms / 1000))
+
+    record = {
+        'version': _project_version(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'backend': backend,
+        'users': args.users,
+        'days': args.days,
+        'latency_ms': args.latency_ms,
+        'repeat': args.repeat,
+        'stages': {name: measure(stage, args.repeat) for name, stage in build_stages(args.users, args.end_date)},
+    }
+    report(record, _previous_run(record))
+
+    if not args.no_save:
+        with open(RESULTS_PATH, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    configure_database(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,71 +1,59 @@
 from datetime import date, timedelta
 
 import pandas as pd
-import plotly.express as px
 import streamlit as st
-from sqlalchemy import and_
 from sqlalchemy.exc import SQLAlchemyError
 
-from winter.modules.database import get_session, DailyActivity
+from winter.modules.auth import restore_session
+from winter.modules.bitsets import day_masks, get_range_bits
+from winter.modules.database import get_daily_activity, save_daily_activity
+from winter.modules.debug_panel import render_debug_panel
+from winter.modules.figures import activity_days_figure
+from winter.modules.fragments import section
+from winter.modules.instrumentation import page_run, timed
+from winter.modules.profiler import profiled
 
 
-def daily_tracker():
-    if 'authenticated' not in st.session_state or not st.session_state['authenticated']:
-        st.error("Por favor, inicia sesión para acceder a esta página.")
-        return
-
-    st.title("Daily Tracker")
-
-    # Obtener el user_id de la sesión
-    user_id = st.session_state['user_id']  # Asegúrate de almacenar el user_id al autenticarse
-
+@section("daily_tracker", "form")
+def activity_form(user_id: int):
     ### Sección: Registro de Actividades Diarias ###
 
     # Seleccionar fecha
     selected_date = st.date_input("Selecciona una fecha para registrar actividades", value=date.today())
 
-    # Crear sesión de base de datos
-    session = get_session()
-
-    # Obtener o crear las actividades del usuario para la fecha seleccionada
-    activity = session.query(DailyActivity).filter_by(
-        user_id=user_id,
-        date=selected_date
-    ).first()
-
-    if not activity:
-        # Si no existe registro, crear uno nuevo
-        activity = DailyActivity(
-            user_id=user_id,
-            date=selected_date
-        )
-        session.add(activity)
-        session.commit()
+    # Obtener las actividades del usuario para la fecha seleccionada
+    activity = get_daily_activity(user_id, selected_date)
 
     # Casillas de verificación para las actividades
-    physical = st.checkbox("🏋️‍♂️ Actividad Física", value=activity.physical_activity, key="physical")
-    diet = st.checkbox("🥗 Dieta y Nutrición", value=activity.diet_nutrition, key="diet")
-    rest = st.checkbox("😴 Descanso o Recuperación", value=activity.rest_recovery, key="rest")
-    personal_dev = st.checkbox("📖 Desarrollo Personal", value=activity.personal_development, key="personal_dev")
+    physical = st.checkbox("🏋️‍♂️ Actividad Física", value=activity['physical_activity'], key="physical")
+    diet = st.checkbox("🥗 Dieta y Nutrición", value=activity['diet_nutrition'], key="diet")
+    rest = st.checkbox("😴 Descanso o Recuperación", value=activity['rest_recovery'], key="rest")
+    personal_dev = st.checkbox("📖 Desarrollo Personal", value=activity['personal_development'], key="personal_dev")
 
     if st.button("Guardar"):
         # Actualizar los valores en la base de datos
-        activity.physical_activity = physical
-        activity.diet_nutrition = diet
-        activity.rest_recovery = rest
-        activity.personal_development = personal_dev
-
         try:
-            session.commit()
-            st.success("¡Actividades guardadas exitosamente!")
+            with timed("save"):
+                save_daily_activity(user_id, selected_date, {
+                    'physical_activity': physical,
+                    'diet_nutrition': diet,
+                    'rest_recovery': rest,
+                    'personal_development': personal_dev
+                })
+            # El gráfico está en otro fragmento: se re-ejecuta la página entera para actualizarlo
+            st.session_state['activities_saved'] = True
+            st.rerun()
         except SQLAlchemyError as e:
-            session.rollback()
             st.error("Error al guardar las actividades.")
             print(f"Error saving activities: {e}")
 
-    ### Sección: Visualización de Actividades ###
+    if st.session_state.pop('activities_saved', False):
+        st.success("¡Actividades guardadas exitosamente!")
 
-    st.markdown("---")  # Línea divisoria
+
+@section("daily_tracker", "chart")
+def activity_chart(user_id: int):
+    ### Sección: Visualización de Actividades ###
 
     st.header("Visualización de Actividades Diarias")
 
@@ -87,85 +75,39 @@ def daily_tracker():
 
     if start_date > end_date:
         st.error("La fecha de inicio debe ser anterior a la fecha de fin.")
-        session.close()
         return
 
-    # Obtener los datos de actividades del usuario en el rango de fechas seleccionado
-    activities = session.query(DailyActivity).filter(
-        and_(
-            DailyActivity.user_id == user_id,
-            DailyActivity.date >= start_date,
-            DailyActivity.date <= end_date
-        )
-    ).all()
-    session.close()
-
-    # Crear un DataFrame con todas las fechas en el rango
-    date_range = pd.date_range(start=start_date, end=end_date, freq='D')
-    empty_data = {
-        'Fecha': [d.date() for d in date_range],
-        '🏋️‍♂️ Actividad Física': [False] * len(date_range),
-        '🥗 Dieta y Nutrición': [False] * len(date_range),
-        '😴 Descanso o Recuperación': [False] * len(date_range),
-        '📖 Desarrollo Personal': [False] * len(date_range)
-    }
-    df = pd.DataFrame(empty_data)
-
-    # Actualizar con los datos existentes
-    for activity in activities:
-        df.loc[df['Fecha'] == activity.date] = [
-            activity.date,
-            activity.physical_activity,
-            activity.diet_nutrition,
-            activity.rest_recovery,
-            activity.personal_development
-        ]
-
-    # Ordenar el DataFrame por fecha
-    df = df.sort_values('Fecha')
-
-    ### Transformación para Visualización Individual de Actividades ###
-
-    # Transformar los datos para mantener cada tipo de actividad
-    df_melted = df.melt(id_vars=['Fecha'],
-                        value_vars=['🏋️‍♂️ Actividad Física', '🥗 Dieta y Nutrición',
-                                    '😴 Descanso o Recuperación', '📖 Desarrollo Personal'],
-                        var_name='Actividad',
-                        value_name='Realizada')
-
-    # Asignar 1 a actividades realizadas y 0 a las no realizadas
-    df_melted['Realizada'] = df_melted['Realizada'].astype(int)
-
-    # Crear el gráfico de barras apiladas que muestra cada actividad por día
-    fig = px.bar(
-        df_melted,
-        x='Fecha',
-        y='Realizada',
-        color='Actividad',
-        title='Actividades Realizadas por Fecha',
-        labels={'Realizada': 'Actividades Realizadas'},
-        height=500,
-        category_orders={'Actividad': ['🏋️‍♂️ Actividad Física', '🥗 Dieta y Nutrición',
-                                       '😴 Descanso o Recuperación', '📖 Desarrollo Personal']}
-    )
-
-    fig.update_layout(
-        xaxis_title='Fecha',
-        yaxis_title='Número de Actividades',
-        bargap=0.2,
-        barmode='group',  # Cambiar a 'stack' si prefieres barras apiladas
-        xaxis=dict(
-            type='category',  # Forzar el eje X como categorías
-            tickformat='%d/%m',  # Formato de fecha simplificado
-            tickmode='array',  # Modo de ticks personalizado
-            ticktext=[d.strftime('%d/%m') for d in df['Fecha']],  # Texto de los ticks
-            tickvals=df['Fecha']  # Valores de los ticks
-        )
-    )
+    # Máscaras diarias del usuario en el rango (un día sin registro = 0, nada realizado)
+    dates = pd.date_range(start=start_date, end=end_date, freq='D').date
+    masks = day_masks(get_range_bits(start_date, end_date), start_date, end_date, [user_id])[0]
+
+    ### Visualización Individual de Actividades ###
+
+    # Una serie de barras por actividad: el bit de la actividad en cada día (1 = realizada)
+    fig = activity_days_figure(list(dates), masks)
 
     st.plotly_chart(fig, use_container_width=True)
 
 
+def daily_tracker():
+    if not restore_session(st.session_state, st.context.cookies):
+        st.error("Por favor, inicia sesión para acceder a esta página.")
+        return
+
+    st.title("Daily Tracker")
+
+    # Obtener el user_id de la sesión
+    user_id = st.session_state['user_id']  # Asegúrate de almacenar el user_id al autenticarse
+
+    # Cada sección es un fragmento: marcar una casilla o cambiar el rango del gráfico
+    # solo re-ejecuta su propia sección
+    activity_form(user_id)
+
+    st.markdown("---")  # Línea divisoria
+
+    activity_chart(user_id)
+
+
 # Agregar versión en el sidebar
 with st.sidebar:
     try:
@@ -183,4 +125,9 @@ with st.sidebar:
             unsafe_allow_html=True
         )
 
-daily_tracker()
+with (
+    page_run("daily_tracker", st.session_state.get('user_id')),
+    profiled("daily_tracker", st.session_state.get('user_id')),
+):
+    daily_tracker()
+render_debug_panel("daily_tracker")
@@ -1,16 +1,123 @@
 from datetime import date, timedelta
 
 import pandas as pd
-import plotly.express as px
 import streamlit as st
-from sqlalchemy import func, and_, Integer
 
-from winter.modules.database import get_session, DailyActivity, User, WeightEntry
-from winter.settings import POINTS_PER_ACTIVITY
+from winter.modules.auth import restore_session
+from winter.modules.bitsets import MASK_POINTS, day_masks
+from winter.modules.database import get_usernames
+from winter.modules.debug_panel import render_debug_panel
+from winter.modules.figures import (
+    activity_ranking_figure, group_weight_figure, heatmap_figure, leaderboard_figure
+)
+from winter.modules.fragments import section
+from winter.modules.instrumentation import page_run, timed
+from winter.modules.prefetch import prefetch
+from winter.modules.profiler import profiled
+from winter.modules.scoring import ranks
+from winter.modules.snapshots import (
+    snapshot_group_weights, snapshot_leaderboard, snapshot_range_bits, snapshot_streaks
+)
+from winter.modules.streaks import ALL, NO_STREAK
+from winter.settings import CHART_CONFIG, DEFAULT_WEIGHT_PERIOD, POINTS_PER_ACTIVITY, WEIGHT_PERIODS
+
+ACTIVITY_LABELS = {
+    'physical_activity': 'Actividad Física',
+    'diet_nutrition': 'Dieta y Nutrición',
+    'rest_recovery': 'Descanso y Recuperación',
+    'personal_development': 'Desarrollo Personal'
+}
+
+
+def weight_period_start(period: str):
+    days = WEIGHT_PERIODS[period]
+    return date.today() - timedelta(days=days) if days else None
+
+
+@section("ranking", "activity_chart")
+def activity_ranking(df_leaderboard: pd.DataFrame, selected_month):
+    ## Clasificación por actividad
+    st.subheader("Clasificación por Actividad")
+    activities = list(POINTS_PER_ACTIVITY.keys())
+    selected_activity = st.selectbox("Selecciona una actividad", activities,
+                                     format_func=lambda x: ACTIVITY_LABELS[x])
+
+    df_activity = df_leaderboard[['username', selected_activity]].sort_values(by=selected_activity, ascending=False)
+    df_activity.reset_index(drop=True, inplace=True)
+    df_activity.index += 1  # Iniciar índice en 1
+    df_activity['Rango'] = df_activity.index
+    df_activity.rename(columns={selected_activity: 'points'}, inplace=True)
+
+    # Gráfico de barras
+    fig_activity = activity_ranking_figure(
+        df_activity,
+        f"Clasificación - {ACTIVITY_LABELS[selected_activity]} - {selected_month.strftime('%B %Y')}"
+    )
+
+    st.plotly_chart(fig_activity, use_container_width=True)
+
+
+@section("ranking", "heatmap")
+def daily_heatmap(data, first_day, last_day, heatmap_keys: tuple):
+    # Mapa de calor diario
+    st.subheader("Mapa de Calor Diario")
+
+    # Usar las fechas del mes seleccionado por defecto
+    start_date = st.date_input("Fecha de inicio", value=first_day, key=heatmap_keys[0])
+    end_date = st.date_input("Fecha de fin", value=last_day, key=heatmap_keys[1])
+
+    if start_date > end_date:
+        st.error("La fecha de inicio debe ser anterior a la fecha de fin.")
+    else:
+        # Generar rango de fechas completo
+        date_range = pd.date_range(start=start_date, end=end_date)
+
+        # Usuarios ordenados por nombre y sus máscaras diarias en el rango
+        usernames = data.get('usernames', get_usernames)
+        users = sorted(usernames, key=usernames.get)
+        masks = day_masks(data.get('activity_bits', snapshot_range_bits, start_date, end_date,
+                                   st.session_state['user_id']),
+                          start_date, end_date, users)
+
+        # Matriz usuario × fecha: los puntos de cada máscara, 0 en los días sin registro
+        points = MASK_POINTS[masks]
+
+        if points.size:
+            fig = heatmap_figure(points,
+                                 [d.strftime('%d') for d in date_range],
+                                 [usernames[user_id] for user_id in users],
+                                 f"Actividad diaria - {start_date.strftime('%B %Y')}")
+
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("No hay datos para el rango de fechas seleccionado.")
+
+
+@section("ranking", "weight_chart")
+def group_weight_chart(data):
+    # Sección de seguimiento de peso
+    st.subheader("Progreso de Peso del Grupo")
+
+    # Ventana de fechas filtrada en la base de datos
+    periods = list(WEIGHT_PERIODS)
+    weight_period = st.selectbox("Periodo", periods, index=periods.index(DEFAULT_WEIGHT_PERIOD), key="weight_period")
+    weight_data = data.get('weights', snapshot_group_weights, weight_period_start(weight_period),
+                           st.session_state['user_id'])
+
+    if weight_data:
+        df_weight = pd.DataFrame([(w.date, w.weight, w.username) for w in weight_data],
+                                 columns=['date', 'weight', 'username'])
+        # Medias diarias y LTTB por usuario para acotar los puntos enviados al navegador;
+        # la figura se reutiliza mientras los datos no cambien
+        fig_weight = group_weight_figure(df_weight, CHART_CONFIG["group_weight_max_points"])
+
+        st.plotly_chart(fig_weight, use_container_width=True)
+    else:
+        st.info("No hay datos de peso disponibles.")
 
 
 def ranking_page():
-    if 'authenticated' not in st.session_state or not st.session_state['authenticated']:
+    if not restore_session(st.session_state, st.context.cookies):
         st.error("Por favor, inicia sesión para acceder a esta página.")
         return
 
@@ -30,7 +137,7 @@ def ranking_page():
         format_func=lambda x: x.strftime('%B %Y'),
         index=len(available_months)-1
     )
-    
+
     # Calcular primer y último día del mes seleccionado
     first_day = selected_month
     if selected_month.month == 12:
@@ -38,17 +145,6 @@ def ranking_page():
     else:
         last_day = date(selected_month.year, selected_month.month + 1, 1) - timedelta(days=1)
 
-    session = get_session()
-
-    RANK_THRESHOLDS = {
-        'Estudiante': (0, 30),
-        'Genin': (31, 60),
-        'Chunin': (61, 90),
-        'Jounin': (91, 110),
-        'Sannin': (111, 119),
-        'Hokage': (120, float('inf'))
-    }
-
     RANK_COLORS = {
         'Estudiante': '#808080',  # Gray
         'Genin': '#90EE90',  # Light Green
@@ -58,197 +154,81 @@ def ranking_page():
         'Hokage': '#FF4500'  # Red-Orange
     }
 
-    def get_rank(points):
-        for rank, (min_pts, max_pts) in RANK_THRESHOLDS.items():
-            if min_pts <= points <= max_pts:
-                return rank
-        return 'Estudiante'
-
-    # Obtener actividades y calcular puntos directamente en la base de datos
-    activities_query = session.query(
-        User.username,
-        DailyActivity.user_id,
-        func.sum(func.coalesce(DailyActivity.physical_activity.cast(Integer) * POINTS_PER_ACTIVITY['physical_activity'],
-                               0)).label('physical_activity_points'),
-        func.sum(
-            func.coalesce(DailyActivity.diet_nutrition.cast(Integer) * POINTS_PER_ACTIVITY['diet_nutrition'], 0)).label(
-            'diet_nutrition_points'),
-        func.sum(
-            func.coalesce(DailyActivity.rest_recovery.cast(Integer) * POINTS_PER_ACTIVITY['rest_recovery'], 0)).label(
-            'rest_recovery_points'),
-        func.sum(func.coalesce(
-            DailyActivity.personal_development.cast(Integer) * POINTS_PER_ACTIVITY['personal_development'], 0)).label(
-            'personal_development_points'),
-    ).join(User).filter(
-        and_(
-            DailyActivity.date >= first_day,
-            DailyActivity.date <= last_day
-        )
-    ).group_by(User.username, DailyActivity.user_id).all()
-
-    # Crear una lista para almacenar los datos de puntos
-    leaderboard_data = []
-    for row in activities_query:
-        total_points = (row.physical_activity_points + row.diet_nutrition_points +
-                        row.rest_recovery_points + row.personal_development_points)
-        leaderboard_data.append({
-            'username': row.username,
-            'total_points': total_points,
-            'physical_activity': row.physical_activity_points,
-            'diet_nutrition': row.diet_nutrition_points,
-            'rest_recovery': row.rest_recovery_points,
-            'personal_development': row.personal_development_points
-        })
-
-    # Crear un DataFrame para la clasificación
-    df_leaderboard = pd.DataFrame(leaderboard_data)
-
-    # Si no hay datos, informar al usuario
-    if df_leaderboard.empty:
-        st.info("No hay datos de actividades disponibles.")
-    else:
-        ## Clasificación global
-        st.subheader("Clasificación Global")
-        df_global = df_leaderboard[['username', 'total_points']].sort_values(by='total_points', ascending=False)
-        df_global.reset_index(drop=True, inplace=True)
-        df_global.index += 1  # Iniciar índice en 1
-        df_global['Rango'] = df_global['total_points'].apply(get_rank)
-        df_global['Color'] = df_global['Rango'].map(RANK_COLORS)
-
-        fig_global = px.bar(df_global,
-                            x='username',
-                            y='total_points',
-                            text='total_points',
-                            color='Rango',
-                            color_discrete_map=RANK_COLORS,
-                            labels={'username': 'Usuario', 'total_points': 'Puntos Totales'},
-                            title=f'Clasificación Global - {selected_month.strftime("%B %Y")}')
-        fig_global.update_traces(texttemplate='%{text} pts<br>%{customdata[0]}',
-                                 textposition='outside',
-                                 customdata=df_global[['Rango']])
-
-        st.plotly_chart(fig_global, use_container_width=True)
-
-        ## Clasificación por actividad
-        st.subheader("Clasificación por Actividad")
-        activities = list(POINTS_PER_ACTIVITY.keys())
-        activity_labels = {
-            'physical_activity': 'Actividad Física',
-            'diet_nutrition': 'Dieta y Nutrición',
-            'rest_recovery': 'Descanso y Recuperación',
-            'personal_development': 'Desarrollo Personal'
-        }
-        selected_activity = st.selectbox("Selecciona una actividad", activities,
-                                         format_func=lambda x: activity_labels[x])
-
-        df_activity = df_leaderboard[['username', selected_activity]].sort_values(by=selected_activity, ascending=False)
-        df_activity.reset_index(drop=True, inplace=True)
-        df_activity.index += 1  # Iniciar índice en 1
-        df_activity['Rango'] = df_activity.index
-        df_activity.rename(columns={selected_activity: 'points'}, inplace=True)
-
-        # Gráfico de barras
-        fig_activity = px.bar(df_activity, x='username', y='points', text='points',
-                              labels={'username': 'Usuario', 'points': 'Puntos'},
-                              title=f"Clasificación - {activity_labels[selected_activity]} - {selected_month.strftime('%B %Y')}")
-        # Corregir el formato del texto sobre las barras
-        fig_activity.update_traces(texttemplate='Posición %{customdata}: %{text} pts', 
-                                 textposition='outside',
-                                 customdata=df_activity.index)  # Usar el índice como posición
-        fig_activity.update_layout(uniformtext_minsize=8, uniformtext_mode='hide')
-
-        st.plotly_chart(fig_activity, use_container_width=True)
-
-    # Mapa de calor diario
-    st.subheader("Mapa de Calor Diario")
-
-    # Usar las fechas del mes seleccionado por defecto
-    start_date = st.date_input("Fecha de inicio", value=first_day)
-    end_date = st.date_input("Fecha de fin", value=last_day)
-
-    if start_date > end_date:
-        st.error("La fecha de inicio debe ser anterior a la fecha de fin.")
-    else:
-        # Generar rango de fechas completo
-        date_range = pd.date_range(start=start_date, end=end_date)
-
-        # Obtener usuarios
-        users = session.query(User).all()
-        usernames = {user.id: user.username for user in users}
-
-        # Inicializar DataFrame vacío
-        data = []
-        for user_id, username in usernames.items():
-            for single_date in date_range:
-                data.append({
-                    'username': username,
-                    'date': single_date.date(),
-                    'points': 0
-                })
-        df_heatmap = pd.DataFrame(data)
-
-        # Obtener actividades en el rango de fechas
-        activities_in_range = session.query(DailyActivity).filter(
-            and_(
-                DailyActivity.date >= start_date,
-                DailyActivity.date <= end_date
-            )
-        ).all()
-
-        # Calcular puntos por usuario y fecha
-        for activity in activities_in_range:
-            daily_points = 0
-            for activity_type in POINTS_PER_ACTIVITY.keys():
-                if getattr(activity, activity_type):
-                    daily_points += POINTS_PER_ACTIVITY[activity_type]
-            df_heatmap.loc[
-                (df_heatmap['username'] == usernames[activity.user_id]) &
-                (df_heatmap['date'] == activity.date), 'points'] = daily_points
-
-        if not df_heatmap.empty:
-            df_pivot = df_heatmap.pivot(index='username', columns='date', values='points')
-            df_pivot.fillna(0, inplace=True)
-
-            fig = px.imshow(df_pivot,
-                            labels=dict(x="Fecha", y="Usuario", color="Puntos"),
-                            x=[d.strftime('%d') for d in df_pivot.columns],
-                            y=df_pivot.index,
-                            aspect="auto",
-                            color_continuous_scale='Viridis')
-
-            # Ajustar el eje X para mostrar todas las fechas y añadir título con mes/año
-            fig.update_xaxes(type='category')
-            fig.update_layout(
-                title=f"Actividad diaria - {start_date.strftime('%B %Y')}"
-            )
+    # Lanzar en paralelo las consultas independientes de la página. Los rangos salen
+    # del estado de los widgets de la ejecución anterior; si cambian, se consulta de nuevo.
+    # Los datos agregados salen de las instantáneas del worker (winter/scripts/aggregate.py)
+    # salvo que falten, estén caducadas o no incluyan aún el último cambio del usuario
+    user_id = st.session_state['user_id']
+    heatmap_keys = (f"heatmap_start_{first_day:%Y%m}", f"heatmap_end_{first_day:%Y%m}")
+    data = prefetch(
+        leaderboard=(snapshot_leaderboard, first_day.date(), user_id),
+        usernames=(get_usernames,),
+        streaks=(snapshot_streaks, user_id),
+        activity_bits=(snapshot_range_bits,
+                       st.session_state.get(heatmap_keys[0], first_day.date()),
+                       st.session_state.get(heatmap_keys[1], last_day),
+                       user_id),
+        weights=(snapshot_group_weights,
+                 weight_period_start(st.session_state.get("weight_period", DEFAULT_WEIGHT_PERIOD)),
+                 user_id)
+    )
 
-            st.plotly_chart(fig, use_container_width=True)
+    with timed("leaderboard"):
+        # Leer los puntos del mes desde la instantánea o la tabla agregada
+        leaderboard_data = [{
+            'username': row.username,
+            'total_points': row.total_points,
+            'physical_activity': row.physical_activity,
+            'diet_nutrition': row.diet_nutrition,
+            'rest_recovery': row.rest_recovery,
+            'personal_development': row.personal_development
+        } for row in data.get('leaderboard', snapshot_leaderboard, first_day.date(), user_id)]
+
+        # Crear un DataFrame para la clasificación
+        df_leaderboard = pd.DataFrame(leaderboard_data)
+
+        # Si no hay datos, informar al usuario
+        if df_leaderboard.empty:
+            st.info("No hay datos de actividades disponibles.")
         else:
-            st.info("No hay datos para el rango de fechas seleccionado.")
-
-    # Add weight tracking section before session.close()
-    st.subheader("Progreso de Peso del Grupo")
-
-    weight_data = session.query(
-        WeightEntry.date,
-        WeightEntry.weight,
-        User.username
-    ).join(User).order_by(WeightEntry.date).all()
-
-    if weight_data:
-        df_weight = pd.DataFrame([(w.date, w.weight, w.username) for w in weight_data],
-                                 columns=['date', 'weight', 'username'])
-
-        fig_weight = px.line(df_weight,
-                             x='date',
-                             y='weight',
-                             color='username',
-                             labels={'date': 'Fecha', 'weight': 'Peso (kg)', 'username': 'Usuario'},
-                             title='Progreso de Peso del Grupo')
-
-        st.plotly_chart(fig_weight, use_container_width=True)
-    else:
-        st.info("No hay datos de peso disponibles.")
+            ## Clasificación global
+            st.subheader("Clasificación Global")
+            df_global = df_leaderboard[['username', 'total_points']].sort_values(by='total_points', ascending=False)
+            df_global.reset_index(drop=True, inplace=True)
+            df_global.index += 1  # Iniciar índice en 1
+            df_global['Rango'] = ranks(df_global['total_points'].to_numpy())
+            df_global['Color'] = df_global['Rango'].map(RANK_COLORS)
+
+            fig_global = leaderboard_figure(df_global,
+                                            f'Clasificación Global - {selected_month.strftime("%B %Y")}',
+                                            RANK_COLORS)
+
+            st.plotly_chart(fig_global, use_container_width=True)
+
+    # Las secciones con widgets propios son fragmentos: al cambiar sus widgets solo se
+    # re-ejecuta esa sección, sin repetir las consultas ni los gráficos del resto de la página
+    if not df_leaderboard.empty:
+        activity_ranking(df_leaderboard, selected_month)
+
+    with timed("streaks"):
+        # Rachas de días consecutivos, calculadas en la base de datos para todos los usuarios
+        st.subheader("Rachas")
+        streaks = data.get('streaks', snapshot_streaks, user_id)
+        df_streaks = pd.DataFrame([{
+            'Usuario': username,
+            'Racha actual': streaks.get(user_id, {}).get(ALL, NO_STREAK).current,
+            'Mejor racha': streaks.get(user_id, {}).get(ALL, NO_STREAK).longest,
+            **{ACTIVITY_LABELS[activity]: streaks.get(user_id, {}).get(activity, NO_STREAK).current
+               for activity in POINTS_PER_ACTIVITY}
+        } for user_id, username in data.get('usernames', get_usernames).items()])
+
+        if not df_streaks.empty:
+            df_streaks = df_streaks.sort_values(['Racha actual', 'Mejor racha'], ascending=False)
+            st.dataframe(df_streaks, hide_index=True, use_container_width=True)
+
+    daily_heatmap(data, first_day, last_day, heatmap_keys)
+
+    group_weight_chart(data)
 
     # Agregar versión en el sidebar
     with st.sidebar:
@@ -267,8 +247,11 @@ def ranking_page():
                 unsafe_allow_html=True
             )
 
-    session.close()
-
 
 if __name__ == "__main__":
-    ranking_page()
+    with (
+        page_run("ranking", st.session_state.get('user_id')),
+        profiled("ranking", st.session_state.get('user_id')),
+    ):
+        ranking_page()
+    render_debug_panel("ranking")
@@ -1,14 +1,20 @@
 from datetime import date
 
-import plotly.express as px
+import pandas as pd
 import streamlit as st
 from sqlalchemy.exc import SQLAlchemyError
 
-from winter.modules.database import get_session, WeightEntry
+from winter.modules.auth import restore_session
+from winter.modules.database import add_weight_entry, get_user_weight_range, get_user_weights
+from winter.modules.debug_panel import render_debug_panel
+from winter.modules.figures import weight_figure
+from winter.modules.instrumentation import page_run
+from winter.modules.profiler import profiled
+from winter.settings import CHART_CONFIG
 
 
 def main():
-    if 'authenticated' not in st.session_state or not st.session_state['authenticated']:
+    if not restore_session(st.session_state, st.context.cookies):
         st.error("Por favor, inicia sesión para acceder a esta página.")
         return
 
@@ -22,44 +28,26 @@ def main():
 
     if submit:
         if weight > 0:
-            session = get_session()
-            new_entry = WeightEntry(
-                user_id=st.session_state['user_id'],
-                date=entry_date,
-                weight=weight
-            )
-            session.add(new_entry)
             try:
-                session.commit()
+                add_weight_entry(st.session_state['user_id'], entry_date, weight)
                 st.success("Registro de peso guardado correctamente.")
             except SQLAlchemyError as e:
-                session.rollback()
                 st.error(f"Error al guardar el registro: {e}")
-            finally:
-                session.close()
         else:
             st.error("Por favor, ingresa un peso válido.")
 
-    # Recuperar y mostrar los registros de peso
-    session = get_session()
-    entries = session.query(WeightEntry).filter(
-        WeightEntry.user_id == st.session_state['user_id']
-    ).order_by(WeightEntry.date).all()
-    session.close()
-
-    if entries:
-        # Preparar datos para el grfico
-        dates = [entry.date for entry in entries]
-        weights = [entry.weight for entry in entries]
+    # Primer y último día con registros, sin cargar el historial
+    first_date, last_date = get_user_weight_range(st.session_state['user_id'])
 
+    if first_date is not None:
         # Crear dos columnas para los controles
         col1, col2 = st.columns(2)
 
         with col1:
             # Selector de rango de fechas
             st.subheader("Rango de Fechas")
-            start_date = st.date_input("Fecha de inicio:", value=min(dates), key="start_date")
-            end_date = st.date_input("Fecha de fin:", value=max(dates), key="end_date")
+            start_date = st.date_input("Fecha de inicio:", value=first_date, key="start_date")
+            end_date = st.date_input("Fecha de fin:", value=last_date, key="end_date")
 
         with col2:
             # Selector de peso objetivo
@@ -75,29 +63,14 @@ def main():
         if start_date > end_date:
             st.error("La fecha de inicio no puede ser posterior a la fecha de fin.")
         else:
-            # Filtrar datos según el rango seleccionado
-            filtered_data = [(d, w) for d, w in zip(dates, weights) if start_date <= d <= end_date]
-
-            if filtered_data:
-                filtered_dates, filtered_weights = zip(*filtered_data)
-
-                # Crear y mostrar el grfico
-                fig = px.line(
-                    x=filtered_dates,
-                    y=filtered_weights,
-                    labels={'x': 'Fecha', 'y': 'Peso (kg)'},
-                    title='Progreso de Peso'
-                )
-
-                # Agregar lnea horizontal para el peso objetivo si se ha establecido
-                if target_weight > 0:
-                    fig.add_hline(
-                        y=target_weight,
-                        line_dash="dash",
-                        line_color="red",
-                        annotation_text="Objetivo",
-                        annotation_position="right"
-                    )
+            # Solo el rango seleccionado, reducido al presupuesto de puntos del gráfico
+            entries = get_user_weights(st.session_state['user_id'], start_date, end_date)
+
+            if entries:
+                # Crear y mostrar el gráfico (WebGL) con la línea del peso objetivo si se ha establecido,
+                # reducido al presupuesto de puntos y reutilizado mientras los datos no cambien
+                fig = weight_figure(pd.DataFrame(entries, columns=['date', 'weight']),
+                                    CHART_CONFIG["weight_max_points"], target_weight)
 
                 st.plotly_chart(fig)
             else:
@@ -123,4 +96,9 @@ if __name__ == "__main__":
                 "<div style='text-align: center; color: rgba(250, 250, 250, 0.4);'>Version no disponible</div>",
                 unsafe_allow_html=True
             )
-    main()
+    with (
+        page_run("weight_tracker", st.session_state.get('user_id')),
+        profiled("weight_tracker", st.session_state.get('user_id')),
+    ):
+        main()
+    render_debug_panel("weight_tracker")
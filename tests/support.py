@@ -0,0 +1,41 @@
+"""
+Shared fixtures for the tests that need a database.
+"""
+import unittest
+from unittest import mock
+
+from winter.modules import database
+from winter.modules.cache import query_cache
+
+# Coste mínimo de bcrypt: los tests crean usuarios en cada setUp
+TEST_BCRYPT_ROUNDS = 4
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """
+    Runs every test against a fresh in-memory SQLite database (and a
+    separate one as read replica if `read_url` is set) with the users in
+    `users`, whose ids are set as attributes of the same name. With
+    `create_tables = False` the database is left empty.
+    """
+    users = ('ana', 'bob')
+    read_url = None
+    create_tables = True
+
+    def setUp(self):
+        patcher = mock.patch.object(database, 'BCRYPT_ROUNDS', TEST_BCRYPT_ROUNDS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(query_cache.clear)
+        self.addCleanup(database.configure_database, None)
+
+        database.configure_database("sqlite://", read_url=self.read_url)
+        query_cache.clear()
+        if not self.create_tables:
+            return
+        database.initialize_database()
+        if self.read_url:
+            database.Base.metadata.create_all(database.get_read_engine())
+        for username in self.users:
+            database.create_user(username, "secret")
+            setattr(self, username, database.get_user_id(username))
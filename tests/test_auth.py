@@ -0,0 +1,93 @@
+import unittest
+from unittest import mock
+
+from winter.modules import auth
+
+
+class TestSessionTokens(unittest.TestCase):
+    def setUp(self):
+        auth._secret = None
+        patcher = mock.patch.object(auth.settings, 'SESSION_CONFIG', {'secret': 'test-secret', 'ttl': 3600}, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, auth, '_secret', None)
+
+    def test_issue_and_resolve(self):
+        token = auth.issue_session_token(7)
+        self.assertEqual(auth.resolve_session_token(token), 7)
+
+    def test_resolve_from_signature_after_cache_loss(self):
+        token = auth.issue_session_token(7)
+        auth._sessions.clear()
+        self.assertEqual(auth.resolve_session_token(token), 7)
+
+    def test_tampered_token_is_rejected(self):
+        token = auth.issue_session_token(7)
+        auth._sessions.clear()
+        encoded, signature = token.split('.')
+        self.assertIsNone(auth.resolve_session_token(f"{encoded}.{'0' * len(signature)}"))
+        self.assertIsNone(auth.resolve_session_token('garbage'))
+        self.assertIsNone(auth.resolve_session_token(None))
+
+    def test_expired_token_is_rejected(self):
+        token = auth.issue_session_token(7, ttl=10)
+        with mock.patch('winter.modules.auth.time.time', return_value=auth.time.time() + 11):
+            self.assertIsNone(auth.resolve_session_token(token))
+
+    def test_revoked_token_is_rejected(self):
+        token = auth.issue_session_token(7)
+        auth.revoke_session_token(token)
+        self.assertIsNone(auth.resolve_session_token(token))
+
+    def test_restore_session_from_cookie(self):
+        state = {}
+        token = auth.issue_session_token(3)
+        self.assertTrue(auth.restore_session(state, {auth.SESSION_COOKIE: token}))
+        self.assertEqual(state, {'authenticated': True, 'user_id': 3, 'session_token': token})
+        self.assertFalse(auth.restore_session({}, {}))
+
+    def test_logout_revokes_token(self):
+        state = {}
+        token = auth.start_session(state, 3)
+        self.assertEqual(state['session_cookie'], token)
+
+        auth.end_session(state)
+        self.assertEqual(state, {'authenticated': False, 'session_cookie': ''})
+        self.assertFalse(auth.restore_session(state, {auth.SESSION_COOKIE: token}))
+
+    def test_cookie_script(self):
+        self.assertIn("'; Max-Age=3600; Path=/; SameSite=Strict'", auth.cookie_script('abc.def'))
+        self.assertIn('"abc.def"', auth.cookie_script('abc.def'))
+        self.assertIn('Max-Age=0', auth.cookie_script(''))
+
+
+class TestSigningKey(unittest.TestCase):
+    def setUp(self):
+        auth._secret = None
+        self.addCleanup(setattr, auth, '_secret', None)
+
+    def test_secret_required_outside_sqlite(self):
+        with mock.patch.object(auth.settings, 'SESSION_CONFIG', {'secret': None, 'ttl': 3600}, create=True), \
+                mock.patch.object(auth.settings, 'DATABASE_URL', 'postgresql://db/winter', create=True):
+            with self.assertRaises(RuntimeError):
+                auth.check_session_secret()
+
+    def test_random_key_in_local_mode(self):
+        with mock.patch.object(auth.settings, 'SESSION_CONFIG', {'secret': None, 'ttl': 3600}, create=True), \
+                mock.patch.object(auth.settings, 'DATABASE_URL', 'sqlite:///winter.db', create=True):
+            auth.check_session_secret()
+            self.assertEqual(auth.resolve_session_token(auth.issue_session_token(4)), 4)
+
+
+class TestAuthenticate(unittest.TestCase):
+    def test_authenticate_returns_user_id(self):
+        hashed = auth.bcrypt.hashpw(b'secret', auth.bcrypt.gensalt(4)).decode('utf-8')
+        row = mock.Mock(id=5, password_hash=hashed)
+        with mock.patch('winter.modules.auth.get_user_credentials', return_value=row) as lookup:
+            self.assertEqual(auth.authenticate('ana', 'secret'), 5)
+            self.assertIsNone(auth.authenticate('ana', 'wrong'))
+        self.assertEqual(lookup.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from datetime import date
+
+import numpy as np
+
+from winter.modules.bitsets import (
+    ALL_DONE, MASK_POINTS, MonthBits, current_run, day_masks, decode, encode, get_month_bits, get_range_bits,
+    longest_run, popcount
+)
+from winter.modules.database import get_monthly_leaderboard, save_daily_activity
+from winter.modules.scoring import day_points
+from tests.support import DatabaseTestCase
+
+ALL = {'physical_activity': True, 'diet_nutrition': True, 'rest_recovery': True, 'personal_development': True}
+OCTOBER = date(2024, 10, 1)
+
+
+class TestEncoding(unittest.TestCase):
+    def test_encode_decode(self):
+        flags = {'physical_activity': True, 'diet_nutrition': False, 'rest_recovery': True}
+        mask = encode(flags)
+        self.assertEqual(mask, 0b0101)
+        self.assertEqual(decode(mask), {**flags, 'personal_development': False})
+        self.assertEqual(encode(ALL), ALL_DONE)
+        self.assertEqual(MASK_POINTS[mask], day_points(flags))
+
+    def test_bit_operations(self):
+        words = np.array([0, 0b1, 0b1110111, 0xFFFFFFFF], dtype=np.uint32)
+        self.assertEqual(popcount(words).tolist(), [0, 1, 6, 32])
+        self.assertEqual(longest_run(words).tolist(), [0, 1, 3, 32])
+        self.assertEqual(current_run(words, 3).tolist(), [0, 0, 3, 3])
+        self.assertEqual(current_run(words, 4).tolist(), [0, 0, 0, 4])
+
+    def test_month_bits(self):
+        rows = [(7, 1, ALL_DONE), (7, 2, ALL_DONE), (7, 3, 0b0001), (3, 31, 0b1000)]
+        bits = MonthBits.from_rows(OCTOBER, rows)
+
+        self.assertEqual(bits.user_ids.tolist(), [3, 7])
+        self.assertEqual(bits.total_points().tolist(), [1, 9])
+        self.assertEqual(bits.masks([7, 5, 3])[:, [0, 2, 30]].tolist(),
+                         [[ALL_DONE, 0b0001, 0], [0, 0, 0], [0, 0, 0b1000]])
+
+        current, longest = bits.streaks(day=3)
+        # Columnas: cada actividad y por último "todas"
+        self.assertEqual(current[1].tolist(), [3, 0, 0, 0, 0])
+        self.assertEqual(longest[1].tolist(), [3, 2, 2, 2, 2])
+
+
+class TestMonthBitsQuery(DatabaseTestCase):
+    def test_points_match_monthly_leaderboard(self):
+        save_daily_activity(self.ana, date(2024, 10, 1), ALL)
+        save_daily_activity(self.ana, date(2024, 10, 2), {'diet_nutrition': True})
+        save_daily_activity(self.bob, date(2024, 10, 31), {'rest_recovery': True, 'physical_activity': True})
+        save_daily_activity(self.bob, date(2024, 11, 1), ALL)
+
+        bits = get_month_bits(OCTOBER)
+        totals = dict(zip(bits.user_ids.tolist(), bits.total_points().tolist()))
+        self.assertEqual(totals, {row.user_id: row.total_points for row in get_monthly_leaderboard(OCTOBER)})
+
+    def test_day_masks_across_months(self):
+        save_daily_activity(self.bob, date(2024, 10, 31), ALL)
+        save_daily_activity(self.bob, date(2024, 11, 1), {'physical_activity': True})
+
+        start, end = date(2024, 10, 30), date(2024, 11, 2)
+        masks = day_masks(get_range_bits(start, end), start, end, [self.ana, self.bob])
+        self.assertEqual(masks.tolist(), [[0, 0, 0, 0], [0, ALL_DONE, 0b0001, 0]])
+
+    def test_save_refreshes_cached_month(self):
+        save_daily_activity(self.ana, date(2024, 10, 5), {'physical_activity': True})
+        self.assertEqual(get_month_bits(OCTOBER).total_points().tolist(), [1])
+        save_daily_activity(self.ana, date(2024, 10, 5), ALL)
+        self.assertEqual(get_month_bits(OCTOBER).total_points().tolist(), [4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from datetime import date
+from unittest import mock
+
+from winter.modules.cache import QueryCache
+
+
+class TestQueryCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = QueryCache(maxsize=2, ttl=60)
+
+    def test_hit_and_miss(self):
+        loader = mock.Mock(return_value=[1, 2])
+        self.assertEqual(self.cache.get_or_load('q', loader, user_id=1), [1, 2])
+        self.assertEqual(self.cache.get_or_load('q', loader, user_id=1), [1, 2])
+        self.assertEqual(loader.call_count, 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_ttl_expiry(self):
+        loader = mock.Mock(return_value=1)
+        with mock.patch('winter.modules.cache.time.monotonic', return_value=0):
+            self.cache.get_or_load('q', loader)
+        with mock.patch('winter.modules.cache.time.monotonic', return_value=61):
+            self.cache.get_or_load('q', loader)
+        self.assertEqual(loader.call_count, 2)
+
+    def test_lru_eviction(self):
+        for user_id in (1, 2, 3):
+            self.cache.get_or_load('q', lambda: user_id, user_id=user_id)
+        self.assertEqual(self.cache.stats()['size'], 2)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_invalidate_by_day_and_user(self):
+        self.cache.get_or_load('month', lambda: 'oct', scope=date(2024, 10, 1))
+        self.cache.get_or_load('month', lambda: 'nov', scope=date(2024, 11, 1))
+        self.assertEqual(self.cache.invalidate('month', day=date(2024, 10, 20)), 1)
+
+        self.cache.get_or_load('range', lambda: 'r', scope=(date(2024, 10, 1), date(2024, 10, 7)))
+        self.assertEqual(self.cache.invalidate('range', day=date(2024, 10, 8)), 0)
+        self.assertEqual(self.cache.invalidate('range', day=date(2024, 10, 7)), 1)
+
+        self.cache.get_or_load('points', lambda: 3, user_id=1)
+        self.assertEqual(self.cache.invalidate('points', user_id=2), 0)
+        self.assertEqual(self.cache.invalidate('points', user_id=1), 1)
+
+    def test_invalidation_during_load_is_not_stored(self):
+        def loader():
+            self.cache.invalidate('q')
+            return 'stale'
+
+        self.cache.get_or_load('q', loader)
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_can_store_veto(self):
+        self.cache.can_store = lambda: False
+        self.assertEqual(self.cache.get_or_load('q', lambda: 'replica'), 'replica')
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+        self.cache.can_store = lambda: True
+        self.cache.get_or_load('q', lambda: 'primary')
+        self.assertEqual(self.cache.get_or_load('q', lambda: 'other'), 'primary')
+
+
+if __name__ == '__main__':
+    unittest.main()
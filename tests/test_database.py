@@ -1,5 +1,18 @@
 import unittest
-from winter.modules.database import get_connection
+from datetime import date
+from unittest import mock
+
+from winter.modules.database import (
+    DailyActivity, add_weight_entry, dispose_engine, get_connection, get_daily_activity, get_engine,
+    get_group_weights, get_monthly_leaderboard, get_pool_stats, get_session, get_user_id, get_user_points,
+    get_user_weight_range, get_user_weights, create_user, rebuild_monthly_points, save_daily_activity,
+    sync_points_weights
+)
+from winter.modules import database
+from winter.modules.auth import authenticate
+from winter.modules.cache import query_cache
+from winter.settings import POINTS_PER_ACTIVITY
+from tests.support import DatabaseTestCase
 
 
 class TestDatabaseConnection(unittest.TestCase):
@@ -10,5 +23,150 @@ class TestDatabaseConnection(unittest.TestCase):
             connection.close()
 
 
+class TestEngineRegistry(unittest.TestCase):
+    def tearDown(self):
+        dispose_engine()
+
+    def test_engine_is_shared(self):
+        engine = get_engine()
+        self.assertIs(engine, get_engine())
+        session = get_session()
+        self.assertIs(session.get_bind(), engine)
+        session.close()
+
+    def test_dispose_builds_new_engine(self):
+        engine = get_engine()
+        dispose_engine()
+        self.assertIsNot(engine, get_engine())
+
+    def test_pool_stats(self):
+        get_engine()
+        stats = get_pool_stats()
+        for key in ("size", "checked_in", "checked_out", "overflow", "waits", "wait_seconds"):
+            self.assertIn(key, stats)
+        self.assertEqual(stats["checked_out"], 0)
+
+
+
+class TestSQLiteQueries(DatabaseTestCase):
+    def test_credentials(self):
+        self.assertEqual(authenticate("ana", "secret"), self.ana)
+        self.assertIsNone(authenticate("ana", "wrong"))
+        self.assertIsNone(get_user_id("nobody"))
+
+    def test_missing_day_reads_as_all_false(self):
+        flags = get_daily_activity(self.ana, date(2024, 10, 1))
+        self.assertFalse(any(flags.values()))
+
+    def test_save_upserts_and_updates_monthly_points(self):
+        save_daily_activity(self.ana, date(2024, 10, 1), {'physical_activity': True, 'diet_nutrition': True})
+        save_daily_activity(self.ana, date(2024, 10, 2), {'rest_recovery': True})
+        save_daily_activity(self.bob, date(2024, 10, 2), {'personal_development': True})
+        self.assertEqual(get_user_points(self.ana, date(2024, 10, 1))['points'], 3)
+
+        # Guardar de nuevo el mismo día reemplaza el registro
+        save_daily_activity(self.ana, date(2024, 10, 1), {'physical_activity': True})
+        self.assertTrue(get_daily_activity(self.ana, date(2024, 10, 1))['physical_activity'])
+        self.assertFalse(get_daily_activity(self.ana, date(2024, 10, 1))['diet_nutrition'])
+        self.assertEqual(get_user_points(self.ana, date(2024, 10, 1)), {'points': 2, 'rank': "👨‍🎓 Estudiante"})
+        self.assertEqual(get_user_points(self.ana)['points'], 0)
+
+        leaderboard = {row.username: row.total_points for row in get_monthly_leaderboard(date(2024, 10, 15))}
+        self.assertEqual(leaderboard, {'ana': 2, 'bob': 1})
+        self.assertEqual(get_monthly_leaderboard(date(2024, 11, 1)), [])
+
+        with get_session() as session:
+            points = {(row.user_id, row.date): row.points
+                      for row in session.query(DailyActivity.user_id, DailyActivity.date, DailyActivity.points)}
+        self.assertEqual(points, {(self.ana, date(2024, 10, 1)): 1, (self.ana, date(2024, 10, 2)): 1,
+                                  (self.bob, date(2024, 10, 2)): 1})
+
+    def test_rebuild_monthly_points(self):
+        save_daily_activity(self.ana, date(2024, 10, 31), {'physical_activity': True})
+        save_daily_activity(self.ana, date(2024, 11, 1), {'physical_activity': True, 'rest_recovery': True})
+        self.assertEqual(rebuild_monthly_points(), 2)
+        self.assertEqual(get_monthly_leaderboard(date(2024, 11, 1))[0].total_points, 2)
+
+    def test_stored_points_follow_weight_changes(self):
+        save_daily_activity(self.ana, date(2024, 10, 1), {'physical_activity': True, 'diet_nutrition': True})
+        self.assertTrue(sync_points_weights())
+        self.assertFalse(sync_points_weights())
+
+        with mock.patch.dict(POINTS_PER_ACTIVITY, {'physical_activity': 3}):
+            self.assertTrue(sync_points_weights())
+            with get_session() as session:
+                self.assertEqual(session.query(DailyActivity.points).scalar(), 4)
+            self.assertEqual(get_monthly_leaderboard(date(2024, 10, 1))[0].total_points, 4)
+            self.assertEqual(get_monthly_leaderboard(date(2024, 10, 1))[0].physical_activity, 3)
+        self.assertTrue(sync_points_weights())
+        self.assertEqual(get_user_points(self.ana, date(2024, 10, 1))['points'], 2)
+
+    def test_weights_are_windowed_in_sql(self):
+        self.assertEqual(get_user_weight_range(self.ana), (None, None))
+        for day in (1, 10, 20):
+            add_weight_entry(self.ana, date(2024, 10, day), 80.0 + day)
+        add_weight_entry(self.bob, date(2024, 10, 15), 70.0)
+
+        self.assertEqual(get_user_weight_range(self.ana), (date(2024, 10, 1), date(2024, 10, 20)))
+        window = get_user_weights(self.ana, date(2024, 10, 5), date(2024, 10, 20))
+        self.assertEqual([(w.date, w.weight) for w in window], [(date(2024, 10, 10), 90.0), (date(2024, 10, 20), 100.0)])
+        self.assertEqual(len(get_user_weights(self.ana)), 3)
+        self.assertEqual([w.username for w in get_group_weights(date(2024, 10, 12))], ['bob', 'ana'])
+
+        # Un registro nuevo invalida las ventanas que lo contienen
+        add_weight_entry(self.ana, date(2024, 10, 12), 85.0)
+        self.assertEqual(len(get_user_weights(self.ana, date(2024, 10, 5), date(2024, 10, 20))), 3)
+        self.assertEqual(len(get_group_weights(date(2024, 10, 12))), 3)
+
+
+class TestReadRouting(DatabaseTestCase):
+    # Dos bases en memoria independientes: primario y réplica (sin replicación)
+    read_url = "sqlite://"
+    users = ()
+
+    def test_separate_engines_and_pools(self):
+        self.assertIsNot(database.get_read_engine(), get_engine())
+
+    def test_reads_follow_writes_then_go_to_replica(self):
+        create_user("ana", "secret")
+        # Dentro de la ventana tras escribir se lee del primario
+        self.assertEqual(list(database.get_usernames().values()), ["ana"])
+
+        query_cache.clear()
+        with mock.patch.object(database.time, 'monotonic', return_value=10 ** 9):
+            self.assertEqual(database.get_usernames(), {})
+            query_cache.clear()
+            with database.primary_reads():
+                self.assertEqual(list(database.get_usernames().values()), ["ana"])
+
+    def test_writes_and_tracker_reads_use_primary(self):
+        create_user("ana", "secret")
+        ana = get_user_id("ana")
+        with mock.patch.object(database.time, 'monotonic', return_value=10 ** 9):
+            save_daily_activity(ana, date(2024, 10, 1), {'physical_activity': True})
+        self.assertTrue(get_daily_activity(ana, date(2024, 10, 1))['physical_activity'])
+        self.assertEqual(get_user_id("ana"), ana)
+
+    def test_read_your_writes_is_per_user(self):
+        self.addCleanup(database.set_session_user, None)
+        create_user("ana", "secret")
+        create_user("bob", "secret")
+        ana, bob = get_user_id("ana"), get_user_id("bob")
+        month = date(2024, 10, 1)
+
+        with mock.patch.object(database.time, 'monotonic', return_value=10 ** 9):
+            save_daily_activity(ana, month, {'physical_activity': True})
+            # Bob sigue en la réplica (vacía aquí) y su lectura no se guarda en la caché compartida
+            database.set_session_user(bob)
+            self.assertEqual(get_monthly_leaderboard(month), [])
+            database.set_session_user(ana)
+            self.assertEqual([row.username for row in get_monthly_leaderboard(month)], ["ana"])
+
+        with mock.patch.object(database.time, 'monotonic', return_value=10 ** 9 + 60):
+            # Pasada la ventana Ana también vuelve a la réplica
+            query_cache.clear()
+            self.assertEqual(get_monthly_leaderboard(month), [])
+
+
 if __name__ == '__main__':
     unittest.main()
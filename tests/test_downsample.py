@@ -0,0 +1,48 @@
+import unittest
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from winter.modules.downsample import downsample, lttb
+
+
+class TestLTTB(unittest.TestCase):
+    def test_short_series_is_untouched(self):
+        self.assertEqual(list(lttb([0, 1, 2], [5, 6, 7], 10)), [0, 1, 2])
+
+    def test_keeps_endpoints_and_peaks(self):
+        x = np.arange(1000)
+        y = np.zeros(1000)
+        y[500] = 10
+        indices = lttb(x, y, 50)
+        self.assertEqual(len(indices), 50)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 999)
+        self.assertIn(500, indices)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+
+class TestDownsample(unittest.TestCase):
+    def test_daily_means(self):
+        df = pd.DataFrame([
+            (date(2024, 1, 1), 80.0),
+            (date(2024, 1, 1), 82.0),
+            (date(2024, 1, 2), 81.0),
+        ], columns=['date', 'weight'])
+        result = downsample(df, 100)
+        self.assertEqual(result['weight'].tolist(), [81.0, 81.0])
+
+    def test_budget_split_between_series(self):
+        start = date(2020, 1, 1)
+        df = pd.DataFrame(
+            [(start + timedelta(days=i), 80 + np.sin(i / 10), user) for user in ('ana', 'bob') for i in range(3000)],
+            columns=['date', 'weight', 'username']
+        )
+        result = downsample(df, 400, by='username')
+        self.assertEqual(result.groupby('username').size().to_dict(), {'ana': 200, 'bob': 200})
+        self.assertEqual(result[result.username == 'ana']['date'].iloc[-1], start + timedelta(days=2999))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import unittest
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from winter.modules.figures import FigureCache, FrozenFigure, figure_cache, fingerprint, weight_figure
+
+
+def weights(values) -> pd.DataFrame:
+    return pd.DataFrame({'date': [date(2024, 10, day) for day in range(1, len(values) + 1)], 'weight': values})
+
+
+class TestFingerprint(unittest.TestCase):
+    def test_equal_data_same_fingerprint(self):
+        self.assertEqual(fingerprint(weights([80.0, 79.5]), 500), fingerprint(weights([80.0, 79.5]), 500))
+        self.assertEqual(fingerprint(np.arange(6).reshape(2, 3)), fingerprint(np.arange(6).reshape(2, 3)))
+
+    def test_changes_change_fingerprint(self):
+        base = fingerprint(weights([80.0, 79.5]), 500)
+        self.assertNotEqual(base, fingerprint(weights([80.0, 79.4]), 500))
+        self.assertNotEqual(base, fingerprint(weights([80.0, 79.5]), 400))
+        self.assertNotEqual(base, fingerprint(weights([80.0, 79.5]).rename(columns={'weight': 'kg'}), 500))
+        self.assertNotEqual(fingerprint(np.arange(6).reshape(2, 3)), fingerprint(np.arange(6).reshape(3, 2)))
+
+
+class TestFigureCache(unittest.TestCase):
+    def setUp(self):
+        figure_cache.clear()
+
+    def tearDown(self):
+        figure_cache.clear()
+
+    def test_unchanged_data_reuses_figure(self):
+        first = weight_figure(weights([80.0, 79.5, 79.0]), 500, 75.0)
+        second = weight_figure(weights([80.0, 79.5, 79.0]), 500, 75.0)
+        self.assertIs(first, second)
+        self.assertIsInstance(first, FrozenFigure)
+        self.assertIs(first.to_dict(), second.to_dict())
+        built = weight_figure.__wrapped__(weights([80.0, 79.5, 79.0]), 500, 75.0)
+        self.assertEqual(json.loads(first.to_json()), json.loads(built.to_json()))
+
+        changed = weight_figure(weights([80.0, 79.5, 79.0]), 500, 70.0)
+        self.assertIsNot(changed, first)
+        self.assertEqual(changed.layout.shapes[0].y0, 70.0)
+
+    def test_bounded_by_bytes(self):
+        cache = FigureCache(max_bytes=16000)
+        for target in (1, 2, 3):
+            cache.get_or_build(str(target), lambda: weight_figure.__wrapped__(weights([80.0] * 10), 500, target))
+        stats = cache.stats()
+        self.assertLessEqual(stats["bytes"], 16000)
+        self.assertGreater(stats["evictions"], 0)
+        self.assertEqual(stats["size"], 3 - stats["evictions"])
+
+
+if __name__ == '__main__':
+    unittest.main()
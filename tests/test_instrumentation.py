@@ -0,0 +1,68 @@
+import unittest
+from datetime import date
+
+from winter.modules import instrumentation
+from winter.modules.cache import query_cache
+from winter.modules.database import get_user_points, save_daily_activity
+from tests.support import DatabaseTestCase
+
+
+class TestInstrumentation(DatabaseTestCase):
+    users = ('ana',)
+
+    def setUp(self):
+        instrumentation.reset()
+        super().setUp()
+
+    def tearDown(self):
+        instrumentation.set_enabled(False)
+        instrumentation.reset()
+
+    def test_disabled_is_noop(self):
+        instrumentation.set_enabled(False)
+        with instrumentation.page_run("home", self.ana) as run:
+            with instrumentation.timed("points"):
+                get_user_points(self.ana)
+        self.assertIsNone(run)
+        self.assertIsNone(instrumentation.last_run("home"))
+
+    def test_run_records_sections_and_sql(self):
+        instrumentation.set_enabled(True)
+        with instrumentation.page_run("tracker", self.ana):
+            with instrumentation.timed("save"):
+                save_daily_activity(self.ana, date(2024, 10, 1), {'physical_activity': True})
+            with instrumentation.timed("save"):
+                save_daily_activity(self.ana, date(2024, 10, 2), {'diet_nutrition': True})
+
+        summary = instrumentation.last_run("tracker").as_dict()
+        self.assertEqual(summary["user_id"], self.ana)
+        self.assertEqual(list(summary["sections_ms"]), ["save"])
+        self.assertGreater(summary["sql_statements"], 0)
+        self.assertGreaterEqual(summary["duration_ms"], summary["sections_ms"]["save"])
+
+    def test_statements_by_section(self):
+        instrumentation.set_enabled(True)
+        with instrumentation.page_run("tracker", self.ana):
+            get_user_points(self.ana)
+            with instrumentation.timed("form"):
+                with instrumentation.timed("save"):
+                    save_daily_activity(self.ana, date(2024, 10, 1), {'physical_activity': True})
+                query_cache.clear()
+                get_user_points(self.ana)
+
+        by_section = instrumentation.last_run("tracker").as_dict()["sql_statements_by_section"]
+        self.assertEqual(set(by_section), {"-", "save", "form"})
+        self.assertEqual(by_section["form"], 1)
+
+    def test_render_metrics(self):
+        instrumentation.set_enabled(True)
+        with instrumentation.page_run("home", self.ana):
+            get_user_points(self.ana)
+        text = instrumentation.render_metrics()
+        self.assertIn('winter_page_runs_total{page="home"} 1', text)
+        self.assertIn('winter_sql_statements_total{page="home"}', text)
+        self.assertIn('winter_cache_misses', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
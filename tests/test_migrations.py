@@ -0,0 +1,220 @@
+import os
+import unittest
+from datetime import date
+from unittest import mock
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from winter.modules import database
+from winter.scripts import bootstrap, migrate, partitions
+from tests.support import DatabaseTestCase
+
+# Base de datos PostgreSQL para las pruebas de particiones e índices concurrentes.
+# Se borra por completo en cada prueba
+POSTGRES_URL = os.environ.get("WINTER_TEST_POSTGRES_URL")
+
+
+def create_baseline_schema(connection):
+    """
+    Creates the tables as they were before the first migration: no unique
+    index per user and day, no monthly_points and no stored points.
+    """
+    primary_key = 'SERIAL PRIMARY KEY' if connection.dialect.name == 'postgresql' else 'INTEGER PRIMARY KEY'
+    connection.execute(text(
+        f'CREATE TABLE users (id {primary_key}, username VARCHAR NOT NULL UNIQUE, password_hash VARCHAR NOT NULL)'
+    ))
+    connection.execute(text(
+        f'CREATE TABLE daily_activities (id {primary_key}, user_id INTEGER NOT NULL REFERENCES users (id), '
+        'date DATE NOT NULL, physical_activity BOOLEAN, diet_nutrition BOOLEAN, rest_recovery BOOLEAN, '
+        'personal_development BOOLEAN)'
+    ))
+    connection.execute(text(
+        f'CREATE TABLE weight_entries (id {primary_key}, user_id INTEGER NOT NULL REFERENCES users (id), '
+        'date DATE NOT NULL, weight FLOAT NOT NULL)'
+    ))
+
+
+def insert_baseline_rows(connection):
+    """
+    One user with two rows for 2024-10-01 (the later one complete) and one
+    for 2024-10-02, as the old tracker inserted them on every page view.
+    """
+    connection.execute(text("INSERT INTO users (username, password_hash) VALUES ('ana', 'x')"))
+    insert = text(
+        'INSERT INTO daily_activities (user_id, date, physical_activity, diet_nutrition, rest_recovery, '
+        'personal_development) VALUES (1, :date, :pa, :dn, :rr, :pd)'
+    )
+    connection.execute(insert, {'date': '2024-10-01', 'pa': True, 'dn': False, 'rr': False, 'pd': False})
+    connection.execute(insert, {'date': '2024-10-01', 'pa': True, 'dn': True, 'rr': True, 'pd': True})
+    connection.execute(insert, {'date': '2024-10-02', 'pa': False, 'dn': True, 'rr': False, 'pd': False})
+    connection.execute(text("INSERT INTO weight_entries (user_id, date, weight) VALUES (1, '2024-10-01', 80.0)"))
+
+
+class MigrationChecks:
+    """
+    Upgrade checks shared by the SQLite and PostgreSQL test cases.
+    """
+
+    def prepare_baseline(self):
+        with database.get_engine().begin() as connection:
+            create_baseline_schema(connection)
+            insert_baseline_rows(connection)
+
+    def test_upgrade_from_baseline_with_duplicates(self):
+        self.prepare_baseline()
+        self.assertEqual(migrate.upgrade(), [number for number, *_ in migrate.MIGRATIONS])
+
+        with database.get_engine().begin() as connection:
+            self.assertEqual(migrate.current_version(connection), migrate.LATEST_VERSION)
+            rows = connection.execute(text('SELECT date, points FROM daily_activities ORDER BY date')).all()
+            monthly = connection.execute(text(
+                'SELECT physical_activity, diet_nutrition, total_points FROM monthly_points'
+            )).all()
+            tables = set(inspect(connection).get_table_names())
+
+        # Una fila por día con las actividades de todos sus duplicados y sus puntos guardados
+        self.assertEqual([(str(day), points) for day, points in rows], [('2024-10-01', 4), ('2024-10-02', 1)])
+        self.assertEqual([tuple(row) for row in monthly], [(1, 2, 5)])
+        self.assertTrue({'schema_version', 'app_state', 'data_changes', 'snapshots'} <= tables)
+
+        with self.assertRaises(IntegrityError):
+            with database.get_engine().begin() as connection:
+                connection.execute(text(
+                    "INSERT INTO daily_activities (user_id, date, points) VALUES (1, '2024-10-02', 0)"
+                ))
+
+    def test_duplicates_are_merged(self):
+        with database.get_engine().begin() as connection:
+            create_baseline_schema(connection)
+            connection.execute(text("INSERT INTO users (username, password_hash) VALUES ('ana', 'x')"))
+            insert = text(
+                'INSERT INTO daily_activities (user_id, date, physical_activity, diet_nutrition, rest_recovery, '
+                'personal_development) VALUES (1, :date, :pa, :dn, :rr, :pd)'
+            )
+            # La fila con las actividades guardadas es la de id menor
+            connection.execute(insert, {'date': '2024-10-01', 'pa': True, 'dn': True, 'rr': True, 'pd': False})
+            connection.execute(insert, {'date': '2024-10-01', 'pa': False, 'dn': False, 'rr': None, 'pd': True})
+            connection.execute(insert, {'date': '2024-10-01', 'pa': False, 'dn': False, 'rr': False, 'pd': False})
+        migrate.upgrade()
+
+        with database.get_engine().begin() as connection:
+            rows = connection.execute(text(
+                'SELECT physical_activity, diet_nutrition, rest_recovery, personal_development, points '
+                'FROM daily_activities'
+            )).all()
+        self.assertEqual([tuple(bool(value) for value in row[:4]) + (row[4],) for row in rows],
+                         [(True, True, True, True, 4)])
+
+    def test_second_upgrade_is_noop(self):
+        self.prepare_baseline()
+        migrate.upgrade()
+        with database.get_engine().begin() as connection:
+            before = connection.execute(text('SELECT COUNT(*) FROM daily_activities')).scalar()
+
+        self.assertEqual(migrate.upgrade(), [])
+        with database.get_engine().begin() as connection:
+            self.assertEqual(connection.execute(text('SELECT COUNT(*) FROM daily_activities')).scalar(), before)
+            self.assertEqual(connection.execute(text('SELECT COUNT(*) FROM schema_version')).scalar(),
+                             len(migrate.MIGRATIONS))
+
+    def test_failed_rebuild_rolls_back(self):
+        self.prepare_baseline()
+        with mock.patch.object(migrate, 'MIGRATIONS', migrate.MIGRATIONS[:5]):
+            migrate.upgrade()
+
+        def interrupted(connection, **kwargs):
+            connection.execute(text('DELETE FROM monthly_points'))
+            raise RuntimeError("interrupted")
+
+        with mock.patch.object(migrate, 'rebuild_monthly_points', side_effect=interrupted):
+            with self.assertRaises(RuntimeError):
+                migrate.upgrade()
+
+        with database.get_engine().begin() as connection:
+            self.assertEqual(migrate.current_version(connection), 5)
+            # El DELETE se deshace con el resto de la migración
+            self.assertEqual(connection.execute(text('SELECT total_points FROM monthly_points')).scalars().all(), [5])
+        self.assertEqual(migrate.upgrade(), [number for number, *_ in migrate.MIGRATIONS[5:]])
+
+    def test_upgrade_empty_database(self):
+        self.assertEqual(len(migrate.upgrade()), len(migrate.MIGRATIONS))
+        database.create_user('ana', 'secret')
+        database.save_daily_activity(database.get_user_id('ana'), date(2024, 10, 1), {'diet_nutrition': True})
+        self.assertEqual(database.get_user_points(database.get_user_id('ana'), date(2024, 10, 1))['points'], 1)
+
+
+class TestSQLiteMigrations(MigrationChecks, DatabaseTestCase):
+    create_tables = False
+    users = ()
+
+
+@unittest.skipUnless(POSTGRES_URL, "WINTER_TEST_POSTGRES_URL is not set")
+class TestPostgresMigrations(MigrationChecks, unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(database.configure_database, None)
+        database.configure_database(POSTGRES_URL)
+        with database.get_engine().begin() as connection:
+            connection.execute(text('DROP SCHEMA public CASCADE'))
+            connection.execute(text('CREATE SCHEMA public'))
+
+    def test_partitions(self):
+        self.prepare_baseline()
+        migrate.upgrade()
+
+        with database.get_engine().begin() as connection:
+            self.assertTrue(partitions.is_partitioned(connection))
+            names = partitions.list_partitions(connection)
+            self.assertIn(partitions.partition_name(date(2024, 10, 1)), names)
+            self.assertIn(partitions.partition_name(date.today().replace(day=1)), names)
+            # Ya creadas: una segunda pasada no crea nada
+            self.assertEqual(partitions.ensure_partitions(connection), [])
+            count = connection.execute(text(
+                f'SELECT COUNT(*) FROM {partitions.partition_name(date(2024, 10, 1))}'
+            )).scalar()
+            self.assertEqual(count, 2)
+
+            self.assertEqual(partitions.detach_partition(connection, date(2024, 10, 1)),
+                             partitions.partition_name(date(2024, 10, 1)))
+            self.assertNotIn(partitions.partition_name(date(2024, 10, 1)), partitions.list_partitions(connection))
+
+    def test_concurrent_index_build(self):
+        self.prepare_baseline()
+        with database.get_engine().connect() as connection:
+            connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+            migrate.create_index(connection, 'ix_test_weight_date', 'weight_entries', ['date'])
+            # Repetirlo no falla: IF NOT EXISTS
+            migrate.create_index(connection, 'ix_test_weight_date', 'weight_entries', ['date'])
+            valid = connection.execute(text(
+                "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = 'ix_test_weight_date'"
+            )).scalar()
+        self.assertTrue(valid)
+
+
+class TestBootstrap(DatabaseTestCase):
+    create_tables = False
+    users = ()
+
+    def setUp(self):
+        super().setUp()
+        bootstrap.reset()
+        self.addCleanup(bootstrap.reset)
+
+    def test_runs_once_per_process(self):
+        with mock.patch.object(bootstrap, 'upgrade', wraps=migrate.upgrade) as upgrade, \
+                mock.patch.object(bootstrap, 'sync_points_weights', wraps=database.sync_points_weights) as sync:
+            self.assertEqual(bootstrap.bootstrap(), migrate.LATEST_VERSION)
+            self.assertEqual(bootstrap.bootstrap(), migrate.LATEST_VERSION)
+            self.assertEqual(upgrade.call_count, 1)
+            self.assertEqual(sync.call_count, 1)
+
+            # En un proceso nuevo con la base de datos ya al día no se migra nada
+            bootstrap.reset()
+            bootstrap.bootstrap()
+            self.assertEqual(upgrade.call_count, 1)
+            self.assertEqual(sync.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import contextvars
+import threading
+import time
+import unittest
+from unittest import mock
+
+from winter.modules import prefetch as prefetch_module
+from winter.modules.prefetch import prefetch
+
+request_id = contextvars.ContextVar('request_id', default=None)
+
+
+def slow(value, delay=0.2):
+    time.sleep(delay)
+    return value, threading.current_thread().name, request_id.get()
+
+
+class TestPrefetch(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(prefetch_module.database, 'supports_concurrent_reads', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_runs_concurrently_with_context(self):
+        request_id.set('r1')
+        start = time.perf_counter()
+        data = prefetch(a=(slow, 1), b=(slow, 2), c=(slow, 3))
+        results = [data.get(name, slow, value) for name, value in (('a', 1), ('b', 2), ('c', 3))]
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual([value for value, _, _ in results], [1, 2, 3])
+        self.assertTrue(all(thread.startswith('winter-prefetch') for _, thread, _ in results))
+        self.assertEqual({rid for _, _, rid in results}, {'r1'})
+        self.assertLess(elapsed, 0.5)
+
+    def test_changed_arguments_run_inline(self):
+        data = prefetch(a=(slow, 1, 0))
+        value, thread, _ = data.get('a', slow, 2, 0)
+        self.assertEqual(value, 2)
+        self.assertEqual(thread, threading.current_thread().name)
+
+    def test_result_is_handed_out_once(self):
+        data = prefetch(a=(slow, 1, 0))
+        self.assertTrue(data.get('a', slow, 1, 0)[1].startswith('winter-prefetch'))
+        self.assertEqual(data.get('a', slow, 1, 0)[1], threading.current_thread().name)
+
+    def test_errors_surface_on_get(self):
+        def fail():
+            raise ValueError("boom")
+        data = prefetch(a=(fail,))
+        with self.assertRaises(ValueError):
+            data.get('a', fail)
+
+    def test_fan_out_per_run_is_bounded(self):
+        running, peak, lock = [0], [0], threading.Lock()
+
+        def tracked(value):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.1)
+            with lock:
+                running[0] -= 1
+            return value
+
+        with mock.patch.dict(prefetch_module.PREFETCH_CONFIG, {"max_per_run": 2}):
+            data = prefetch(**{name: (tracked, name) for name in 'abcdef'})
+            time.sleep(0.35)
+            self.assertEqual([data.get(name, tracked, name) for name in 'abcdef'], list('abcdef'))
+        self.assertEqual(peak[0], 2)
+
+    def test_concurrent_callers(self):
+        # Varias sesiones a la vez: sus consultas no esperan a que acaben las de las demás
+        workers = prefetch_module._get_executor()._max_workers
+        self.assertEqual(workers, prefetch_module.database.get_read_pool_capacity())
+        users = workers // 3
+        results = {}
+
+        def page(user):
+            request_id.set(user)
+            data = prefetch(a=(slow, 1), b=(slow, 2), c=(slow, 3))
+            results[user] = [data.get(name, slow, value) for name, value in (('a', 1), ('b', 2), ('c', 3))]
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=page, args=(user,)) for user in range(users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.35)
+        for user, rows in results.items():
+            self.assertEqual([value for value, _, _ in rows], [1, 2, 3])
+            self.assertEqual({rid for _, _, rid in rows}, {user})
+
+    def test_inline_without_concurrent_reads(self):
+        prefetch_module.database.supports_concurrent_reads.return_value = False
+        data = prefetch(a=(slow, 1, 0))
+        self.assertEqual(data.get('a', slow, 1, 0)[1], threading.current_thread().name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from winter import settings
+from winter.modules import profiler
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config = {"enabled": True, "dir": self.directory, "threshold_ms": 0, "keep": 3}
+        patcher = mock.patch.object(settings, 'PROFILER_CONFIG', self.config, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        profiler.set_enabled(True)
+        self.addCleanup(profiler.set_enabled, False)
+
+    def test_disabled_is_noop(self):
+        profiler.set_enabled(False)
+        with profiler.profiled("ranking", 1) as profile:
+            sum(range(1000))
+        self.assertIsNone(profile)
+        self.assertEqual(profiler.list_profiles(), [])
+
+    def test_slow_run_is_saved_and_tagged(self):
+        with profiler.profiled("ranking", 7):
+            sum(range(1000))
+        [path] = profiler.list_profiles()
+        name = os.path.basename(path)
+        self.assertIn("_ranking_u7_", name)
+        self.assertTrue(name.endswith("ms.prof"))
+
+    def test_fast_run_is_discarded(self):
+        self.config["threshold_ms"] = 60_000
+        with profiler.profiled("ranking", 7):
+            pass
+        self.assertEqual(profiler.list_profiles(), [])
+
+    def test_rotation_keeps_newest(self):
+        for i in range(5):
+            with profiler.profiled(f"page{i}", 1):
+                pass
+            # mtime distinto para que el orden sea estable
+            path = profiler.list_profiles()[0]
+            os.utime(path, (i, i))
+        names = [os.path.basename(p) for p in profiler.list_profiles()]
+        self.assertEqual(len(names), 3)
+        self.assertTrue(names[0].split('_')[1] == "page4")
+
+    def test_failed_enable_releases_the_lock(self):
+        error = ValueError("Another profiling tool is already active")
+        with mock.patch.object(profiler.cProfile.Profile, 'enable', side_effect=error):
+            with profiler.profiled("page", 1) as profile:
+                self.assertIsNone(profile)
+        self.assertEqual(profiler.list_profiles(), [])
+
+        # Las siguientes ejecuciones se siguen perfilando
+        with profiler.profiled("page", 1) as profile:
+            self.assertIsNotNone(profile)
+        self.assertEqual(len(profiler.list_profiles()), 1)
+
+    def test_overlapping_runs_are_skipped(self):
+        with profiler.profiled("outer", 1):
+            with profiler.profiled("inner", 1) as inner:
+                self.assertIsNone(inner)
+        self.assertEqual(len(profiler.list_profiles()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+import unittest
+
+import numpy as np
+
+from winter.modules.scoring import rank, rank_label, ranks
+
+
+class TestScoring(unittest.TestCase):
+    def test_rank_boundaries(self):
+        points = [-1, 0, 30, 31, 60, 61, 90, 91, 110, 111, 119, 120, 124]
+        expected = ['Estudiante', 'Estudiante', 'Estudiante', 'Genin', 'Genin', 'Chunin', 'Chunin',
+                    'Jounin', 'Jounin', 'Sannin', 'Sannin', 'Hokage', 'Hokage']
+        self.assertEqual(list(ranks(points)), expected)
+        self.assertEqual([rank(p) for p in points], expected)
+
+    def test_rank_label(self):
+        self.assertEqual(rank_label(115), "🏆 Sannin Legendario")
+        self.assertEqual(rank_label(np.int64(120)), "👑 Hokage")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from winter import settings
+
+# Presupuesto de importación de los scripts de línea de comandos (segundos)
+SCRIPT_IMPORT_BUDGET = 1.0
+HEAVY_MODULES = ('streamlit', 'pandas', 'plotly')
+
+
+class TestSettingsResolution(unittest.TestCase):
+    def tearDown(self):
+        settings.reload_settings()
+
+    def test_resolution_order(self):
+        with mock.patch('winter.settings._secrets', return_value={'A': 'secrets'}), \
+                mock.patch('winter.settings._dotenv', return_value={'A': 'dotenv', 'B': 'dotenv'}), \
+                mock.patch.dict(os.environ, {'A': 'env', 'B': 'env', 'C': 'env'}):
+            self.assertEqual(settings.get_setting('A'), 'secrets')
+            self.assertEqual(settings.get_setting('B'), 'dotenv')
+            self.assertEqual(settings.get_setting('C'), 'env')
+            self.assertEqual(settings.get_setting('D', 'default'), 'default')
+
+    def test_database_url_is_resolved_lazily(self):
+        settings.reload_settings()
+        with mock.patch('winter.settings._secrets', return_value={}), \
+                mock.patch('winter.settings._dotenv', return_value={}), \
+                mock.patch.dict(os.environ, {'DATABASE_URL': 'sqlite:///lazy.db'}):
+            self.assertEqual(settings.DATABASE_URL, 'sqlite:///lazy.db')
+            self.assertEqual(settings.DB_CONNECT_ARGS, {'check_same_thread': False})
+
+    def test_postgres_url_from_parts(self):
+        settings.reload_settings()
+        parts = {'POSTGRES_USER': 'ana', 'POSTGRES_PASSWORD': 'p@ss', 'POSTGRES_HOST': 'db', 'POSTGRES_DB': 'winter'}
+        with mock.patch('winter.settings._secrets', return_value=parts), \
+                mock.patch('winter.settings._dotenv', return_value={}), \
+                mock.patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(settings.DATABASE_URL, 'postgresql://ana:p%40ss@db:5432/winter')
+            self.assertEqual(settings.DB_CONNECT_ARGS, {'sslmode': 'require'})
+
+
+class TestImportBudget(unittest.TestCase):
+    def _import(self, module: str) -> dict:
+        code = (
+            "import json, sys, time\n"
+            "start = time.perf_counter()\n"
+            f"import {module}\n"
+            "print(json.dumps({'seconds': time.perf_counter() - start, 'modules': list(sys.modules)}))\n"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+        return json.loads(output.stdout)
+
+    def test_scripts_import_without_heavy_modules(self):
+        for module in ('winter.modules.database', 'winter.scripts.add_user', 'winter.scripts.init_db',
+                       'winter.scripts.migrate'):
+            with self.subTest(module=module):
+                result = self._import(module)
+                self.assertFalse([m for m in HEAVY_MODULES if m in result['modules']])
+                self.assertLess(result['seconds'], SCRIPT_IMPORT_BUDGET)
+
+
+if __name__ == '__main__':
+    unittest.main()
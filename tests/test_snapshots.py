@@ -0,0 +1,188 @@
+import json
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+
+from winter import settings
+from winter.modules import snapshots
+from winter.modules.bitsets import get_range_bits
+from winter.modules.cache import query_cache
+from winter.modules.database import (
+    DataChange, Snapshot, add_weight_entry, get_monthly_leaderboard, rebuild_monthly_points, save_daily_activity,
+    session_scope, sync_points_weights
+)
+from winter.modules.snapshots import (
+    leaderboard_name, refresh_snapshots, snapshot_group_weights, snapshot_leaderboard, snapshot_range_bits,
+    snapshot_streaks
+)
+from winter.modules.streaks import get_streaks
+from winter.settings import POINTS_PER_ACTIVITY, SNAPSHOT_CONFIG
+from tests.support import DatabaseTestCase
+
+ALL = {'physical_activity': True, 'diet_nutrition': True, 'rest_recovery': True, 'personal_development': True}
+
+
+class TestSnapshots(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(settings, 'SNAPSHOTS_ENABLED', True, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.today = date.today()
+        self.month = self.today.replace(day=1)
+
+    def test_snapshots_match_live_results(self):
+        save_daily_activity(self.ana, self.today, ALL)
+        save_daily_activity(self.bob, self.today, {'diet_nutrition': True})
+        add_weight_entry(self.ana, self.today, 80.0)
+
+        summary = refresh_snapshots()
+        self.assertIn(leaderboard_name(self.month), summary['computed'])
+        with session_scope() as session:
+            self.assertEqual(session.query(DataChange).count(), 0)
+
+        live_leaderboard = [tuple(row) for row in get_monthly_leaderboard(self.month)]
+        live_streaks = get_streaks()
+        live_bits = get_range_bits(self.month, self.today)
+        query_cache.clear()
+
+        self.assertEqual(sorted(tuple(row) for row in snapshot_leaderboard(self.month, self.ana)),
+                         sorted(live_leaderboard))
+        self.assertEqual(snapshot_streaks(self.ana), live_streaks)
+        for snapshot, live in zip(snapshot_range_bits(self.month, self.today, self.ana), live_bits):
+            self.assertEqual(snapshot.user_ids.tolist(), live.user_ids.tolist())
+            self.assertEqual(snapshot.bits.tolist(), live.bits.tolist())
+        self.assertEqual([(row.date, row.weight, row.username) for row in snapshot_group_weights(None, self.ana)],
+                         [(self.today, 80.0, 'ana')])
+
+        # Sin cambios nuevos la siguiente pasada no recalcula nada
+        self.assertEqual(refresh_snapshots()['computed'], [])
+
+    def test_own_unprocessed_save_reads_live(self):
+        save_daily_activity(self.ana, self.today, {'physical_activity': True})
+        refresh_snapshots()
+        with session_scope() as session:
+            session.query(Snapshot).filter(Snapshot.name == leaderboard_name(self.month)).update(
+                {Snapshot.payload: '[]'}, synchronize_session=False)
+        query_cache.clear()
+        # La instantánea (vaciada a propósito) cubre los cambios de los dos usuarios
+        self.assertEqual(snapshot_leaderboard(self.month, self.bob), [])
+
+        save_daily_activity(self.ana, self.today, ALL)
+        # Ana aún no está en la instantánea: ve su cambio desde la consulta en vivo
+        totals = {row.username: row.total_points for row in snapshot_leaderboard(self.month, self.ana)}
+        self.assertEqual(totals, {'ana': 4})
+        self.assertEqual(snapshot_leaderboard(self.month, self.bob), [])
+
+        refresh_snapshots()
+        totals = {row.username: row.total_points for row in snapshot_leaderboard(self.month, self.ana)}
+        self.assertEqual(totals, {'ana': 4})
+
+    def test_late_commit_with_lower_id_is_not_skipped(self):
+        save_daily_activity(self.ana, self.today, {'physical_activity': True})
+        save_daily_activity(self.bob, self.today, {'diet_nutrition': True})
+        with session_scope() as session:
+            late_id, bob_id = [change_id for (change_id,) in session.query(DataChange.id).order_by(DataChange.id)]
+            # El cambio de Ana aún no está confirmado cuando pasa el worker
+            session.query(DataChange).filter(DataChange.id == late_id).delete(synchronize_session=False)
+        self.assertEqual(refresh_snapshots()['watermark'], bob_id)
+
+        # Se confirma después, con un id menor que la marca de agua
+        save_daily_activity(self.ana, self.today, ALL)
+        with session_scope() as session:
+            session.query(DataChange).filter(DataChange.user_id == self.ana).update(
+                {DataChange.id: late_id}, synchronize_session=False)
+        query_cache.clear()
+        totals = {row.username: row.total_points for row in snapshot_leaderboard(self.month, self.ana)}
+        self.assertEqual(totals, {'ana': 4, 'bob': 1})
+
+        summary = refresh_snapshots()
+        self.assertEqual((summary['changes'], summary['pruned'], summary['watermark']), (1, 1, bob_id))
+        query_cache.clear()
+        totals = {row.username: row.total_points for row in snapshot_leaderboard(self.month, self.bob)}
+        self.assertEqual(totals, {'ana': 4, 'bob': 1})
+
+    def test_stale_snapshots_are_ignored(self):
+        save_daily_activity(self.ana, self.today, ALL)
+        refresh_snapshots()
+        with session_scope() as session:
+            session.query(Snapshot).update({
+                Snapshot.payload: '[]',
+                Snapshot.computed_at: snapshots._utcnow() - timedelta(seconds=SNAPSHOT_CONFIG["max_age_seconds"] + 1)
+            }, synchronize_session=False)
+        query_cache.clear()
+
+        totals = {row.username: row.total_points for row in snapshot_leaderboard(self.month, self.bob)}
+        self.assertEqual(totals, {'ana': 4})
+
+    def test_points_rewrite_rebuilds_every_snapshot(self):
+        save_daily_activity(self.ana, self.today, {'physical_activity': True, 'diet_nutrition': True})
+        sync_points_weights()
+        refresh_snapshots()
+        self.assertEqual(refresh_snapshots()['computed'], [])
+
+        with mock.patch.dict(POINTS_PER_ACTIVITY, {'physical_activity': 5}):
+            self.assertTrue(sync_points_weights())
+            # Las instantáneas con los pesos anteriores ya no se sirven
+            query_cache.clear()
+            totals = {row.username: row.total_points for row in snapshot_leaderboard(self.month, self.bob)}
+            self.assertEqual(totals, {'ana': 6})
+
+            summary = refresh_snapshots()
+            self.assertIn(leaderboard_name(self.month), summary['computed'])
+            self.assertIn(snapshots.streaks_name(self.today), summary['computed'])
+            with session_scope() as session:
+                self.assertEqual(session.query(DataChange).count(), 0)
+                payload = session.get(Snapshot, leaderboard_name(self.month)).payload
+            self.assertEqual([row.total_points for row in snapshots._decode_leaderboard(json.loads(payload))], [6])
+
+        # Igual al reconstruir monthly_points a mano
+        rebuild_monthly_points()
+        with session_scope() as session:
+            self.assertEqual(session.query(Snapshot).count(), 0)
+        self.assertIn(leaderboard_name(self.month), refresh_snapshots()['computed'])
+
+    def test_unchanged_snapshots_are_recomputed_before_expiring(self):
+        save_daily_activity(self.ana, self.today, ALL)
+        refresh_snapshots()
+        with session_scope() as session:
+            before = dict(session.query(Snapshot.name, Snapshot.computed_at))
+        # Una pasada sin cambios no renueva computed_at
+        refresh_snapshots()
+        with session_scope() as session:
+            self.assertEqual(dict(session.query(Snapshot.name, Snapshot.computed_at)), before)
+
+            old = snapshots._utcnow() - timedelta(seconds=SNAPSHOT_CONFIG["refresh_seconds"] + 1)
+            session.query(Snapshot).filter(Snapshot.name == leaderboard_name(self.month)).update(
+                {Snapshot.computed_at: old}, synchronize_session=False)
+        self.assertEqual(refresh_snapshots()['computed'],
+                         [leaderboard_name(self.month), snapshots.month_bits_name(self.month)])
+
+    def test_disabled_logs_nothing_and_reads_live(self):
+        save_daily_activity(self.ana, self.today, {'physical_activity': True})
+        refresh_snapshots()
+        with mock.patch.object(settings, 'SNAPSHOTS_ENABLED', False):
+            # Sin worker el registro no crece
+            save_daily_activity(self.ana, self.today, ALL)
+            add_weight_entry(self.ana, self.today, 80.0)
+            with session_scope() as session:
+                self.assertEqual(session.query(DataChange).count(), 0)
+
+            query_cache.clear()
+            totals = {row.username: row.total_points for row in snapshot_leaderboard(self.month, self.bob)}
+            self.assertEqual(totals, {'ana': 4})
+
+    def test_previous_days_are_removed(self):
+        yesterday = self.today - timedelta(days=1)
+        refresh_snapshots(today=yesterday)
+        summary = refresh_snapshots()
+        # Las rachas y los pesos con fecha de inicio; el de todo el historial se conserva
+        self.assertEqual(summary['removed'], 1 + len(snapshots.WEIGHT_PERIODS) - 1)
+        with session_scope() as session:
+            names = {name for (name,) in session.query(Snapshot.name)}
+        self.assertIn(snapshots.streaks_name(self.today), names)
+        self.assertNotIn(snapshots.streaks_name(yesterday), names)
+
+
+if __name__ == '__main__':
+    unittest.main()
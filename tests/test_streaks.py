@@ -0,0 +1,41 @@
+import unittest
+from datetime import date, timedelta
+
+from winter.modules.database import save_daily_activity
+from winter.modules.streaks import ALL, NO_STREAK, Streak, get_streaks, get_user_streaks
+from tests.support import DatabaseTestCase
+
+ALL_DONE = {'physical_activity': True, 'diet_nutrition': True, 'rest_recovery': True, 'personal_development': True}
+TODAY = date(2024, 10, 20)
+
+
+class TestStreaks(DatabaseTestCase):
+    def save(self, user_id, days_ago, values):
+        save_daily_activity(user_id, TODAY - timedelta(days=days_ago), values)
+
+    def test_current_and_longest(self):
+        # Racha de 4 días terminada hace una semana y racha actual de 2 (ayer y anteayer)
+        for days_ago in (10, 9, 8, 7, 2, 1):
+            self.save(self.ana, days_ago, ALL_DONE)
+        # Un día con solo actividad física no cuenta para "todas"
+        self.save(self.ana, 0, {'physical_activity': True})
+
+        streaks = get_user_streaks(self.ana, TODAY)
+        self.assertEqual(streaks[ALL], Streak(2, 4))
+        self.assertEqual(streaks['physical_activity'], Streak(3, 4))
+        self.assertEqual(get_user_streaks(self.bob, TODAY)[ALL], NO_STREAK)
+
+    def test_broken_streak_is_not_current(self):
+        for days_ago in (5, 4, 3):
+            self.save(self.bob, days_ago, ALL_DONE)
+        self.assertEqual(get_user_streaks(self.bob, TODAY)[ALL], Streak(0, 3))
+
+    def test_save_refreshes_cached_streaks(self):
+        self.save(self.ana, 1, ALL_DONE)
+        self.assertEqual(get_streaks(TODAY)[self.ana][ALL], Streak(1, 1))
+        self.save(self.ana, 0, ALL_DONE)
+        self.assertEqual(get_streaks(TODAY)[self.ana][ALL], Streak(2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+
+import bcrypt
+
+from winter import settings
+from winter.modules.database import get_user_credentials, set_session_user
+
+# Cookie con el token de sesión: sobrevive a recargas y pestañas nuevas sin ir en la URL
+SESSION_COOKIE = 'winter_session'
+
+_secret = None
+_sessions = {}
+_revoked = {}
+_lock = threading.Lock()
+
+
+def authenticate(username: str, password: str):
+    """
+    Checks the credentials with a single user lookup.
+    Returns the user id, or None if they are invalid.
+    """
+    user = get_user_credentials(username)
+    if user and bcrypt.checkpw(password.encode('utf-8'), user.password_hash.encode('utf-8')):
+        return user.id
+    return None
+
+
+def _prune(now: float):
+    for token in [t for t, (_, expires) in _sessions.items() if expires <= now]:
+        del _sessions[token]
+    for token in [t for t, expires in _revoked.items() if expires <= now]:
+        del _revoked[token]
+
+
+def _signing_key() -> bytes:
+    global _secret
+    if _secret is None:
+        secret = settings.SESSION_CONFIG["secret"]
+        if not secret:
+            # Una clave aleatoria cerraría las sesiones en cada reinicio y no valdría entre réplicas:
+            # solo se admite en local (SQLite)
+            if not settings.DATABASE_URL.startswith("sqlite"):
+                raise RuntimeError("SESSION_SECRET must be set outside local SQLite mode.")
+            secret = secrets.token_hex(32)
+        _secret = secret.encode('utf-8')
+    return _secret
+
+
+def check_session_secret():
+    """
+    Raises RuntimeError at startup if SESSION_SECRET is required but unset.
+    """
+    _signing_key()
+
+
+def _sign(payload: str) -> str:
+    return hmac.new(_signing_key(), payload.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def issue_session_token(user_id: int, ttl: int = None) -> str:
+    """
+    Returns a signed token identifying the user until it expires.
+    """
+    expires = int(time.time()) + (ttl or settings.SESSION_CONFIG["ttl"])
+    payload = f"{user_id}:{expires}:{secrets.token_hex(8)}"
+    encoded = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+    token = f"{encoded}.{_sign(payload)}"
+    with _lock:
+        _prune(time.time())
+        _sessions[token] = (user_id, expires)
+    return token
+
+
+def resolve_session_token(token: str):
+    """
+    Returns the user id of a valid, unexpired and unrevoked token, or None.
+    Known tokens are answered from memory; others are verified once by
+    signature and then remembered.
+    """
+    if not token:
+        return None
+    now = time.time()
+    with _lock:
+        cached = _sessions.get(token)
+        if cached is not None:
+            if cached[1] > now:
+                return cached[0]
+            del _sessions[token]
+            return None
+        if token in _revoked:
+            return None
+
+    try:
+        encoded, signature = token.split('.', 1)
+        payload = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8')
+        user_id, expires, _ = payload.split(':', 2)
+        user_id, expires = int(user_id), int(expires)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not hmac.compare_digest(signature, _sign(payload)) or expires <= now:
+        return None
+
+    with _lock:
+        _sessions[token] = (user_id, expires)
+    return user_id
+
+
+def revoke_session_token(token: str):
+    """
+    Invalidates a token before it expires.
+    """
+    now = time.time()
+    with _lock:
+        entry = _sessions.pop(token, None)
+        _revoked[token] = entry[1] if entry else now + settings.SESSION_CONFIG["ttl"]
+        _prune(now)
+
+
+def start_session(session_state, user_id: int) -> str:
+    """
+    Marks the Streamlit session as authenticated and issues its token. The
+    token is left in `session_cookie` for the page to store in the browser.
+    """
+    token = issue_session_token(user_id)
+    session_state['authenticated'] = True
+    session_state['user_id'] = user_id
+    session_state['session_token'] = token
+    session_state['session_cookie'] = token
+    return token
+
+
+def end_session(session_state):
+    """
+    Logs out: revokes the session token and asks the page to delete the
+    cookie.
+    """
+    token = session_state.get('session_token')
+    if token:
+        revoke_session_token(token)
+    for key in ('authenticated', 'user_id', 'session_token'):
+        session_state.pop(key, None)
+    session_state['authenticated'] = False
+    session_state['session_cookie'] = ''
+
+
+def restore_session(session_state, cookies) -> bool:
+    """
+    Marks the Streamlit session as authenticated from the session cookie
+    when the in-memory state was lost (reconnect, new tab).
+    """
+    if not session_state.get('authenticated'):
+        token = cookies.get(SESSION_COOKIE)
+        user_id = resolve_session_token(token)
+        if user_id is not None:
+            session_state['authenticated'] = True
+            session_state['user_id'] = user_id
+            session_state['session_token'] = token
+    # Las lecturas de esta ejecución siguen las escrituras recientes de este usuario
+    set_session_user(session_state.get('user_id') if session_state.get('authenticated') else None)
+    return bool(session_state.get('authenticated'))
+
+
+def cookie_script(token: str) -> str:
+    """
+    HTML snippet that stores `token` in the session cookie of the app's
+    page, or deletes the cookie if `token` is empty. Streamlit cannot set
+    cookies itself; the snippet runs in a same-origin component iframe.
+    """
+    max_age = settings.SESSION_CONFIG["ttl"] if token else 0
+    return (
+        "<script>"
+        "const secure = window.parent.location.protocol === 'https:' ? '; Secure' : '';"
+        f"window.parent.document.cookie = {json.dumps(SESSION_COOKIE)} + '=' + {json.dumps(token)}"
+        f" + '; Max-Age={max_age}; Path=/; SameSite=Strict' + secure;"
+        "</script>"
+    )
@@ -0,0 +1,225 @@
+"""
+Compact activity encoding.
+
+The four flags of a day fit in a 4-bit mask (bit i is the i-th activity of
+POINTS_PER_ACTIVITY), and a whole month of one activity fits in a 32-bit word
+(bit d is day d + 1). MonthBits keeps those words for every user as a
+(users × activities) uint32 array, 16 bytes per user and month, and derives
+the heatmap, the weekly chart, the monthly points and streaks with shifts and
+popcounts instead of reshaping DataFrames.
+"""
+import calendar
+from datetime import date
+
+import numpy as np
+from sqlalchemy import Integer, literal, select
+from sqlalchemy.sql import func
+
+from winter.modules.cache import query_cache
+from winter.modules.database import DailyActivity, month_start, session_scope
+from winter.modules.scoring import ACTIVITIES, WEIGHTS
+from winter.modules.streaks import day_number
+
+BITS = {activity: 1 << index for index, activity in enumerate(ACTIVITIES)}
+ALL_DONE = (1 << len(ACTIVITIES)) - 1
+
+_SHIFTS = np.arange(len(ACTIVITIES), dtype=np.uint32)
+# Puntos de cada máscara posible (16 valores): los puntos de un día son una indexación
+MASK_POINTS = ((np.arange(ALL_DONE + 1)[:, None] >> _SHIFTS) & 1) @ WEIGHTS
+_BYTE_POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+
+def encode(flags: dict) -> int:
+    """
+    Bitmask of a day's {activity: done} flags.
+    """
+    return sum(bit for activity, bit in BITS.items() if flags.get(activity))
+
+
+def decode(mask: int) -> dict:
+    """
+    {activity: done} flags of a bitmask.
+    """
+    return {activity: bool(mask & bit) for activity, bit in BITS.items()}
+
+
+def popcount(words) -> np.ndarray:
+    """
+    Number of set bits of every uint32 word.
+    """
+    words = np.ascontiguousarray(words, dtype=np.uint32)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    # NumPy < 2.0: tabla por byte
+    return _BYTE_POPCOUNT[words.view(np.uint8)].reshape(*words.shape, 4).sum(axis=-1)
+
+
+def longest_run(words) -> np.ndarray:
+    """
+    Length of the longest run of consecutive set bits of every word.
+    """
+    words = np.array(words, dtype=np.uint32)
+    length = np.zeros(words.shape, dtype=np.int64)
+    # Cada iteración acorta todas las rachas en un bit
+    while words.any():
+        length += words != 0
+        words &= words >> np.uint32(1)
+    return length
+
+
+def current_run(words, day: int) -> np.ndarray:
+    """
+    Length of the run of set bits ending at bit `day - 1` (day `day` of
+    the month) of every word; 0 if that bit is not set.
+    """
+    words = np.asarray(words, dtype=np.uint32)
+    gaps = ~words & np.uint32((1 << day) - 1)
+    # La racha empieza justo después del último hueco hasta ese día
+    last_gap = np.floor(np.log2(np.maximum(gaps, 1))).astype(np.int64)
+    return np.where(gaps == 0, day, day - 1 - last_gap)
+
+
+class MonthBits:
+    """
+    Activity words of every user with activity in one month.
+    """
+
+    def __init__(self, month: date, user_ids, bits):
+        self.month = month
+        self.days = calendar.monthrange(month.year, month.month)[1]
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.bits = np.asarray(bits, dtype=np.uint32).reshape(len(self.user_ids), len(ACTIVITIES))
+
+    @classmethod
+    def from_rows(cls, month: date, rows) -> 'MonthBits':
+        """
+        Builds the bitset from (user_id, day of month, mask) rows.
+        """
+        # Convertir las filas a tuplas primero: NumPy recorre los Row de SQLAlchemy muy despacio
+        data = np.array([tuple(row) for row in rows], dtype=np.int64).reshape(-1, 3)
+        user_ids, index = np.unique(data[:, 0], return_inverse=True)
+        done = (data[:, 2:3].astype(np.uint32) >> _SHIFTS) & np.uint32(1)
+        words = done << (data[:, 1:2] - 1).astype(np.uint32)
+        bits = np.zeros((len(user_ids), len(ACTIVITIES)), dtype=np.uint32)
+        np.bitwise_or.at(bits, index, words)
+        return cls(month, user_ids, bits)
+
+    def words(self, user_ids) -> np.ndarray:
+        """
+        (users × activities) words in the order of `user_ids`, zero for
+        users without activity this month.
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        words = np.zeros((len(user_ids), len(ACTIVITIES)), dtype=np.uint32)
+        if len(self.user_ids):
+            position = np.minimum(np.searchsorted(self.user_ids, user_ids), len(self.user_ids) - 1)
+            found = self.user_ids[position] == user_ids
+            words[found] = self.bits[position[found]]
+        return words
+
+    def masks(self, user_ids) -> np.ndarray:
+        """
+        (users × days) uint8 day masks in the order of `user_ids`.
+        """
+        days = np.arange(self.days, dtype=np.uint32)
+        done = (self.words(user_ids)[:, :, None] >> days) & np.uint32(1)
+        return (done << _SHIFTS[:, None]).sum(axis=1).astype(np.uint8)
+
+    def activity_points(self) -> np.ndarray:
+        """
+        (users × activities) monthly points: days done times the weight.
+        """
+        return popcount(self.bits).astype(np.int64) * WEIGHTS
+
+    def total_points(self) -> np.ndarray:
+        return self.activity_points().sum(axis=1)
+
+    def kind_words(self) -> np.ndarray:
+        """
+        (users × kinds) words for every activity plus "all four done".
+        """
+        return np.column_stack([self.bits, np.bitwise_and.reduce(self.bits, axis=1)])
+
+    def streaks(self, day: int = None) -> tuple:
+        """
+        (current, longest) (users × kinds) arrays of streaks within the month,
+        the current one ending on day `day` (the last day by default).
+        """
+        words = self.kind_words()
+        return current_run(words, day or self.days), longest_run(words)
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _mask_expression():
+    """
+    Bitmask of a daily_activities row computed from its flags.
+    """
+    return sum(
+        func.coalesce(getattr(DailyActivity, activity).cast(Integer) * bit, 0)
+        for activity, bit in BITS.items()
+    )
+
+
+def month_bits_query(month: date):
+    """
+    Returns the statement yielding (user_id, day, mask) rows of a month.
+    """
+    # Día del mes como diferencia de días enteros (más barato que EXTRACT en SQLite)
+    return select(
+        DailyActivity.user_id,
+        day_number(DailyActivity.date) - day_number(literal(month)) + 1,
+        _mask_expression()
+    ).where(
+        DailyActivity.date >= month,
+        DailyActivity.date < _next_month(month)
+    )
+
+
+def get_month_bits(month: date) -> MonthBits:
+    """
+    Returns the MonthBits of a month, cached until the next save in it.
+    """
+    month = month_start(month)
+
+    def load():
+        with session_scope(read=True) as session:
+            return MonthBits.from_rows(month, session.execute(month_bits_query(month)).all())
+
+    return query_cache.get_or_load('month_bits', load, scope=month)
+
+
+def range_months(start_date: date, end_date: date) -> list:
+    """
+    Returns the first day of every month touched by the range.
+    """
+    months, month = [], month_start(start_date)
+    while month <= end_date:
+        months.append(month)
+        month = _next_month(month)
+    return months
+
+
+def get_range_bits(start_date: date, end_date: date) -> list:
+    """
+    Returns the MonthBits of every month touched by the range.
+    """
+    return [get_month_bits(month) for month in range_months(start_date, end_date)]
+
+
+def day_masks(bits: list, start_date: date, end_date: date, user_ids) -> np.ndarray:
+    """
+    (users × days) uint8 masks from `start_date` to `end_date` in the order
+    of `user_ids`, from the MonthBits returned by get_range_bits().
+    """
+    parts = []
+    for month_bits in bits:
+        first = max(start_date, month_bits.month).day - 1
+        last = min(end_date, month_bits.month.replace(day=month_bits.days)).day
+        parts.append(month_bits.masks(user_ids)[:, first:last])
+    if not parts:
+        return np.zeros((len(user_ids), 0), dtype=np.uint8)
+    return np.concatenate(parts, axis=1)
+
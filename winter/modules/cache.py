@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import date
+
+from winter.modules import instrumentation
+from winter.settings import CACHE_CONFIG
+
+CacheKey = namedtuple('CacheKey', ['query', 'user_id', 'scope'])
+
+ANY = object()
+
+
+def _covers(scope, day: date) -> bool:
+    """
+    Whether a cached result with the given scope may contain data for `day`.
+    Scopes are None (unbounded), a month (first day) or a (start, end) range
+    where either bound may be None.
+    """
+    if scope is None or day is None:
+        return True
+    if isinstance(scope, tuple):
+        start, end = scope
+        return (start is None or start <= day) and (end is None or day <= end)
+    return (scope.year, scope.month) == (day.year, day.month)
+
+
+class QueryCache:
+    """
+    Process-wide read cache shared by every Streamlit session.
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted beyond `maxsize`. Writers call invalidate() so their own changes
+    are visible on the next read. `can_store`, when set, is called on a miss
+    and a False result returns the loaded value without caching it.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.can_store = None
+
+    def get_or_load(self, query: str, loader, user_id=None, scope=None):
+        """
+        Returns the cached result for (query, user_id, scope), calling
+        `loader()` on a miss.
+        """
+        key = CacheKey(query, user_id, scope)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+        store = self.can_store is None or self.can_store()
+
+        value = loader()
+
+        with self._lock:
+            # Skip storing if a write invalidated entries while loading
+            if store and generation == self._generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def invalidate(self, query: str, user_id=ANY, day: date = None) -> int:
+        """
+        Drops the entries of `query` for `user_id` (every user by default)
+        whose scope may include `day` (any scope by default).
+        Returns the number of entries removed.
+        """
+        with self._lock:
+            self._generation += 1
+            stale = [
+                key for key in self._entries
+                if key.query == query
+                and (user_id is ANY or key.user_id == user_id)
+                and _covers(key.scope, day)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+            }
+
+
+query_cache = QueryCache(maxsize=CACHE_CONFIG["maxsize"], ttl=CACHE_CONFIG["ttl"])
+instrumentation.register_collector("cache", query_cache.stats)
@@ -1,13 +1,28 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+
 import bcrypt
-from sqlalchemy import Column, Integer, String, Boolean, Date, ForeignKey, Float
-from sqlalchemy import create_engine
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Float, Index, Text, UniqueConstraint
+from sqlalchemy import create_engine, delete, event, extract, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.pool import QueuePool, StaticPool
 from sqlalchemy.sql import func
 
-from winter.settings import DATABASE_URL, DB_POOL_CONFIG, SSL_CONFIG, POINTS_PER_ACTIVITY
+from winter.modules.cache import query_cache
+from winter import settings
+from winter.modules import instrumentation
+from winter.modules.scoring import day_points, rank_label
+from winter.settings import (
+    BCRYPT_ROUNDS, DB_POOL_CONFIG, DB_READ_POOL_CONFIG, POINTS_PER_ACTIVITY, READ_YOUR_WRITES_SECONDS, SQLITE_PRAGMAS
+)
 
 Base = declarative_base()
 
@@ -18,12 +33,21 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, nullable=False)
     password_hash = Column(String, nullable=False)
-    activities = relationship("DailyActivity", back_populates="user", lazy='joined')
-    weight_entries = relationship("WeightEntry", back_populates="user")
+    # Las colecciones no se cargan implícitamente: usar options(selectinload(...))
+    activities = relationship("DailyActivity", back_populates="user", lazy='raise')
+    weight_entries = relationship("WeightEntry", back_populates="user", lazy='raise')
 
 
 class DailyActivity(Base):
+    """
+    Activity flags of a user for one day. On PostgreSQL the table is
+    range-partitioned by month on `date` (see winter/scripts/partitions.py).
+    """
     __tablename__ = 'daily_activities'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'date', name='uq_daily_activities_user_date'),
+        Index('ix_daily_activities_date', 'date'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -32,6 +56,8 @@ class DailyActivity(Base):
     diet_nutrition = Column(Boolean, default=False)
     rest_recovery = Column(Boolean, default=False)
     personal_development = Column(Boolean, default=False)
+    # Puntos del día según POINTS_PER_ACTIVITY, calculados al guardar (ver sync_points_weights)
+    points = Column(Integer, nullable=False, default=0, server_default='0')
 
     # Relationship with User
     user = relationship("User", back_populates="activities")
@@ -39,6 +65,9 @@ class DailyActivity(Base):
 
 class WeightEntry(Base):
     __tablename__ = 'weight_entries'
+    __table_args__ = (
+        Index('ix_weight_entries_user_date', 'user_id', 'date'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -49,89 +78,443 @@ class WeightEntry(Base):
     user = relationship("User", back_populates="weight_entries")
 
 
-def initialize_database():
+class MonthlyPoints(Base):
     """
-    Initializes the database by creating all tables.
+    Per-user monthly point totals, maintained on every daily save.
+    `month` is always the first day of the month.
     """
-    engine = create_engine(
-        DATABASE_URL,
-        poolclass=QueuePool,
-        pool_size=DB_POOL_CONFIG["pool_size"],
-        max_overflow=DB_POOL_CONFIG["max_overflow"],
-        pool_timeout=DB_POOL_CONFIG["pool_timeout"],
-        pool_recycle=DB_POOL_CONFIG["pool_recycle"],
-        connect_args=SSL_CONFIG
+    __tablename__ = 'monthly_points'
+    __table_args__ = (
+        Index('ix_monthly_points_month_total', 'month', 'total_points'),
     )
-    Base.metadata.create_all(engine)
+
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    month = Column(Date, primary_key=True)
+    physical_activity = Column(Integer, nullable=False, default=0)
+    diet_nutrition = Column(Integer, nullable=False, default=0)
+    rest_recovery = Column(Integer, nullable=False, default=0)
+    personal_development = Column(Integer, nullable=False, default=0)
+    total_points = Column(Integer, nullable=False, default=0)
+
+    user = relationship("User")
+
+
+class SchemaVersion(Base):
+    """
+    One row per applied migration, see winter/scripts/migrate.py.
+    """
+    __tablename__ = 'schema_version'
+
+    version = Column(Integer, primary_key=True)
+    description = Column(String, nullable=False)
+    applied_at = Column(DateTime, nullable=False, server_default=func.now())
 
 
-def get_session():
+class AppState(Base):
     """
-    Creates and returns a SQLAlchemy session.
+    Key/value state of the application itself, e.g. the point weights the
+    stored daily points were computed with.
     """
-    engine = create_engine(
-        DATABASE_URL,
-        poolclass=QueuePool,
-        pool_size=DB_POOL_CONFIG["pool_size"],
-        max_overflow=DB_POOL_CONFIG["max_overflow"],
-        pool_timeout=DB_POOL_CONFIG["pool_timeout"],
-        pool_recycle=DB_POOL_CONFIG["pool_recycle"],
-        connect_args=SSL_CONFIG
+    __tablename__ = 'app_state'
+
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
+    updated_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+# Cambio que afecta a todos los días (pesos de los puntos, reconstrucción de monthly_points)
+REBUILD_SOURCE = 'rebuild'
+
+
+class DataChange(Base):
+    """
+    Change log written in the same transaction as every activity or weight
+    save while snapshots are enabled (WINTER_SNAPSHOTS).
+    winter/scripts/aggregate.py deletes the rows it has folded into the
+    snapshots, so the rows left are the changes they do not include yet.
+    """
+    __tablename__ = 'data_changes'
+    __table_args__ = (
+        Index('ix_data_changes_user_id', 'user_id', 'id'),
+        # Sin AUTOINCREMENT, SQLite reutilizaría los ids tras purgar el registro
+        {'sqlite_autoincrement': True},
     )
-    Session = sessionmaker(bind=engine)
-    return Session()
 
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    source = Column(String, nullable=False)
+    day = Column(Date, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
 
-def create_user(username: str, password: str):
+
+class Snapshot(Base):
     """
-    Creates a new user with a hashed password.
+    Derived result precomputed by the aggregation worker, stored as JSON.
+    `watermark` is the last data_changes id it reflects.
+    """
+    __tablename__ = 'snapshots'
+
+    name = Column(String, primary_key=True)
+    payload = Column(Text, nullable=False)
+    watermark = Column(Integer, nullable=False)
+    computed_at = Column(DateTime, nullable=False)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that counts checkouts which had to wait for a connection
+    because the pool and its overflow were exhausted.
+    """
+
+    def _do_get(self):
+        saturated = self._max_overflow > -1 and self.checkedout() >= self.size() + self._max_overflow
+        if not saturated:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            elapsed = time.perf_counter() - start
+            with _stats_lock:
+                _pool_waits["waits"] += 1
+                _pool_waits["wait_seconds"] += elapsed
+            instrumentation.record_pool_wait(elapsed)
+
+
+_engine = None
+_session_factory = None
+_read_engine = None
+_read_session_factory = None
+_engine_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_pool_waits = {"waits": 0, "wait_seconds": 0.0}
+_database_override = None
+# Lecturas forzadas al primario: tras una escritura del mismo usuario (ventana por usuario;
+# la clave None es una escritura sin usuario y afecta a todos) o dentro de primary_reads()
+_primary_until = {}
+_force_primary = contextvars.ContextVar("winter_force_primary", default=False)
+# Usuario de la ejecución actual de la página, fijado por auth.restore_session()
+_session_user = contextvars.ContextVar("winter_session_user", default=None)
+_primary_lock = threading.Lock()
+
+
+def configure_database(url: str = None, connect_args: dict = None, read_url: str = None,
+                       read_connect_args: dict = None):
+    """
+    Points the engine registry at another database, e.g. a local one for
+    benchmarks or tests, optionally with a separate read database. Disposes
+    the current engines; url=None goes back to the configured DATABASE_URL
+    and DATABASE_READ_URL.
+    """
+    global _database_override
+    dispose_engine()
+    _database_override = (url, connect_args or {}, read_url, read_connect_args or {}) if url else None
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+
+def _build_engine(url: str, connect_args: dict, pool_config: dict = DB_POOL_CONFIG):
+    """
+    Creates an engine tuned for the backend in `url`.
+    PostgreSQL and file-based SQLite share a bounded pool of reused
+    connections; in-memory SQLite uses one shared connection so every
+    thread sees the same database.
+    """
+    if not url.startswith("sqlite"):
+        return create_engine(
+            url,
+            poolclass=InstrumentedQueuePool,
+            pool_size=pool_config["pool_size"],
+            max_overflow=pool_config["max_overflow"],
+            pool_timeout=pool_config["pool_timeout"],
+            pool_recycle=pool_config["pool_recycle"],
+            connect_args=connect_args
+        )
+
+    connect_args = {"check_same_thread": False, **connect_args}
+    in_memory = url in ("sqlite://", "sqlite:///:memory:") or ":memory:" in url
+    if in_memory:
+        engine = create_engine(url, poolclass=StaticPool, connect_args=connect_args)
+    else:
+        engine = create_engine(
+            url,
+            poolclass=InstrumentedQueuePool,
+            pool_size=pool_config["pool_size"],
+            max_overflow=pool_config["max_overflow"],
+            pool_timeout=pool_config["pool_timeout"],
+            connect_args=connect_args
+        )
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+
+def _targets() -> tuple:
+    if _database_override is not None:
+        return _database_override
+    return settings.DATABASE_URL, settings.DB_CONNECT_ARGS, settings.DATABASE_READ_URL, settings.DB_READ_CONNECT_ARGS
+
+
+def get_engine():
+    """
+    Returns the process-wide SQLAlchemy engine of the primary database,
+    creating it on first use. Every write goes through it.
+    """
+    global _engine, _session_factory
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                url, connect_args, _, _ = _targets()
+                engine = _build_engine(url, connect_args)
+                instrumentation.instrument_engine(engine)
+                _session_factory = sessionmaker(bind=engine, expire_on_commit=False)
+                _engine = engine
+    return _engine
+
+
+def get_read_engine():
+    """
+    Returns the process-wide engine of the read database (DATABASE_READ_URL),
+    with its own pool. Without a read database it is the primary engine.
+    """
+    global _read_engine, _read_session_factory
+    if _read_engine is None:
+        _, _, read_url, read_connect_args = _targets()
+        if not read_url:
+            return get_engine()
+        with _engine_lock:
+            if _read_engine is None:
+                engine = _build_engine(read_url, read_connect_args, DB_READ_POOL_CONFIG)
+                instrumentation.instrument_engine(engine)
+                _read_session_factory = sessionmaker(bind=engine, expire_on_commit=False)
+                _read_engine = engine
+    return _read_engine
+
+
+def dispose_engine():
+    """
+    Closes every pooled connection and forgets the process-wide engines.
+    The next call to get_engine() builds a fresh one.
+    """
+    global _engine, _session_factory, _read_engine, _read_session_factory, _primary_until
+    with _engine_lock:
+        for engine in (_engine, _read_engine):
+            if engine is not None:
+                engine.dispose()
+        _engine = None
+        _session_factory = None
+        _read_engine = None
+        _read_session_factory = None
+        _primary_until = {}
+    reset_pool_stats()
+
+
+def _reset_after_fork():
+    """
+    Drops the inherited engines in a forked child without closing the
+    parent's connections, so the child opens its own.
+    """
+    global _engine, _session_factory, _read_engine, _read_session_factory, _engine_lock, _stats_lock, _primary_lock
+    _engine_lock = threading.Lock()
+    _stats_lock = threading.Lock()
+    _primary_lock = threading.Lock()
+    for engine in (_engine, _read_engine):
+        if engine is not None:
+            engine.dispose(close=False)
+    _engine = None
+    _session_factory = None
+    _read_engine = None
+    _read_session_factory = None
+    reset_pool_stats()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_pool_stats(read: bool = False) -> dict:
+    """
+    Returns a snapshot of the connection pool usage of the primary engine,
+    or of the read engine with read=True. Wait counters are shared.
+    """
+    with _stats_lock:
+        stats = dict(_pool_waits)
+    engine = _read_engine if read else _engine
+    pool = engine.pool if engine is not None else None
+    # Solo QueuePool expone contadores; StaticPool (SQLite en memoria) no
+    queue_pool = pool if isinstance(pool, QueuePool) else None
+    stats.update({
+        "size": queue_pool.size() if queue_pool is not None else 0,
+        "checked_in": queue_pool.checkedin() if queue_pool is not None else 0,
+        "checked_out": queue_pool.checkedout() if queue_pool is not None else 0,
+        "overflow": max(queue_pool.overflow(), 0) if queue_pool is not None else 0,
+    })
+    return stats
+
+
+def supports_concurrent_reads() -> bool:
+    """
+    Whether the read engine can serve queries from several threads at once.
+    In-memory SQLite shares a single connection and cannot.
+    """
+    return not isinstance(get_read_engine().pool, StaticPool)
+
+
+def get_read_pool_capacity() -> int:
+    """
+    Connections the read engine can hand out at once: pool size plus
+    overflow of DB_READ_POOL_CONFIG, or of DB_POOL_CONFIG without a replica.
+    """
+    config = DB_READ_POOL_CONFIG if get_read_engine() is not get_engine() else DB_POOL_CONFIG
+    return config["pool_size"] + config["max_overflow"]
+
+
+instrumentation.register_collector("pool", get_pool_stats)
+instrumentation.register_collector("read_pool", lambda: get_pool_stats(read=True))
+
+
+def reset_pool_stats():
+    """
+    Resets the pool wait counters.
+    """
+    with _stats_lock:
+        _pool_waits["waits"] = 0
+        _pool_waits["wait_seconds"] = 0.0
+
+
+def set_session_user(user_id):
+    """
+    Identifies the user the current script run reads for. Prefetch threads
+    copy the context, so their reads follow the same user.
+    """
+    _session_user.set(user_id)
+
+
+def mark_write(user_id=None):
+    """
+    Sends the reads of `user_id` to the primary for READ_YOUR_WRITES_SECONDS
+    after one of their writes; other users keep reading from the replica.
+    Without a user (maintenance writes such as a rebuild) every session
+    reads from the primary.
+    """
+    now = time.monotonic()
+    with _primary_lock:
+        for key in [key for key, until in _primary_until.items() if until <= now]:
+            del _primary_until[key]
+        _primary_until[user_id] = now + READ_YOUR_WRITES_SECONDS
+
+
+def _pinned_to_primary() -> bool:
+    now = time.monotonic()
+    return _primary_until.get(None, 0.0) > now or _primary_until.get(_session_user.get(), 0.0) > now
+
+
+@contextmanager
+def primary_reads():
+    """
+    Routes every read inside the block to the primary.
+    """
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+
+def _reads_from_replica() -> bool:
+    return not _force_primary.get() and not _pinned_to_primary() and get_read_engine() is not _engine
+
+
+def _cacheable_read() -> bool:
+    """
+    Whether a cache miss may store its result. While any user is inside
+    their read-your-writes window, a replica read could predate their save
+    and the shared cache would serve it back to them, so it is not kept.
+    """
+    if not _reads_from_replica():
+        return True
+    now = time.monotonic()
+    return not any(until > now for until in list(_primary_until.values()))
+
+
+query_cache.can_store = _cacheable_read
+
+
+def initialize_database():
+    """
+    Initializes the database by creating all tables.
+    """
+    Base.metadata.create_all(get_engine())
+
+
+def get_session(read: bool = False):
+    """
+    Returns a new SQLAlchemy session bound to the primary engine, or to the
+    read engine with read=True unless reads are pinned to the primary.
+    """
+    get_engine()
+    if read and _reads_from_replica():
+        return _read_session_factory()
+    return _session_factory()
+
+
+@contextmanager
+def session_scope(read: bool = False):
+    """
+    Unit of work around a series of operations.
+    Commits on success, rolls back on any error and always returns the
+    connection to the pool. Keep the block limited to database work so the
+    connection is not held while widgets render. Dashboard queries pass
+    read=True to use the read database.
     """
-    session = get_session()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-    user = User(username=username, password_hash=hashed.decode('utf-8'))
-    session.add(user)
+    session = get_session(read)
     try:
+        yield session
         session.commit()
-    except SQLAlchemyError as e:
+    except Exception:
         session.rollback()
-        print(f"Error creating user: {e}")
+        raise
     finally:
         session.close()
 
 
-def verify_credentials(username: str, password: str) -> bool:
+def create_user(username: str, password: str):
     """
-    Verifies user credentials.
+    Creates a new user with a hashed password.
     """
-    session = get_session()
-    user = session.query(User).filter(User.username == username).first()
-    session.close()
-    if user and bcrypt.checkpw(password.encode('utf-8'), user.password_hash.encode('utf-8')):
-        return True
-    return False
+    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS))
+    try:
+        with session_scope() as session:
+            session.add(User(username=username, password_hash=hashed.decode('utf-8')))
+    except SQLAlchemyError as e:
+        print(f"Error creating user: {e}")
+    else:
+        mark_write()
+        query_cache.invalidate('usernames')
+
+
+def get_user_credentials(username: str):
+    """
+    Returns the (id, password_hash) row for a username, or None.
+    """
+    with session_scope() as session:
+        return session.query(User.id, User.password_hash).filter(User.username == username).first()
 
 
 def get_connection():
     """
-    Creates and returns a database connection using SQLAlchemy.
+    Checks out a connection from the shared engine's pool.
     
     Returns:
         connection: SQLAlchemy connection object if successful, None otherwise
     """
     try:
-        # Create the SQLAlchemy engine with connection pooling and SSL
-        engine = create_engine(
-            DATABASE_URL,
-            poolclass=QueuePool,
-            pool_size=DB_POOL_CONFIG["pool_size"],
-            max_overflow=DB_POOL_CONFIG["max_overflow"],
-            pool_timeout=DB_POOL_CONFIG["pool_timeout"],
-            pool_recycle=DB_POOL_CONFIG["pool_recycle"],
-            connect_args=SSL_CONFIG
-        )
-
-        # Establish and return a connection
-        connection = engine.connect()
+        # Check out a connection from the shared pool
+        connection = get_engine().connect()
         return connection
 
     except SQLAlchemyError as e:
@@ -143,60 +526,370 @@ def get_user_id(username: str) -> int:
     """
     Retrieves the user ID for a given username.
     """
-    session = get_session()
-    user = session.query(User).filter(User.username == username).first()
-    session.close()
-    if user:
-        return user.id
-    else:
-        return None
+    with session_scope() as session:
+        return session.query(User.id).filter(User.username == username).scalar()
 
 
-def get_user_points(user_id: int) -> dict:
+def month_start(day: date) -> date:
     """
-    Calculates total points and rank for a given user.
-    Returns a dictionary with points and rank information.
+    Returns the first day of the month containing `day`.
     """
-    session = get_session()
+    return date(day.year, day.month, 1)
 
-    try:
-        # Calculate points using the same logic as in ranking.py
-        points_query = session.query(
-            func.sum(
-                func.coalesce(DailyActivity.physical_activity.cast(Integer) * POINTS_PER_ACTIVITY['physical_activity'],
-                              0) +
-                func.coalesce(DailyActivity.diet_nutrition.cast(Integer) * POINTS_PER_ACTIVITY['diet_nutrition'], 0) +
-                func.coalesce(DailyActivity.rest_recovery.cast(Integer) * POINTS_PER_ACTIVITY['rest_recovery'], 0) +
-                func.coalesce(
-                    DailyActivity.personal_development.cast(Integer) * POINTS_PER_ACTIVITY['personal_development'], 0))
-        ).filter(DailyActivity.user_id == user_id).scalar()
-
-        total_points = points_query or 0
-
-        # Determine rank based on points
-        rank = get_user_rank(total_points)
-
-        return {
-            'points': total_points,
-            'rank': rank
-        }
-    finally:
-        session.close()
+
+def _next_month(month: date) -> date:
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
+
+
+def _activity_points_sums() -> dict:
+    """
+    Per-activity SUM(points) expressions over daily_activities.
+    """
+    return {
+        activity: func.coalesce(func.sum(
+            func.coalesce(getattr(DailyActivity, activity).cast(Integer) * points, 0)
+        ), 0)
+        for activity, points in POINTS_PER_ACTIVITY.items()
+    }
 
 
-def get_user_rank(points: int) -> str:
+def _day_points_expression():
     """
-    Determines user rank based on points.
+    Points of a daily_activities row computed from its flags.
     """
-    if points <= 30:
-        return "👨‍🎓 Estudiante"
-    elif points <= 60:
-        return "🥋 Genin"
-    elif points <= 90:
-        return "🎯 Chunin"
-    elif points <= 110:
-        return "⚔️ Jounin"
-    elif points <= 119:
-        return "🏆 Sannin Legendario"
+    return sum(
+        func.coalesce(getattr(DailyActivity, activity).cast(Integer) * value, 0)
+        for activity, value in POINTS_PER_ACTIVITY.items()
+    )
+
+
+def _points_fingerprint() -> str:
+    return json.dumps(POINTS_PER_ACTIVITY, sort_keys=True)
+
+
+def recompute_points(connection):
+    """
+    Rewrites the stored points of every daily_activities row from the
+    current POINTS_PER_ACTIVITY and records those weights, inside the
+    caller's transaction.
+    """
+    connection.execute(update(DailyActivity.__table__).values(points=_day_points_expression()))
+    connection.execute(delete(AppState.__table__).where(AppState.key == 'points_weights'))
+    connection.execute(insert(AppState.__table__).values(key='points_weights', value=_points_fingerprint()))
+
+
+def sync_points_weights() -> bool:
+    """
+    Recomputes the stored daily points and the monthly aggregate if
+    POINTS_PER_ACTIVITY changed since they were written. Returns whether
+    anything was recomputed.
+    """
+    with get_engine().begin() as connection:
+        stored = connection.execute(
+            select(AppState.value).where(AppState.key == 'points_weights')
+        ).scalar()
+        if stored == _points_fingerprint():
+            return False
+        recompute_points(connection)
+        _write_monthly_points(connection, stored_points=True)
+        _invalidate_snapshots(connection)
+
+    mark_write()
+    query_cache.invalidate('monthly_leaderboard')
+    query_cache.invalidate('user_points')
+    return True
+
+
+def _activity_points_columns():
+    """
+    Per-activity SUM(points) expressions labelled with the activity name.
+    """
+    return [expression.label(activity) for activity, expression in _activity_points_sums().items()]
+
+
+_UPSERT_DIALECTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def _upsert(session, table, index_elements: list, values: dict = None, from_select=None):
+    """
+    Executes INSERT ... ON CONFLICT (index_elements) DO UPDATE for either a
+    single row of `values` or a (columns, select) pair in `from_select`.
+    """
+    insert = _UPSERT_DIALECTS[session.get_bind().dialect.name](table)
+    if from_select is not None:
+        columns, query = from_select
+        insert = insert.from_select(columns, query)
     else:
-        return "👑 Hokage"
+        columns = list(values)
+        insert = insert.values(**values)
+    statement = insert.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={column: insert.excluded[column] for column in columns if column not in index_elements}
+    )
+    session.execute(statement)
+
+
+def refresh_monthly_points(session, user_id: int, day: date):
+    """
+    Recomputes the monthly_points row for the user and the month containing
+    `day` with a single INSERT ... SELECT upsert. Runs inside the caller's
+    transaction so the aggregate is committed together with the daily change.
+    """
+    month = month_start(day)
+    session.flush()
+    sums = _activity_points_sums()
+    query = select(
+        literal(user_id, Integer),
+        literal(month, Date),
+        *sums.values(),
+        func.coalesce(func.sum(DailyActivity.points), 0)
+    ).where(
+        DailyActivity.user_id == user_id,
+        DailyActivity.date >= month,
+        DailyActivity.date < _next_month(month)
+    )
+    columns = ['user_id', 'month', *sums, 'total_points']
+    _upsert(session, MonthlyPoints.__table__, ['user_id', 'month'], from_select=(columns, query))
+
+
+def _write_monthly_points(connection, stored_points: bool) -> int:
+    year = extract('year', DailyActivity.date)
+    month = extract('month', DailyActivity.date)
+    sums = _activity_points_sums()
+    total = func.sum(DailyActivity.points) if stored_points else sum(sums.values())
+    rows = connection.execute(select(
+        DailyActivity.user_id,
+        year.label('year'),
+        month.label('month'),
+        *_activity_points_columns(),
+        total.label('total_points')
+    ).group_by(DailyActivity.user_id, year, month)).all()
+
+    connection.execute(delete(MonthlyPoints.__table__))
+    if rows:
+        connection.execute(insert(MonthlyPoints.__table__), [{
+            'user_id': totals.user_id,
+            'month': date(int(totals.year), int(totals.month), 1),
+            **{activity: int(getattr(totals, activity) or 0) for activity in POINTS_PER_ACTIVITY},
+            'total_points': int(totals.total_points or 0),
+        } for totals in rows])
+    return len(rows)
+
+
+def rebuild_monthly_points(connection=None, stored_points: bool = True) -> int:
+    """
+    Rebuilds the monthly_points table from daily_activities.
+    Returns the number of rows written.
+
+    With `connection` it runs inside the caller's transaction and leaves
+    the caches to the caller (migrations). `stored_points=False` sums the
+    activity flags instead of daily_activities.points, for databases that
+    predate that column.
+    """
+    if connection is not None:
+        return _write_monthly_points(connection, stored_points)
+    with get_engine().begin() as connection:
+        rows = _write_monthly_points(connection, stored_points)
+        _invalidate_snapshots(connection)
+
+    mark_write()
+    query_cache.invalidate('monthly_leaderboard')
+    query_cache.invalidate('user_points')
+    return rows
+
+
+def get_daily_activity(user_id: int, day: date) -> dict:
+    """
+    Returns the activity flags of a user for a day. A day without a stored
+    row counts as nothing done.
+    """
+    with session_scope() as session:
+        row = session.query(
+            *(getattr(DailyActivity, activity) for activity in POINTS_PER_ACTIVITY)
+        ).filter(DailyActivity.user_id == user_id, DailyActivity.date == day).first()
+    if row is None:
+        return {activity: False for activity in POINTS_PER_ACTIVITY}
+    return {activity: bool(getattr(row, activity)) for activity in POINTS_PER_ACTIVITY}
+
+
+def _invalidate_snapshots(connection):
+    """
+    Drops every snapshot after a rewrite of the points of all days and,
+    with snapshots enabled, logs a REBUILD_SOURCE change so the aggregation
+    worker rebuilds all of them. Runs in the caller's transaction.
+    """
+    connection.execute(delete(Snapshot.__table__))
+    if settings.SNAPSHOTS_ENABLED:
+        connection.execute(insert(DataChange.__table__).values(user_id=0, source=REBUILD_SOURCE, day=date.today()))
+
+
+def _log_change(session, user_id: int, source: str, day: date):
+    # Solo con el worker activo: si nadie procesa el registro, crecería sin límite
+    if settings.SNAPSHOTS_ENABLED:
+        session.add(DataChange(user_id=user_id, source=source, day=day))
+
+
+def save_daily_activity(user_id: int, day: date, values: dict):
+    """
+    Upserts the activity flags for a user and day and updates the monthly
+    aggregate in the same transaction.
+    """
+    flags = {activity: bool(values.get(activity, False)) for activity in POINTS_PER_ACTIVITY}
+    with session_scope() as session:
+        _upsert(session, DailyActivity.__table__, ['user_id', 'date'],
+                values={'user_id': user_id, 'date': day, **flags, 'points': day_points(flags)})
+        refresh_monthly_points(session, user_id, day)
+        _log_change(session, user_id, DailyActivity.__tablename__, day)
+
+    mark_write(user_id)
+    query_cache.invalidate('monthly_leaderboard', day=day)
+    query_cache.invalidate('month_bits', day=day)
+    query_cache.invalidate('user_points', user_id=user_id, day=day)
+    query_cache.invalidate('streaks')
+    query_cache.invalidate('pending_changes', user_id=user_id)
+
+
+def get_monthly_leaderboard(month: date) -> list:
+    """
+    Returns the monthly_points rows for the given month joined with the
+    username, one row per user with activity.
+    """
+    month = month_start(month)
+
+    def load():
+        with session_scope(read=True) as session:
+            return session.query(
+                User.username,
+                MonthlyPoints.user_id,
+                MonthlyPoints.physical_activity,
+                MonthlyPoints.diet_nutrition,
+                MonthlyPoints.rest_recovery,
+                MonthlyPoints.personal_development,
+                MonthlyPoints.total_points
+            ).join(User, User.id == MonthlyPoints.user_id).filter(
+                MonthlyPoints.month == month
+            ).all()
+
+    return query_cache.get_or_load('monthly_leaderboard', load, scope=month)
+
+
+def get_usernames() -> dict:
+    """
+    Returns a {user_id: username} map of every user.
+    """
+    def load():
+        with session_scope(read=True) as session:
+            return dict(session.query(User.id, User.username).all())
+
+    return query_cache.get_or_load('usernames', load)
+
+
+def add_weight_entry(user_id: int, day: date, weight: float):
+    """
+    Stores a weight entry for a user.
+    """
+    with session_scope() as session:
+        session.add(WeightEntry(user_id=user_id, date=day, weight=weight))
+        _log_change(session, user_id, WeightEntry.__tablename__, day)
+
+    mark_write(user_id)
+    query_cache.invalidate('user_weights', user_id=user_id, day=day)
+    query_cache.invalidate('user_weight_range', user_id=user_id)
+    query_cache.invalidate('group_weights', day=day)
+    query_cache.invalidate('pending_changes', user_id=user_id)
+
+
+def _date_window(query, column, start_date: date = None, end_date: date = None):
+    if start_date is not None:
+        query = query.filter(column >= start_date)
+    if end_date is not None:
+        query = query.filter(column <= end_date)
+    return query
+
+
+def get_user_weight_range(user_id: int) -> tuple:
+    """
+    Returns the (first, last) dates with weight entries for a user, or
+    (None, None) if there are none.
+    """
+    def load():
+        with session_scope(read=True) as session:
+            return tuple(session.query(
+                func.min(WeightEntry.date),
+                func.max(WeightEntry.date)
+            ).filter(WeightEntry.user_id == user_id).one())
+
+    return query_cache.get_or_load('user_weight_range', load, user_id=user_id)
+
+
+def get_user_weights(user_id: int, start_date: date = None, end_date: date = None) -> list:
+    """
+    Returns the (date, weight) entries of a user ordered by date, optionally
+    limited to a date range.
+    """
+    def load():
+        with session_scope(read=True) as session:
+            query = session.query(
+                WeightEntry.date,
+                WeightEntry.weight
+            ).filter(WeightEntry.user_id == user_id)
+            return _date_window(query, WeightEntry.date, start_date, end_date).order_by(WeightEntry.date).all()
+
+    return query_cache.get_or_load('user_weights', load, user_id=user_id, scope=(start_date, end_date))
+
+
+def get_group_weights(start_date: date = None, end_date: date = None) -> list:
+    """
+    Returns the (date, weight, username) entries of every user ordered by
+    date, optionally limited to a date range.
+    """
+    def load():
+        with session_scope(read=True) as session:
+            query = session.query(
+                WeightEntry.date,
+                WeightEntry.weight,
+                User.username
+            ).join(User)
+            return _date_window(query, WeightEntry.date, start_date, end_date).order_by(WeightEntry.date).all()
+
+    return query_cache.get_or_load('group_weights', load, scope=(start_date, end_date))
+
+
+def get_user_points(user_id: int, month: date = None) -> dict:
+    """
+    Returns the points of a user in a month (the current one by default) and
+    the rank they give.
+    """
+    month = month_start(month or date.today())
+
+    def load():
+        with session_scope(read=True) as session:
+            return session.query(MonthlyPoints.total_points).filter(
+                MonthlyPoints.user_id == user_id,
+                MonthlyPoints.month == month
+            ).scalar() or 0
+
+    total_points = query_cache.get_or_load('user_points', load, user_id=user_id, scope=month)
+
+    return {
+        'points': total_points,
+        'rank': rank_label(total_points)
+    }
+
+
+def has_pending_changes(user_id: int) -> bool:
+    """
+    Whether the user has logged changes the aggregation worker has not
+    processed yet. Read from the primary and cached until the user's next
+    save: it decides whether the snapshots include the user's own saves.
+    """
+    def load():
+        with session_scope() as session:
+            return session.query(DataChange.id).filter(DataChange.user_id == user_id).first() is not None
+
+    return query_cache.get_or_load('pending_changes', load, user_id=user_id)
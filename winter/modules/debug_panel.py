@@ -0,0 +1,70 @@
+import os
+
+import streamlit as st
+
+from winter import settings
+from winter.modules import instrumentation, profiler
+from winter.modules.database import get_usernames
+
+
+def is_admin(user_id) -> bool:
+    """
+    Whether the user is listed in ADMIN_USERS.
+    """
+    return user_id is not None and get_usernames().get(user_id) in settings.ADMIN_USERS
+
+
+def _process_toggle(label: str, key: str, is_enabled, set_enabled):
+    # El valor es del proceso: el widget parte siempre del actual y solo lo cambia al pulsarlo,
+    # para que una sesión de otro admin (o una nueva) no lo pise en cada re-ejecución
+    st.session_state[key] = is_enabled()
+    st.toggle(label, key=key, on_change=lambda: set_enabled(st.session_state[key]))
+
+
+def render_debug_panel(page: str):
+    """
+    Sidebar panel for admins with the instrumentation and profiler toggles,
+    the latest profiles, the timing breakdown of the last run of `page` and
+    the cost of the last rerun of each of its fragments.
+    """
+    if not st.session_state.get('authenticated') or not is_admin(st.session_state.get('user_id')):
+        return
+
+    with st.sidebar.expander("🛠️ Depuración"):
+        _process_toggle("Instrumentación", "debug_metrics_enabled", instrumentation.is_enabled,
+                        instrumentation.set_enabled)
+        _process_toggle("Perfilado (cProfile)", "debug_profiler_enabled", profiler.is_enabled, profiler.set_enabled)
+
+        profiles = profiler.list_profiles()[:5]
+        if profiles:
+            st.write("Perfiles recientes", [os.path.basename(path) for path in profiles])
+
+        run = instrumentation.last_run(page)
+        if run is None:
+            st.caption("Sin mediciones para esta página todavía.")
+            return
+
+        summary = run.as_dict()
+        st.metric("Duración (ms)", summary["duration_ms"])
+        st.write({
+            "SQL (ms)": summary["sql_ms"],
+            "Consultas": summary["sql_statements"],
+            "Filas": summary["sql_rows"],
+            "Espera de pool (ms)": summary["pool_wait_ms"],
+        })
+        st.write("Secciones (ms)", summary["sections_ms"])
+        st.write("Consultas por sección", summary["sql_statements_by_section"])
+
+        # Última re-ejecución de cada fragmento por separado: el coste de una interacción
+        fragments = [fragment.as_dict() for fragment in instrumentation.last_fragment_runs(page)]
+        if fragments:
+            st.dataframe([
+                {"fragmento": fragment["page"], "ms": fragment["duration_ms"], "consultas": fragment["sql_statements"]}
+                for fragment in fragments
+            ])
+
+        slowest = sorted(run.statements, key=lambda s: s[1], reverse=True)[:10]
+        st.dataframe([
+            {"ms": round(seconds * 1000, 3), "filas": rows, "sql": " ".join(statement.split())[:200]}
+            for statement, seconds, rows in slowest
+        ])
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb(x, y, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: returns the indices of at most `threshold`
+    points of the (x, y) series that keep its visual shape. `x` must be
+    numeric and sorted.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    # Sumas acumuladas para la media de cada cubo sin recorrerlo
+    sum_x = np.concatenate(([0.0], np.cumsum(x)))
+    sum_y = np.concatenate(([0.0], np.cumsum(y)))
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = max(min(int((i + 2) * every) + 1, n), end + 1)
+        avg_x = (sum_x[next_end] - sum_x[end]) / (next_end - end)
+        avg_y = (sum_y[next_end] - sum_y[end]) / (next_end - end)
+        # Área del triángulo entre el punto elegido, cada candidato y la media del siguiente cubo
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def downsample(df: pd.DataFrame, max_points: int, x: str = 'date', y: str = 'weight', by: str = None) -> pd.DataFrame:
+    """
+    Reduces a time series to daily means and then, if it still has more than
+    `max_points` points, to `max_points` with LTTB. With `by`, each series is
+    downsampled separately and the budget is split between them.
+    """
+    if df.empty:
+        return df
+    keys = [by, x] if by is not None else [x]
+    # Media diaria primero: varios registros el mismo día son un solo punto
+    daily = df.groupby(keys, sort=True, as_index=False)[y].mean()
+
+    if by is None:
+        bounds, budget = np.array([0, len(daily)]), max_points
+    else:
+        codes = daily[by].to_numpy()
+        bounds = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1], True])
+        budget = max(max_points // (len(bounds) - 1), 3)
+    if np.diff(bounds).max() <= budget:
+        return daily
+
+    ordinals = pd.to_datetime(daily[x]).to_numpy(dtype='datetime64[D]').astype(np.int64)
+    values = daily[y].to_numpy(dtype=float)
+    keep = np.concatenate([
+        start + lttb(ordinals[start:end], values[start:end], budget)
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ])
+    return daily.iloc[keep].reset_index(drop=True)
@@ -0,0 +1,272 @@
+"""
+Figure factory for the pages' Plotly charts.
+
+Every builder is wrapped with cached_figure(): its arguments (frames and
+arrays included) are fingerprinted, and the built figure is kept in a
+process-wide cache bounded by the size of its serialized JSON. A rerun with
+unchanged data gets the same figure back without running Plotly Express
+again. Cached figures are FrozenFigure instances, whose dict form is computed
+once, so st.plotly_chart does not deep-copy them on every render either.
+Cached figures are shared between sessions and must not be modified.
+"""
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io
+
+from winter.modules import instrumentation
+from winter.modules.bitsets import BITS
+from winter.modules.downsample import downsample
+from winter.settings import FIGURE_CACHE_CONFIG
+
+
+def _update(digest, value):
+    digest.update(type(value).__name__.encode())
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        columns = list(value.columns) if isinstance(value, pd.DataFrame) else [value.name]
+        digest.update(repr((columns, [str(dtype) for dtype in np.atleast_1d(value.dtypes)], value.shape)).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray) and value.dtype != object:
+        digest.update(repr((value.shape, value.dtype.str)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, np.ndarray):
+        _update(digest, value.tolist())
+    elif isinstance(value, (list, tuple)):
+        digest.update(str(len(value)).encode())
+        for item in value:
+            _update(digest, item)
+    elif isinstance(value, dict):
+        _update(digest, sorted(value.items(), key=repr))
+    else:
+        digest.update(repr(value).encode())
+    digest.update(b';')
+
+
+def fingerprint(*values) -> str:
+    """
+    Content hash of frames, arrays and plain values: equal data gives the
+    same fingerprint regardless of object identity.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for value in values:
+        _update(digest, value)
+    return digest.hexdigest()
+
+
+class FrozenFigure(go.Figure):
+    """
+    A figure that is not modified after being built. to_dict() is computed
+    once and reused.
+    """
+    _frozen_dict = None
+
+    def to_dict(self):
+        if self._frozen_dict is None:
+            self._frozen_dict = super().to_dict()
+        return self._frozen_dict
+
+
+class FigureCache:
+    """
+    LRU cache of built figures bounded by the total size of their JSON.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_build(self, key: str, build) -> go.Figure:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Una figura nueva a partir de la construida: solo en un fallo de la caché
+        figure = FrozenFigure(build().to_dict())
+        size = len(plotly.io.to_json(figure.to_dict(), validate=False))
+
+        with self._lock:
+            if size <= self.max_bytes and key not in self._entries:
+                self._entries[key] = (figure, size)
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self._bytes -= evicted
+                    self.evictions += 1
+        return figure
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+figure_cache = FigureCache(max_bytes=FIGURE_CACHE_CONFIG["max_bytes"])
+instrumentation.register_collector("figure_cache", figure_cache.stats)
+
+
+def cached_figure(builder):
+    """
+    Decorator caching a figure builder by the fingerprint of its arguments.
+    """
+    @functools.wraps(builder)
+    def build(*args, **kwargs):
+        key = f"{builder.__qualname__}:{fingerprint(args, kwargs)}"
+        return figure_cache.get_or_build(key, lambda: builder(*args, **kwargs))
+    return build
+
+
+@cached_figure
+def leaderboard_figure(df_global: pd.DataFrame, title: str, colors: dict) -> go.Figure:
+    """
+    Monthly points per user, coloured by rank (columns username,
+    total_points and Rango).
+    """
+    fig = px.bar(df_global,
+                 x='username',
+                 y='total_points',
+                 text='total_points',
+                 color='Rango',
+                 color_discrete_map=colors,
+                 labels={'username': 'Usuario', 'total_points': 'Puntos Totales'},
+                 title=title)
+    fig.update_traces(texttemplate='%{text} pts<br>%{customdata[0]}',
+                      textposition='outside',
+                      customdata=df_global[['Rango']])
+    return fig
+
+
+@cached_figure
+def activity_ranking_figure(df_activity: pd.DataFrame, title: str) -> go.Figure:
+    """
+    Points of one activity per user, with the position (the frame index)
+    over each bar.
+    """
+    fig = px.bar(df_activity, x='username', y='points', text='points',
+                 labels={'username': 'Usuario', 'points': 'Puntos'},
+                 title=title)
+    # Usar el índice como posición en el texto sobre las barras
+    fig.update_traces(texttemplate='Posición %{customdata}: %{text} pts',
+                      textposition='outside',
+                      customdata=df_activity.index)
+    fig.update_layout(uniformtext_minsize=8, uniformtext_mode='hide')
+    return fig
+
+
+@cached_figure
+def heatmap_figure(points: np.ndarray, x: list, y: list, title: str) -> go.Figure:
+    """
+    User × day matrix of daily points.
+    """
+    fig = px.imshow(points,
+                    labels=dict(x="Fecha", y="Usuario", color="Puntos"),
+                    x=x,
+                    y=y,
+                    aspect="auto",
+                    color_continuous_scale='Viridis')
+    # Eje X como categorías para mostrar todas las fechas
+    fig.update_xaxes(type='category')
+    fig.update_layout(title=title)
+    return fig
+
+
+@cached_figure
+def group_weight_figure(df_weight: pd.DataFrame, max_points: int) -> go.Figure:
+    """
+    Weight of every user (columns date, weight and username), reduced to
+    daily means and `max_points` points with LTTB.
+    """
+    df_weight = downsample(df_weight, max_points, by='username')
+    return px.line(df_weight,
+                   x='date',
+                   y='weight',
+                   color='username',
+                   labels={'date': 'Fecha', 'weight': 'Peso (kg)', 'username': 'Usuario'},
+                   title='Progreso de Peso del Grupo',
+                   render_mode='webgl')
+
+
+@cached_figure
+def weight_figure(df: pd.DataFrame, max_points: int, target_weight: float) -> go.Figure:
+    """
+    Weight of one user (columns date and weight) with a line at the target
+    weight if it is set.
+    """
+    fig = px.line(
+        downsample(df, max_points),
+        x='date',
+        y='weight',
+        labels={'date': 'Fecha', 'weight': 'Peso (kg)'},
+        title='Progreso de Peso',
+        render_mode='webgl'
+    )
+    if target_weight > 0:
+        fig.add_hline(
+            y=target_weight,
+            line_dash="dash",
+            line_color="red",
+            annotation_text="Objetivo",
+            annotation_position="right"
+        )
+    return fig
+
+
+ACTIVITY_NAMES = {
+    'physical_activity': '🏋️‍♂️ Actividad Física',
+    'diet_nutrition': '🥗 Dieta y Nutrición',
+    'rest_recovery': '😴 Descanso o Recuperación',
+    'personal_development': '📖 Desarrollo Personal'
+}
+
+
+@cached_figure
+def activity_days_figure(dates: list, masks: np.ndarray) -> go.Figure:
+    """
+    One bar per activity and day from the day masks (1 = done).
+    """
+    fig = go.Figure([
+        go.Bar(x=dates, y=(masks & bit) // bit, name=ACTIVITY_NAMES[activity],
+               hovertemplate='%{x}<br>Actividades Realizadas=%{y}')
+        for activity, bit in BITS.items()
+    ])
+    fig.update_layout(
+        title='Actividades Realizadas por Fecha',
+        height=500,
+        legend_title_text='Actividad',
+        xaxis_title='Fecha',
+        yaxis_title='Número de Actividades',
+        bargap=0.2,
+        barmode='group',  # Cambiar a 'stack' si prefieres barras apiladas
+        xaxis=dict(
+            type='category',  # Forzar el eje X como categorías
+            tickformat='%d/%m',  # Formato de fecha simplificado
+            tickmode='array',  # Modo de ticks personalizado
+            ticktext=[d.strftime('%d/%m') for d in dates],  # Texto de los ticks
+            tickvals=dates  # Valores de los ticks
+        )
+    )
+    return fig
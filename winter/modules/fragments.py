@@ -0,0 +1,37 @@
+"""
+Page sections that rerun on their own.
+
+A function decorated with section() is a Streamlit fragment: a change in one
+of its widgets reruns only that function instead of the whole page script,
+so the other sections keep their output and skip their queries. On a full
+page run the section is timed inside the page run; a rerun of only the
+fragment is recorded as its own run named ``<page>.<section>``, which is
+what the debug panel shows as the cost of one interaction.
+"""
+import functools
+from contextlib import nullcontext
+
+import streamlit as st
+
+from winter.modules import instrumentation
+from winter.modules.database import set_session_user
+
+
+def section(page: str, name: str):
+    """
+    Decorator turning a page section into an instrumented fragment.
+    """
+    def decorate(func):
+        @st.fragment
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            # Sin ejecución de página activa: Streamlit está re-ejecutando solo este fragmento
+            if instrumentation.current_run() is None:
+                set_session_user(st.session_state.get('user_id'))
+                context = instrumentation.page_run(f"{page}.{name}", st.session_state.get('user_id'))
+            else:
+                context = nullcontext()
+            with context, instrumentation.timed(name):
+                func(*args, **kwargs)
+        return run
+    return decorate
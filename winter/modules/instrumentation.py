@@ -0,0 +1,268 @@
+"""
+SQL and render instrumentation.
+
+SQLAlchemy engine events record per-statement latency and row counts, and
+timed() measures page sections. Everything is attributed to the current
+page run, then published three ways:
+
+- a structured JSON log line per page run (logger ``winter.metrics``)
+- a Prometheus text file (WINTER_METRICS_FILE) that can be scraped
+- the admin debug panel, through last_run()
+
+When metrics are disabled, timed() and page_run() return a shared no-op
+context and the SQL listeners return after one flag check.
+"""
+import contextvars
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+from sqlalchemy import event
+
+from winter import settings
+
+logger = logging.getLogger("winter.metrics")
+
+_NULL_CONTEXT = nullcontext()
+_current_run = contextvars.ContextVar("winter_page_run", default=None)
+_current_section = contextvars.ContextVar("winter_section", default=None)
+_enabled = None
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_last_runs = {}
+_collectors = {}
+
+
+class PageRun:
+    """
+    Timings collected during one execution of a page script.
+    """
+
+    def __init__(self, page: str, user_id=None):
+        self.page = page
+        self.user_id = user_id
+        self.sections = []
+        self.statements = []
+        self.section_statements = defaultdict(int)
+        self.pool_wait = 0.0
+        self.duration = None
+
+    def section_totals(self) -> dict:
+        totals = {}
+        for name, seconds in self.sections:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    @property
+    def sql_seconds(self) -> float:
+        return sum(seconds for _, seconds, _ in self.statements)
+
+    def as_dict(self) -> dict:
+        return {
+            "page": self.page,
+            "user_id": self.user_id,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "sections_ms": {name: round(seconds * 1000, 3) for name, seconds in self.section_totals().items()},
+            "sql_statements": len(self.statements),
+            "sql_statements_by_section": dict(self.section_statements),
+            "sql_ms": round(self.sql_seconds * 1000, 3),
+            "sql_rows": sum(rows for _, _, rows in self.statements),
+            "pool_wait_ms": round(self.pool_wait * 1000, 3),
+        }
+
+
+def is_enabled() -> bool:
+    global _enabled
+    if _enabled is None:
+        _enabled = settings.METRICS_CONFIG["enabled"]
+    return _enabled
+
+
+def set_enabled(value: bool):
+    """
+    Turns instrumentation on or off for the whole process (admin toggle).
+    """
+    global _enabled
+    _enabled = bool(value)
+
+
+def register_collector(prefix: str, collector):
+    """
+    Adds a callable returning {name: number} whose values are exported as
+    gauges named `<prefix>_<name>` in the metrics file.
+    """
+    _collectors[prefix] = collector
+
+
+def _add(metric: str, labels: tuple, value: float):
+    with _lock:
+        _counters[(metric, labels)] += value
+
+
+def current_run():
+    return _current_run.get()
+
+
+@contextmanager
+def _page_run(page: str, user_id):
+    run = PageRun(page, user_id)
+    token = _current_run.set(run)
+    start = time.perf_counter()
+    try:
+        yield run
+    finally:
+        run.duration = time.perf_counter() - start
+        _current_run.reset(token)
+        _finish(run)
+
+
+def page_run(page: str, user_id=None):
+    """
+    Context manager wrapping one execution of a page script.
+    """
+    if not is_enabled():
+        return _NULL_CONTEXT
+    return _page_run(page, user_id)
+
+
+@contextmanager
+def _timed(section: str):
+    start = time.perf_counter()
+    token = _current_section.set(section)
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _current_section.reset(token)
+        run = _current_run.get()
+        page = run.page if run is not None else "-"
+        if run is not None:
+            run.sections.append((section, elapsed))
+        _add("section_seconds_sum", (page, section), elapsed)
+        _add("section_seconds_count", (page, section), 1)
+
+
+def timed(section: str):
+    """
+    Context manager timing a page section.
+    """
+    if not is_enabled():
+        return _NULL_CONTEXT
+    return _timed(section)
+
+
+def record_pool_wait(seconds: float):
+    """
+    Attributes time spent waiting for a pooled connection to the current run.
+    """
+    if not is_enabled():
+        return
+    run = _current_run.get()
+    if run is not None:
+        run.pool_wait += seconds
+    _add("pool_wait_seconds_sum", (run.page if run is not None else "-",), seconds)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _enabled:
+        conn.info.setdefault("winter_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not _enabled:
+        return
+    starts = conn.info.get("winter_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    # rowcount es -1 cuando el driver no lo conoce (SELECT en SQLite)
+    rows = max(cursor.rowcount, 0)
+    run = _current_run.get()
+    page = run.page if run is not None else "-"
+    if run is not None:
+        run.statements.append((statement, elapsed, rows))
+        run.section_statements[_current_section.get() or "-"] += 1
+    _add("sql_seconds_sum", (page,), elapsed)
+    _add("sql_statements_total", (page,), 1)
+    _add("sql_rows_total", (page,), rows)
+
+
+def instrument_engine(engine):
+    """
+    Attaches the statement timing listeners to an engine.
+    """
+    is_enabled()
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _finish(run: PageRun):
+    _add("page_seconds_sum", (run.page,), run.duration)
+    _add("page_runs_total", (run.page,), 1)
+    with _lock:
+        _last_runs[run.page] = run
+    logger.info(json.dumps(run.as_dict()))
+    path = settings.METRICS_CONFIG["file"]
+    if path:
+        write_metrics_file(path)
+
+
+def last_run(page: str):
+    with _lock:
+        return _last_runs.get(page)
+
+
+def last_fragment_runs(page: str) -> list:
+    """
+    Returns the last run of every fragment of `page` rerun on its own
+    (runs named `<page>.<section>`).
+    """
+    with _lock:
+        return [run for name, run in sorted(_last_runs.items()) if name.startswith(page + ".")]
+
+
+_LABEL_NAMES = {
+    "section_seconds_sum": ("page", "section"),
+    "section_seconds_count": ("page", "section"),
+}
+
+
+def render_metrics() -> str:
+    """
+    Returns every counter and collector gauge in Prometheus text format.
+    """
+    with _lock:
+        counters = sorted(_counters.items())
+    lines = []
+    for (metric, labels), value in counters:
+        names = _LABEL_NAMES.get(metric, ("page",))
+        label_text = ",".join(f'{name}="{label}"' for name, label in zip(names, labels))
+        lines.append(f"winter_{metric}{{{label_text}}} {value:g}")
+    for prefix, collector in sorted(_collectors.items()):
+        for name, value in sorted(collector().items()):
+            lines.append(f"winter_{prefix}_{name} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path: str):
+    """
+    Atomically replaces `path` with the current metrics.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, suffix=".tmp") as f:
+        f.write(render_metrics())
+    os.replace(f.name, path)
+
+
+def reset():
+    """
+    Clears counters and stored runs (tests).
+    """
+    with _lock:
+        _counters.clear()
+        _last_runs.clear()
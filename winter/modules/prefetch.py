@@ -0,0 +1,109 @@
+"""
+Concurrent data fetching for pages that run several independent queries.
+
+prefetch() submits the queries to a process-wide thread pool at the top of
+the page. Each section then calls get() for its result, so rendering starts
+as soon as the first one arrives and the page waits roughly as long as its
+slowest query instead of the sum of all of them. Context variables
+(instrumentation run, primary_reads(), session user) are copied into the
+worker threads.
+
+The pool has one thread per connection of the read pool, so concurrent
+users queue on connections rather than on threads. A single page run keeps
+at most PREFETCH_CONFIG["max_per_run"] queries in flight; the next one
+starts as soon as one finishes, and a query still waiting when its section
+asks for it runs in the page thread instead.
+
+Each prefetched result is handed out once: a later get() for the same name,
+such as one from a fragment rerun holding on to this object, loads again so
+it never sees data older than the query cache.
+"""
+import contextvars
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from winter.modules import database, instrumentation
+from winter.settings import PREFETCH_CONFIG
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=database.get_read_pool_capacity(),
+                                               thread_name_prefix="winter-prefetch")
+    return _executor
+
+
+def _reset_after_fork():
+    # Los hilos del pool no sobreviven al fork
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _timed_load(name: str, loader, *args):
+    # Sección propia para que las consultas del hilo no se mezclen con las de la página
+    with instrumentation.timed(f"prefetch.{name}"):
+        return loader(*args)
+
+
+class Prefetch:
+    """
+    Queries started in the background, keyed by name.
+    """
+
+    def __init__(self, calls: dict):
+        self._calls = {name: (loader, tuple(args), None) for name, (loader, *args) in calls.items()}
+        self._lock = threading.Lock()
+        self._context = contextvars.copy_context()
+        # SQLite en memoria comparte una sola conexión: no admite consultas simultáneas
+        self._executor = _get_executor() if database.supports_concurrent_reads() else None
+        self._queued = deque(self._calls) if self._executor else deque()
+        for _ in range(PREFETCH_CONFIG["max_per_run"]):
+            self._start_next()
+
+    def _start_next(self, _finished=None):
+        with self._lock:
+            while self._queued:
+                name = self._queued.popleft()
+                if name in self._calls:
+                    break
+            else:
+                return
+            loader, args, _ = self._calls[name]
+            # Una copia del contexto por consulta: un Context no puede estar activo en dos hilos
+            future = self._executor.submit(self._context.copy().run, _timed_load, name, loader, *args)
+            self._calls[name] = (loader, args, future)
+        future.add_done_callback(self._start_next)
+
+    def get(self, name: str, loader, *args):
+        """
+        Returns the result of the query started as `name` if it was started
+        with the same loader and arguments and not handed out yet; otherwise
+        runs `loader(*args)` now (e.g. a widget changed the range after the
+        prefetch).
+        """
+        with self._lock:
+            started = self._calls.pop(name, None)
+        if started is not None and started[0] is loader and started[1] == args and started[2] is not None:
+            return started[2].result()
+        return loader(*args)
+
+
+def prefetch(**calls) -> Prefetch:
+    """
+    Starts the `name=(loader, *args)` calls in the background, at most
+    PREFETCH_CONFIG["max_per_run"] at a time.
+    """
+    return Prefetch(calls)
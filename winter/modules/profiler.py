@@ -0,0 +1,103 @@
+"""
+Per-rerun profiler capture.
+
+When enabled (WINTER_PROFILE or the admin toggle), profiled() wraps one
+script run in cProfile and, if the run is slower than the threshold, dumps
+it to the profile directory as
+
+    <timestamp>_<page>_u<user>_<duration>ms.prof
+
+Only the newest `keep` files are kept. Open them with
+`python -m pstats <file>` or snakeviz.
+"""
+import cProfile
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+from winter import settings
+
+_NULL_CONTEXT = nullcontext()
+_enabled = None
+# cProfile solo admite un perfilador activo a la vez
+_active = threading.Lock()
+
+
+def is_enabled() -> bool:
+    global _enabled
+    if _enabled is None:
+        _enabled = settings.PROFILER_CONFIG["enabled"]
+    return _enabled
+
+
+def set_enabled(value: bool):
+    """
+    Turns profile capture on or off for the whole process (admin toggle).
+    """
+    global _enabled
+    _enabled = bool(value)
+
+
+def _profile_name(page: str, user_id, duration: float) -> str:
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    page = re.sub(r"[^A-Za-z0-9_-]", "_", page)
+    return f"{stamp}_{page}_u{user_id if user_id is not None else '-'}_{int(duration * 1000)}ms.prof"
+
+
+def list_profiles(directory: str = None) -> list:
+    """
+    Returns the saved profile paths, newest first.
+    """
+    directory = directory or settings.PROFILER_CONFIG["dir"]
+    if not os.path.isdir(directory):
+        return []
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".prof")]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+def rotate(directory: str, keep: int):
+    """
+    Deletes all but the `keep` newest profiles in `directory`.
+    """
+    for path in list_profiles(directory)[keep:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+@contextmanager
+def _profiled(page: str, user_id):
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        profile.enable()
+    except Exception:
+        # P. ej. otro perfilador ya activo en el hilo: la página se ejecuta sin perfilar
+        _active.release()
+        yield None
+        return
+    try:
+        yield profile
+    finally:
+        profile.disable()
+        _active.release()
+        duration = time.perf_counter() - start
+        config = settings.PROFILER_CONFIG
+        if duration * 1000 >= config["threshold_ms"]:
+            os.makedirs(config["dir"], exist_ok=True)
+            profile.dump_stats(os.path.join(config["dir"], _profile_name(page, user_id, duration)))
+            rotate(config["dir"], config["keep"])
+
+
+def profiled(page: str, user_id=None):
+    """
+    Context manager profiling one execution of a page script. Runs that
+    overlap with one already being profiled are not captured.
+    """
+    if not is_enabled() or not _active.acquire(blocking=False):
+        return _NULL_CONTEXT
+    return _profiled(page, user_id)
@@ -0,0 +1,56 @@
+"""
+Points and monthly ranks.
+
+Points come from POINTS_PER_ACTIVITY and ranks from RANK_THRESHOLDS (the
+minimum monthly points of each rank). Both work on whole arrays: WEIGHTS turns
+per-activity counts into points (see bitsets.py), and ranks are found with one
+searchsorted over the thresholds.
+"""
+import numpy as np
+
+from winter.settings import POINTS_PER_ACTIVITY, RANK_THRESHOLDS
+
+ACTIVITIES = list(POINTS_PER_ACTIVITY)
+WEIGHTS = np.array([POINTS_PER_ACTIVITY[activity] for activity in ACTIVITIES])
+
+RANKS = np.array(list(RANK_THRESHOLDS))
+_MINIMUMS = np.array(list(RANK_THRESHOLDS.values()))
+
+RANK_LABELS = {
+    'Estudiante': "👨‍🎓 Estudiante",
+    'Genin': "🥋 Genin",
+    'Chunin': "🎯 Chunin",
+    'Jounin': "⚔️ Jounin",
+    'Sannin': "🏆 Sannin Legendario",
+    'Hokage': "👑 Hokage"
+}
+
+
+def day_points(flags: dict) -> int:
+    """
+    Points of one day from its {activity: done} flags.
+    """
+    return int(sum(value for activity, value in POINTS_PER_ACTIVITY.items() if flags.get(activity)))
+
+
+def ranks(points) -> np.ndarray:
+    """
+    Rank names for an array of monthly points. Points below the first
+    threshold get the lowest rank.
+    """
+    index = np.searchsorted(_MINIMUMS, np.asarray(points), side='right') - 1
+    return RANKS[np.clip(index, 0, len(RANKS) - 1)]
+
+
+def rank(points) -> str:
+    """
+    Rank name for one monthly points value.
+    """
+    return str(ranks([points])[0])
+
+
+def rank_label(points) -> str:
+    """
+    Rank name with its emoji, as shown on the home page.
+    """
+    return RANK_LABELS[rank(points)]
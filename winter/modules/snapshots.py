@@ -0,0 +1,262 @@
+"""
+Derived results precomputed by the aggregation worker.
+
+winter/scripts/aggregate.py stores the monthly leaderboard, the monthly
+activity bitsets behind the heatmap, today's streaks and the downsampled
+group weight series in the snapshots table as JSON. Each pass handles the
+data_changes rows visible to it and deletes exactly those rows in the
+transaction that stores the snapshots, so a change whose transaction
+commits late (even with a lower id) stays in the log for the next pass.
+Each snapshot also records a watermark, the highest change id processed.
+
+The pages read them through the snapshot_*() functions below. Without
+WINTER_SNAPSHOTS saves are not logged and these always run the live query.
+A snapshot is used only if it is recent (SNAPSHOT_CONFIG["max_age_seconds"], so a stopped
+worker falls back to live queries) and the current user has no changes left
+in the log; otherwise the live query runs, so users always see their own
+changes right away.
+"""
+import json
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone
+
+import pandas as pd
+
+from winter.modules.bitsets import MonthBits, get_month_bits, range_months
+from winter.modules.cache import query_cache
+from winter.modules.database import (
+    REBUILD_SOURCE, AppState, DailyActivity, DataChange, MonthlyPoints, Snapshot, WeightEntry, get_group_weights,
+    get_monthly_leaderboard, has_pending_changes, month_start, primary_reads, session_scope
+)
+from winter.modules.downsample import downsample
+from winter.modules.streaks import Streak, get_streaks
+from winter import settings
+from winter.settings import CHART_CONFIG, SNAPSHOT_CONFIG, WEIGHT_PERIODS
+
+LeaderboardRow = namedtuple('LeaderboardRow', [
+    'username', 'user_id', 'physical_activity', 'diet_nutrition', 'rest_recovery', 'personal_development',
+    'total_points'
+])
+WeightRow = namedtuple('WeightRow', ['date', 'weight', 'username'])
+
+WATERMARK_KEY = 'snapshot_watermark'
+# Instantáneas de un solo día: las de días anteriores se borran en cada pasada
+DAILY_PREFIXES = ('streaks:', 'group_weights:')
+# Filas del registro borradas por sentencia
+PRUNE_BATCH = 500
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def leaderboard_name(month: date) -> str:
+    return f'leaderboard:{month:%Y-%m}'
+
+
+def month_bits_name(month: date) -> str:
+    return f'month_bits:{month:%Y-%m}'
+
+
+def _name_month(name: str) -> date:
+    return date.fromisoformat(f"{name.split(':', 1)[1]}-01")
+
+
+def streaks_name(today: date) -> str:
+    return f'streaks:{today.isoformat()}'
+
+
+def group_weights_name(start_date: date = None) -> str:
+    return f'group_weights:{start_date.isoformat() if start_date else "all"}'
+
+
+def weight_period_starts(today: date) -> list:
+    """
+    First day of every window in WEIGHT_PERIODS (None for the whole history).
+    """
+    return [today - timedelta(days=days) if days else None for days in WEIGHT_PERIODS.values()]
+
+
+def _encode_leaderboard(rows) -> list:
+    return [list(LeaderboardRow(*row)) for row in rows]
+
+
+def _decode_leaderboard(payload) -> list:
+    return [LeaderboardRow(*row) for row in payload]
+
+
+def _encode_month_bits(bits: MonthBits) -> dict:
+    return {'user_ids': bits.user_ids.tolist(), 'bits': bits.bits.tolist()}
+
+
+def _encode_streaks(streaks: dict) -> dict:
+    return {user_id: {kind: list(streak) for kind, streak in kinds.items()} for user_id, kinds in streaks.items()}
+
+
+def _decode_streaks(payload) -> dict:
+    # Las claves de JSON son cadenas: volver a ids enteros
+    return {int(user_id): {kind: Streak(*streak) for kind, streak in kinds.items()}
+            for user_id, kinds in payload.items()}
+
+
+def _encode_group_weights(rows) -> list:
+    df = pd.DataFrame([(row.date, row.weight, row.username) for row in rows],
+                      columns=['date', 'weight', 'username'])
+    # Solo se guarda la serie ya reducida que acaba en el gráfico
+    df = downsample(df, CHART_CONFIG["group_weight_max_points"], by='username')
+    return [[pd.Timestamp(day).date().isoformat(), float(weight), username]
+            for day, weight, username in df[['date', 'weight', 'username']].itertuples(index=False)]
+
+
+def _decode_group_weights(payload) -> list:
+    return [WeightRow(date.fromisoformat(day), weight, username) for day, weight, username in payload]
+
+
+def read_snapshot(name: str, decode, user_id: int = None):
+    """
+    Returns the decoded snapshot `name`, or None if snapshots are disabled,
+    it is missing, older than SNAPSHOT_CONFIG["max_age_seconds"] or
+    `user_id` has saves the worker has not processed yet.
+    """
+    if not settings.SNAPSHOTS_ENABLED:
+        return None
+
+    def load():
+        with session_scope(read=True) as session:
+            row = session.query(Snapshot.payload, Snapshot.watermark, Snapshot.computed_at).filter(
+                Snapshot.name == name
+            ).first()
+        if row is None:
+            return None
+        return row.watermark, row.computed_at, decode(json.loads(row.payload))
+
+    snapshot = query_cache.get_or_load('snapshots', load, scope=name)
+    if snapshot is None:
+        return None
+    watermark, computed_at, value = snapshot
+    if _utcnow() - computed_at > timedelta(seconds=SNAPSHOT_CONFIG["max_age_seconds"]):
+        return None
+    if user_id is not None and has_pending_changes(user_id):
+        return None
+    return value
+
+
+def snapshot_leaderboard(month: date, user_id: int = None) -> list:
+    """
+    get_monthly_leaderboard() from its snapshot when it is fresh.
+    """
+    month = month_start(month)
+    rows = read_snapshot(leaderboard_name(month), _decode_leaderboard, user_id)
+    return rows if rows is not None else get_monthly_leaderboard(month)
+
+
+def snapshot_streaks(user_id: int = None) -> dict:
+    """
+    get_streaks() for today from its snapshot when it is fresh.
+    """
+    streaks = read_snapshot(streaks_name(date.today()), _decode_streaks, user_id)
+    return streaks if streaks is not None else get_streaks()
+
+
+def snapshot_range_bits(start_date: date, end_date: date, user_id: int = None) -> list:
+    """
+    get_range_bits() with every month read from its snapshot when it is
+    fresh.
+    """
+    months = []
+    for month in range_months(start_date, end_date):
+        bits = read_snapshot(month_bits_name(month),
+                             lambda payload, month=month: MonthBits(month, payload['user_ids'], payload['bits']),
+                             user_id)
+        months.append(bits if bits is not None else get_month_bits(month))
+    return months
+
+
+def snapshot_group_weights(start_date: date = None, user_id: int = None) -> list:
+    """
+    get_group_weights() from its snapshot when it is fresh. The snapshot
+    holds the series already downsampled for the chart.
+    """
+    rows = read_snapshot(group_weights_name(start_date), _decode_group_weights, user_id)
+    return rows if rows is not None else get_group_weights(start_date)
+
+
+def refresh_snapshots(full: bool = False, today: date = None) -> dict:
+    """
+    Recomputes the snapshots affected by the changes in the log (every one
+    with `full` or after a REBUILD_SOURCE change) and the ones older than
+    SNAPSHOT_CONFIG["refresh_seconds"], then deletes the changes it handled.
+    Only recomputed snapshots get a new computed_at. Returns a summary of
+    the pass.
+    """
+    today = today or date.today()
+    # Los cambios llegan desde otros procesos: no reutilizar nada de la caché local
+    query_cache.clear()
+
+    with session_scope() as session:
+        # Los ids se asignan al insertar pero las transacciones pueden confirmarse en otro orden:
+        # se procesan las filas visibles ahora, sin suponer nada de los ids que faltan
+        state = session.get(AppState, WATERMARK_KEY)
+        previous = int(state.value) if state else 0
+        logged = session.query(DataChange.id, DataChange.source, DataChange.day).all()
+        existing = dict(session.query(Snapshot.name, Snapshot.computed_at).all())
+        # Los pesos de los puntos o monthly_points se han reescrito para todos los días
+        full = full or any(source == REBUILD_SOURCE for _, source, _ in logged)
+        if full:
+            stored_months = {month for (month,) in session.query(MonthlyPoints.month).distinct()}
+
+    processed = [change_id for change_id, _, _ in logged]
+    watermark = max([previous, *processed])
+    changes = {(source, day) for _, source, day in logged}
+    activity_days = {day for source, day in changes if source == DailyActivity.__tablename__}
+    weights_changed = any(source == WeightEntry.__tablename__ for source, _ in changes)
+    touched_months = {month_start(day) for day in activity_days}
+    # Sin cambios una instantánea no se da por vigente indefinidamente: se recalcula antes de caducar
+    renew_before = _utcnow() - timedelta(seconds=SNAPSHOT_CONFIG["refresh_seconds"])
+    due = {name for name, computed_at in existing.items() if computed_at <= renew_before}
+    due_months = {_name_month(name) for name in due if name.startswith(('leaderboard:', 'month_bits:'))}
+
+    months = {month_start(today)} | touched_months | due_months | (stored_months if full else set())
+    payloads = {}
+    current_daily = {streaks_name(today)} | {group_weights_name(start) for start in weight_period_starts(today)}
+    # Recalcular desde el primario: una réplica con retraso daría datos anteriores a la marca
+    with primary_reads():
+        for month in sorted(months):
+            if full or month in touched_months | due_months or month_bits_name(month) not in existing:
+                payloads[leaderboard_name(month)] = _encode_leaderboard(get_monthly_leaderboard(month))
+                payloads[month_bits_name(month)] = _encode_month_bits(get_month_bits(month))
+
+        name = streaks_name(today)
+        if full or activity_days or name not in existing or name in due:
+            payloads[name] = _encode_streaks(get_streaks(today))
+
+        for start_date in weight_period_starts(today):
+            name = group_weights_name(start_date)
+            if full or weights_changed or name not in existing or name in due:
+                payloads[name] = _encode_group_weights(get_group_weights(start_date))
+
+    computed_at = _utcnow()
+    with session_scope() as session:
+        for name, payload in payloads.items():
+            session.merge(Snapshot(name=name, payload=json.dumps(payload), watermark=watermark,
+                                   computed_at=computed_at))
+        session.flush()
+        stale = [name for name in set(existing) - current_daily if name.startswith(DAILY_PREFIXES)]
+        if stale:
+            session.query(Snapshot).filter(Snapshot.name.in_(stale)).delete(synchronize_session=False)
+        # Solo las filas leídas: un cambio confirmado después sigue pendiente aunque su id sea menor
+        pruned = 0
+        for start in range(0, len(processed), PRUNE_BATCH):
+            pruned += session.query(DataChange).filter(
+                DataChange.id.in_(processed[start:start + PRUNE_BATCH])
+            ).delete(synchronize_session=False)
+        session.merge(AppState(key=WATERMARK_KEY, value=str(watermark), updated_at=computed_at))
+
+    query_cache.invalidate('snapshots')
+    return {
+        'watermark': watermark,
+        'changes': len(changes),
+        'computed': sorted(payloads),
+        'removed': len(stale),
+        'pruned': pruned,
+    }
@@ -0,0 +1,106 @@
+"""
+Activity streaks computed in the database.
+
+Each streak is an island of consecutive days: for the days on which a user
+completed an activity, `day_number(date) - row_number()` is constant within a
+run of consecutive days and changes after every gap. One query groups those
+islands for every user and every kind (each activity plus "all", meaning all
+four done) and keeps the longest streak and the one still alive.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+
+from sqlalchemy import Integer, and_, case, literal, select, union_all
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import func
+from sqlalchemy.sql.functions import FunctionElement
+
+from winter.modules.cache import query_cache
+from winter.modules.database import DailyActivity, session_scope
+from winter.settings import POINTS_PER_ACTIVITY
+
+ALL = 'all'
+STREAK_KINDS = (*POINTS_PER_ACTIVITY, ALL)
+
+Streak = namedtuple('Streak', ['current', 'longest'])
+NO_STREAK = Streak(0, 0)
+
+
+class day_number(FunctionElement):
+    """
+    Days since a fixed epoch as an integer, so consecutive dates differ by 1.
+    """
+    type = Integer()
+    inherit_cache = True
+
+
+@compiles(day_number)
+def _day_number(element, compiler, **kw):
+    return "(%s - DATE '1970-01-01')" % compiler.process(element.clauses, **kw)
+
+
+@compiles(day_number, 'sqlite')
+def _day_number_sqlite(element, compiler, **kw):
+    return "CAST(julianday(%s) AS INTEGER)" % compiler.process(element.clauses, **kw)
+
+
+def _islands(kind: str):
+    if kind == ALL:
+        done = and_(*(getattr(DailyActivity, activity) for activity in POINTS_PER_ACTIVITY))
+    else:
+        done = getattr(DailyActivity, kind)
+
+    days = select(
+        DailyActivity.user_id,
+        DailyActivity.date,
+        (day_number(DailyActivity.date)
+         - func.row_number().over(partition_by=DailyActivity.user_id, order_by=DailyActivity.date)).label('island')
+    ).where(done).subquery()
+
+    return select(
+        days.c.user_id,
+        literal(kind).label('kind'),
+        func.count().label('length'),
+        func.max(days.c.date).label('last_day')
+    ).group_by(days.c.user_id, days.c.island)
+
+
+def streaks_query(today: date):
+    """
+    Returns the statement yielding (user_id, kind, current, longest) for every
+    user and kind with at least one completed day. A streak is still current
+    if its last day is today or yesterday.
+    """
+    islands = union_all(*(_islands(kind) for kind in STREAK_KINDS)).subquery()
+    alive = islands.c.last_day >= today - timedelta(days=1)
+    return select(
+        islands.c.user_id,
+        islands.c.kind,
+        func.max(case((alive, islands.c.length), else_=0)).label('current'),
+        func.max(islands.c.length).label('longest')
+    ).group_by(islands.c.user_id, islands.c.kind)
+
+
+def get_streaks(today: date = None) -> dict:
+    """
+    Returns {user_id: {kind: Streak}} for every user, computed in one query
+    and cached until the next save.
+    """
+    today = today or date.today()
+
+    def load():
+        streaks = {}
+        with session_scope(read=True) as session:
+            for row in session.execute(streaks_query(today)):
+                streaks.setdefault(row.user_id, {})[row.kind] = Streak(row.current, row.longest)
+        return streaks
+
+    return query_cache.get_or_load('streaks', load, scope=(None, today))
+
+
+def get_user_streaks(user_id: int, today: date = None) -> dict:
+    """
+    Returns {kind: Streak} for a user, with zeros for kinds never completed.
+    """
+    streaks = get_streaks(today).get(user_id, {})
+    return {kind: streaks.get(kind, NO_STREAK) for kind in STREAK_KINDS}
@@ -0,0 +1,64 @@
+"""
+Background aggregation worker.
+
+Recomputes the ranking page's derived results (monthly leaderboard,
+activity bitsets, streaks and group weight series) into the snapshots
+table, see winter/modules/snapshots.py. Each pass only rebuilds what the
+changes still in the log affect, so it can run from cron or as a
+long-lived process:
+
+    python -m winter.scripts.aggregate                 # one pass (cron)
+    python -m winter.scripts.aggregate --loop          # every SNAPSHOT_CONFIG["interval_seconds"]
+    python -m winter.scripts.aggregate --full          # rebuild every snapshot
+"""
+import argparse
+import sys
+import time
+import traceback
+
+from winter import settings
+from winter.modules.snapshots import refresh_snapshots
+from winter.scripts.bootstrap import bootstrap
+from winter.settings import SNAPSHOT_CONFIG
+
+
+def run_once(full: bool = False) -> dict:
+    summary = refresh_snapshots(full=full)
+    print(f"Snapshots up to change {summary['watermark']}: {summary['changes']} changes, "
+          f"{len(summary['computed'])} recomputed, {summary['removed']} removed, {summary['pruned']} log rows pruned.", flush=True)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the ranking snapshots.")
+    parser.add_argument('--loop', action='store_true', help="keep running, one pass every --interval seconds")
+    parser.add_argument('--interval', type=float, default=SNAPSHOT_CONFIG["interval_seconds"],
+                        help="seconds between passes with --loop")
+    parser.add_argument('--full', action='store_true', help="rebuild every snapshot on the first pass")
+    args = parser.parse_args()
+
+    if not settings.SNAPSHOTS_ENABLED:
+        # Sin la variable la app no registra cambios: las instantáneas quedarían desfasadas
+        sys.exit("WINTER_SNAPSHOTS is not enabled: set WINTER_SNAPSHOTS=1 for the app and the worker.")
+    bootstrap()
+    if not args.loop:
+        run_once(full=args.full)
+        return
+
+    full = args.full
+    try:
+        while True:
+            started = time.monotonic()
+            try:
+                run_once(full=full)
+                full = False
+            except Exception:
+                # Un fallo puntual (p. ej. la base de datos reiniciando) no detiene el worker
+                traceback.print_exc()
+            time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+One-time database bootstrap.
+
+The app calls bootstrap() on every rerun, but it only touches the database
+the first time in each process: it reads the recorded schema version,
+applies pending migrations when the database is behind, creates the
+upcoming monthly partitions and recomputes stored points if
+POINTS_PER_ACTIVITY changed. Deployments can
+run it ahead of time so the first request does no DDL at all:
+
+    python -m winter.scripts.bootstrap
+"""
+import threading
+
+from winter.modules.database import get_engine, sync_points_weights
+from winter.scripts.migrate import LATEST_VERSION, current_version, upgrade
+from winter.scripts.partitions import ensure_partitions, is_partitioned
+
+_bootstrapped = False
+_lock = threading.Lock()
+
+
+def bootstrap() -> int:
+    """
+    Ensures the schema is at the latest version, once per process.
+    Returns the schema version.
+    """
+    global _bootstrapped
+    if _bootstrapped:
+        return LATEST_VERSION
+    with _lock:
+        if not _bootstrapped:
+            with get_engine().begin() as connection:
+                version = current_version(connection)
+            if version < LATEST_VERSION:
+                upgrade()
+            with get_engine().begin() as connection:
+                if connection.dialect.name == 'postgresql' and is_partitioned(connection):
+                    ensure_partitions(connection)
+            sync_points_weights()
+            _bootstrapped = True
+    return LATEST_VERSION
+
+
+def reset():
+    """
+    Forces the next bootstrap() call to check the database again.
+    """
+    global _bootstrapped
+    with _lock:
+        _bootstrapped = False
+
+
+def main():
+    version = bootstrap()
+    print(f"Database ready at schema version {version}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
-from winter.modules.database import initialize_database, create_user
+from winter.modules.database import create_user
+from winter.scripts.migrate import upgrade
 
 
 def main():
-    initialize_database()
+    upgrade()
     # Crear un usuario inicial
     username = input("Enter admin username: ")
     password = input("Enter admin password: ")
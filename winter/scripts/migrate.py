@@ -0,0 +1,202 @@
+"""
+Versioned schema migrations.
+
+Each migration is applied once, in order, and recorded in the
+``schema_version`` table. Migrations must be idempotent: a database created
+with ``Base.metadata.create_all`` already has the latest model shape, so
+every step checks for what it creates (``IF NOT EXISTS``).
+
+Index migrations run outside a transaction so PostgreSQL can build them
+with ``CREATE INDEX CONCURRENTLY`` without blocking writes. Every other
+migration runs in a single transaction: readers never see a half-rebuilt
+table and a failure leaves it as it was.
+
+    python -m winter.scripts.migrate            # apply pending migrations
+    python -m winter.scripts.migrate --status   # show current version
+"""
+import argparse
+
+from sqlalchemy import inspect, text
+
+from winter.modules.cache import query_cache
+from winter.modules.database import (
+    AppState, Base, DataChange, SchemaVersion, Snapshot, get_engine, rebuild_monthly_points, recompute_points
+)
+from winter.scripts.partitions import partition_daily_activities
+
+# Clave del advisory lock que serializa migraciones entre procesos
+MIGRATION_LOCK_KEY = 20241101
+
+
+def _is_postgresql(connection) -> bool:
+    return connection.dialect.name == 'postgresql'
+
+
+def create_index(connection, name: str, table: str, columns: list, unique: bool = False):
+    """
+    Creates an index if it does not exist. On PostgreSQL it is built
+    concurrently, dropping first an invalid leftover of an interrupted build.
+    """
+    unique_sql = 'UNIQUE ' if unique else ''
+    column_sql = ', '.join(columns)
+    if not _is_postgresql(connection):
+        connection.execute(text(f'CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({column_sql})'))
+        return
+
+    invalid = connection.execute(text(
+        'SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+        'WHERE c.relname = :name AND NOT i.indisvalid'
+    ), {'name': name}).first()
+    if invalid:
+        connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+    connection.execute(text(
+        f'CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({column_sql})'
+    ))
+
+
+def _initial_schema(connection):
+    Base.metadata.create_all(connection)
+
+
+# Columnas de actividad de la tabla original, fijas aunque cambie POINTS_PER_ACTIVITY
+_BASELINE_ACTIVITIES = ('physical_activity', 'diet_nutrition', 'rest_recovery', 'personal_development')
+
+
+def _unique_daily_activity(connection):
+    # El tracker original actualizaba cualquiera de los duplicados (.first() sin ORDER BY): antes
+    # de borrarlos, la fila que se conserva se queda con las actividades marcadas en cualquiera
+    merged = ', '.join(
+        f'{activity} = (SELECT MAX(CASE WHEN d.{activity} THEN 1 ELSE 0 END) = 1 FROM daily_activities d '
+        'WHERE d.user_id = daily_activities.user_id AND d.date = daily_activities.date)'
+        for activity in _BASELINE_ACTIVITIES
+    )
+    connection.execute(text(
+        f'UPDATE daily_activities SET {merged} WHERE id IN ('
+        'SELECT MAX(id) FROM daily_activities GROUP BY user_id, date HAVING COUNT(*) > 1)'
+    ))
+    connection.execute(text(
+        'DELETE FROM daily_activities WHERE id NOT IN ('
+        'SELECT MAX(id) FROM daily_activities GROUP BY user_id, date)'
+    ))
+    create_index(connection, 'uq_daily_activities_user_date', 'daily_activities', ['user_id', 'date'], unique=True)
+
+
+def _daily_activity_date_index(connection):
+    create_index(connection, 'ix_daily_activities_date', 'daily_activities', ['date'])
+
+
+def _weight_entry_index(connection):
+    create_index(connection, 'ix_weight_entries_user_date', 'weight_entries', ['user_id', 'date'])
+
+
+def _backfill_monthly_points(connection):
+    # daily_activities.points no existe hasta la migración 6: sumar los flags, como
+    # se hacía cuando se escribió esta migración
+    rebuild_monthly_points(connection, stored_points=False)
+
+
+def _stored_daily_points(connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('daily_activities')}
+    if 'points' not in columns:
+        connection.execute(text('ALTER TABLE daily_activities ADD COLUMN points INTEGER NOT NULL DEFAULT 0'))
+    AppState.__table__.create(connection, checkfirst=True)
+    recompute_points(connection)
+    rebuild_monthly_points(connection)
+
+
+def _partition_daily_activities(connection):
+    # Solo PostgreSQL; SQLite no tiene particionado
+    if _is_postgresql(connection):
+        partition_daily_activities(connection)
+
+
+def _snapshot_tables(connection):
+    DataChange.__table__.create(connection, checkfirst=True)
+    Snapshot.__table__.create(connection, checkfirst=True)
+
+
+# (versión, descripción, función, transaccional)
+MIGRATIONS = [
+    (1, 'Initial schema', _initial_schema, True),
+    (2, 'Unique index daily_activities(user_id, date)', _unique_daily_activity, False),
+    (3, 'Index daily_activities(date)', _daily_activity_date_index, False),
+    (4, 'Index weight_entries(user_id, date)', _weight_entry_index, False),
+    (5, 'Backfill monthly_points', _backfill_monthly_points, True),
+    (6, 'Stored daily_activities.points', _stored_daily_points, True),
+    (7, 'Partition daily_activities by month', _partition_daily_activities, True),
+    (8, 'Change log and snapshot tables', _snapshot_tables, True),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(connection) -> int:
+    """
+    Returns the highest applied migration, 0 on an unmigrated database.
+    """
+    SchemaVersion.__table__.create(connection, checkfirst=True)
+    version = connection.execute(text('SELECT MAX(version) FROM schema_version')).scalar()
+    return version or 0
+
+
+def _record(connection, version: int, description: str):
+    connection.execute(
+        SchemaVersion.__table__.insert().values(version=version, description=description)
+    )
+
+
+def upgrade(engine=None) -> list:
+    """
+    Applies every pending migration in order.
+    Returns the list of versions applied.
+    """
+    engine = engine or get_engine()
+    applied = []
+    with engine.connect() as lock_connection:
+        if _is_postgresql(lock_connection):
+            lock_connection.execute(text('SELECT pg_advisory_lock(:key)'), {'key': MIGRATION_LOCK_KEY})
+        try:
+            with engine.begin() as connection:
+                version = current_version(connection)
+
+            for number, description, migration, transactional in MIGRATIONS:
+                if number <= version:
+                    continue
+                if transactional:
+                    with engine.begin() as connection:
+                        migration(connection)
+                        _record(connection, number, description)
+                else:
+                    with engine.connect() as connection:
+                        migration(connection.execution_options(isolation_level='AUTOCOMMIT'))
+                    with engine.begin() as connection:
+                        _record(connection, number, description)
+                applied.append(number)
+                print(f"Applied migration {number}: {description}")
+        finally:
+            if _is_postgresql(lock_connection):
+                lock_connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': MIGRATION_LOCK_KEY})
+
+    if applied:
+        query_cache.clear()
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database schema migrations.")
+    parser.add_argument('--status', action='store_true', help="show the current schema version and exit")
+    args = parser.parse_args()
+
+    if args.status:
+        with get_engine().begin() as connection:
+            version = current_version(connection)
+        print(f"Schema version {version} (latest {LATEST_VERSION}).")
+        return
+
+    applied = upgrade()
+    if not applied:
+        print(f"Database already at schema version {LATEST_VERSION}.")
+
+
+if __name__ == "__main__":
+    main()
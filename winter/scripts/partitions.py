@@ -0,0 +1,178 @@
+"""
+Monthly range partitions of daily_activities (PostgreSQL only).
+
+The table is partitioned by month on `date`, one partition per month
+(``daily_activities_pYYYYMM``) plus a default partition for dates without
+one. Queries for a month only scan its partition, and old months can be
+detached as standalone tables without rewriting anything.
+
+Partitions are created PARTITION_MONTHS_AHEAD months ahead by the
+migration and on every bootstrap, so the default partition normally stays
+empty.
+
+    python -m winter.scripts.partitions                  # create upcoming partitions
+    python -m winter.scripts.partitions --list
+    python -m winter.scripts.partitions --detach 2024-01
+"""
+import argparse
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+from winter.modules.database import get_engine, month_start
+
+PARENT = 'daily_activities'
+DEFAULT_PARTITION = f'{PARENT}_default'
+PARTITION_MONTHS_AHEAD = 12
+
+
+def partition_name(month: date) -> str:
+    return f'{PARENT}_p{month:%Y%m}'
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def is_partitioned(connection) -> bool:
+    """
+    Whether daily_activities is already a partitioned table.
+    """
+    return connection.execute(text(
+        'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :name'
+    ), {'name': PARENT}).first() is not None
+
+
+def list_partitions(connection) -> list:
+    """
+    Returns the names of the partitions attached to daily_activities.
+    """
+    return connection.execute(text(
+        'SELECT c.relname FROM pg_inherits i '
+        'JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent '
+        'WHERE p.relname = :name ORDER BY c.relname'
+    ), {'name': PARENT}).scalars().all()
+
+
+def create_partition(connection, month: date):
+    """
+    Creates the partition of `month`. Rows of that month already stored in
+    the default partition are moved into it.
+    """
+    start, end = month, _add_months(month, 1)
+    bounds = {'start': start, 'end': end}
+    stray = connection.execute(text(
+        f'SELECT 1 FROM {DEFAULT_PARTITION} WHERE date >= :start AND date < :end LIMIT 1'
+    ), bounds).first()
+    if stray:
+        connection.execute(text(
+            f'CREATE TEMP TABLE moved_activities ON COMMIT DROP AS '
+            f'SELECT * FROM {DEFAULT_PARTITION} WHERE date >= :start AND date < :end'
+        ), bounds)
+        connection.execute(text(f'DELETE FROM {DEFAULT_PARTITION} WHERE date >= :start AND date < :end'), bounds)
+    connection.execute(text(
+        f"CREATE TABLE {partition_name(month)} PARTITION OF {PARENT} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    if stray:
+        connection.execute(text(f'INSERT INTO {PARENT} SELECT * FROM moved_activities'))
+        connection.execute(text('DROP TABLE moved_activities'))
+
+
+def ensure_partitions(connection, first_month: date = None, months_ahead: int = PARTITION_MONTHS_AHEAD) -> list:
+    """
+    Creates the missing monthly partitions from `first_month` (the current
+    month by default) to `months_ahead` months from now. Returns the names
+    created.
+    """
+    existing = set(list_partitions(connection))
+    month = month_start(first_month or date.today())
+    last = _add_months(month_start(date.today()), months_ahead)
+    created = []
+    while month <= last:
+        if partition_name(month) not in existing:
+            create_partition(connection, month)
+            created.append(partition_name(month))
+        month = _add_months(month, 1)
+    return created
+
+
+def partition_daily_activities(connection):
+    """
+    Converts daily_activities into a table partitioned by month, copying the
+    existing rows, inside the caller's transaction. The primary key becomes
+    (id, date) because PostgreSQL requires the partition key in every unique
+    constraint; ids keep coming from the same sequence.
+    """
+    if is_partitioned(connection):
+        return
+    connection.execute(text(f'LOCK TABLE {PARENT} IN ACCESS EXCLUSIVE MODE'))
+    first_day = connection.execute(text(f'SELECT MIN(date) FROM {PARENT}')).scalar()
+
+    connection.execute(text(f'ALTER TABLE {PARENT} RENAME TO {PARENT}_unpartitioned'))
+    for constraint in (f'{PARENT}_pkey', 'uq_daily_activities_user_date'):
+        connection.execute(text(f'ALTER TABLE {PARENT}_unpartitioned DROP CONSTRAINT IF EXISTS {constraint}'))
+    for index in ('uq_daily_activities_user_date', 'ix_daily_activities_date', 'ix_daily_activities_id'):
+        connection.execute(text(f'DROP INDEX IF EXISTS {index}'))
+
+    connection.execute(text(f"""
+        CREATE TABLE {PARENT} (
+            id INTEGER NOT NULL DEFAULT nextval('{PARENT}_id_seq'),
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            date DATE NOT NULL,
+            physical_activity BOOLEAN,
+            diet_nutrition BOOLEAN,
+            rest_recovery BOOLEAN,
+            personal_development BOOLEAN,
+            points INTEGER NOT NULL DEFAULT 0,
+            CONSTRAINT {PARENT}_pkey PRIMARY KEY (id, date),
+            CONSTRAINT uq_daily_activities_user_date UNIQUE (user_id, date)
+        ) PARTITION BY RANGE (date)
+    """))
+    connection.execute(text(f'CREATE INDEX ix_daily_activities_date ON {PARENT} (date)'))
+    connection.execute(text(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT'))
+    ensure_partitions(connection, first_month=first_day)
+
+    connection.execute(text(
+        f'INSERT INTO {PARENT} (id, user_id, date, physical_activity, diet_nutrition, rest_recovery, '
+        f'personal_development, points) SELECT id, user_id, date, physical_activity, diet_nutrition, '
+        f'rest_recovery, personal_development, points FROM {PARENT}_unpartitioned'
+    ))
+    connection.execute(text(f'ALTER SEQUENCE {PARENT}_id_seq OWNED BY {PARENT}.id'))
+    connection.execute(text(f'DROP TABLE {PARENT}_unpartitioned'))
+
+
+def detach_partition(connection, month: date) -> str:
+    """
+    Detaches the partition of `month`, which stays as a standalone table
+    for archiving or dropping. Returns its name.
+    """
+    name = partition_name(month_start(month))
+    connection.execute(text(f'ALTER TABLE {PARENT} DETACH PARTITION {name}'))
+    return name
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the monthly partitions of daily_activities.")
+    parser.add_argument('--list', action='store_true', help="list the attached partitions")
+    parser.add_argument('--detach', metavar='YYYY-MM', help="detach the partition of a month")
+    parser.add_argument('--ahead', type=int, default=PARTITION_MONTHS_AHEAD, help="months to create ahead")
+    args = parser.parse_args()
+
+    with get_engine().begin() as connection:
+        if connection.dialect.name != 'postgresql' or not is_partitioned(connection):
+            print("daily_activities is not partitioned (PostgreSQL only, see winter.scripts.migrate).")
+            return
+        if args.list:
+            print("\n".join(list_partitions(connection)))
+        elif args.detach:
+            name = detach_partition(connection, datetime.strptime(args.detach, '%Y-%m').date())
+            print(f"Detached {name}.")
+        else:
+            created = ensure_partitions(connection, months_ahead=args.ahead)
+            print(f"Created {len(created)} partitions.")
+
+
+if __name__ == "__main__":
+    main()
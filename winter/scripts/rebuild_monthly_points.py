@@ -0,0 +1,13 @@
+from winter.modules.database import rebuild_monthly_points
+from winter.scripts.bootstrap import bootstrap
+
+
+def main():
+    # Llevar el esquema a la última versión con las migraciones antes de tocar los datos
+    bootstrap()
+    rows = rebuild_monthly_points()
+    print(f"Monthly points rebuilt: {rows} rows.")
+
+
+if __name__ == "__main__":
+    main()
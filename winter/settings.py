@@ -1,34 +1,183 @@
 import os
+import sys
+from functools import lru_cache
+from urllib.parse import quote_plus
 
-from dotenv import load_dotenv
+# Los valores que dependen del entorno se resuelven en el primer acceso
+# (ver __getattr__), buscando cada clave en este orden:
+#   1. Streamlit secrets (.streamlit/secrets.toml del proyecto o del usuario)
+#   2. Archivo .env
+#   3. Variables de entorno del proceso
+# Importar este módulo no importa streamlit ni lee ningún archivo.
 
-# Cargar variables de entorno
-load_dotenv(override=True)
+SECRETS_PATHS = [
+    os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml"),
+    os.path.join(os.getcwd(), ".streamlit", "secrets.toml"),
+]
 
-# Configuración de Base de Datos
-try:
-    import streamlit as st
-    DB_CONFIG = {
-        "user": st.secrets["POSTGRES_USER"],
-        "password": st.secrets["POSTGRES_PASSWORD"],
-        "host": st.secrets["POSTGRES_HOST"],
-        "port": st.secrets.get("POSTGRES_PORT", "5432"),
-        "database": st.secrets["POSTGRES_DB"],
+
+@lru_cache(maxsize=None)
+def _secrets() -> dict:
+    # Dentro de la app se usa st.secrets; fuera de ella se leen los TOML sin importar streamlit
+    st = sys.modules.get("streamlit")
+    if st is not None:
+        try:
+            return dict(st.secrets)
+        except Exception:
+            pass
+    values = {}
+    for path in SECRETS_PATHS:
+        if os.path.exists(path):
+            import toml
+            values.update(toml.load(path))
+    return values
+
+
+@lru_cache(maxsize=None)
+def _dotenv() -> dict:
+    from dotenv import dotenv_values, find_dotenv
+    path = find_dotenv(usecwd=True)
+    return dotenv_values(path) if path else {}
+
+
+def get_setting(name: str, default=None):
+    """
+    Returns a setting from Streamlit secrets, the .env file or the
+    environment, in that order.
+    """
+    for source in (_secrets(), _dotenv(), os.environ):
+        value = source.get(name)
+        if value is not None:
+            return value
+    return default
+
+
+def _db_config() -> dict:
+    return {
+        "user": get_setting("POSTGRES_USER"),
+        "password": get_setting("POSTGRES_PASSWORD"),
+        "host": get_setting("POSTGRES_HOST"),
+        "port": get_setting("POSTGRES_PORT", "5432"),
+        "database": get_setting("POSTGRES_DB"),
+    }
+
+
+def _database_url() -> str:
+    # DATABASE_URL tiene prioridad; si no, se construye a partir de POSTGRES_*
+    url = get_setting("DATABASE_URL")
+    if url:
+        return url
+    config = _resolve("DB_CONFIG")
+    return (
+        f"postgresql://{quote_plus(str(config['user']))}:{quote_plus(str(config['password']))}"
+        f"@{config['host']}:{config['port']}/{config['database']}"
+    )
+
+
+def _ssl_config() -> dict:
+    return {
+        "sslmode": get_setting("POSTGRES_SSLMODE", "require")
+    }
+
+
+def _connect_args_for(url: str) -> dict:
+    # Argumentos de conexión del driver según el backend
+    return {"check_same_thread": False} if url.startswith("sqlite") else _resolve("SSL_CONFIG")
+
+
+def _db_connect_args() -> dict:
+    return _connect_args_for(_resolve("DATABASE_URL"))
+
+
+def _database_read_url():
+    # Réplica de lectura opcional para los paneles; sin ella todo va al primario
+    return get_setting("DATABASE_READ_URL")
+
+
+def _db_read_connect_args() -> dict:
+    url = _resolve("DATABASE_READ_URL")
+    return _connect_args_for(url) if url else {}
+
+
+def _session_config() -> dict:
+    # Configuración de sesiones de login (token firmado en una cookie)
+    return {
+        "secret": get_setting("SESSION_SECRET"),
+        "ttl": 12 * 60 * 60
+    }
+
+
+def _is_true(value) -> bool:
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _metrics_config() -> dict:
+    # Instrumentación de SQL y tiempos de página (desactivada por defecto)
+    return {
+        "enabled": _is_true(get_setting("WINTER_METRICS", "0")),
+        "file": get_setting("WINTER_METRICS_FILE"),
     }
-except Exception as e:
-    # Fallback a variables de entorno si no hay secrets de Streamlit disponibles
-    DB_CONFIG = {
-        "user": os.getenv("POSTGRES_USER"),
-        "password": os.getenv("POSTGRES_PASSWORD"),
-        "host": os.getenv("POSTGRES_HOST"),
-        "port": os.getenv("POSTGRES_PORT", "5432"),
-        "database": os.getenv("POSTGRES_DB"),
+
+
+def _profiler_config() -> dict:
+    # Captura de perfiles cProfile de las ejecuciones lentas (desactivada por defecto)
+    return {
+        "enabled": _is_true(get_setting("WINTER_PROFILE", "0")),
+        "dir": get_setting("WINTER_PROFILE_DIR", ".profiles"),
+        "threshold_ms": float(get_setting("WINTER_PROFILE_THRESHOLD_MS", "1000")),
+        "keep": int(get_setting("WINTER_PROFILE_KEEP", "50")),
     }
-    print("No Streamlit secrets found.")
-    print(st.secrets)
-    raise e
-# Construir URL de conexión
-DATABASE_URL = f"postgresql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+
+
+def _snapshots_enabled() -> bool:
+    # Registro de cambios e instantáneas del worker de agregación (desactivado por defecto)
+    return _is_true(get_setting("WINTER_SNAPSHOTS", "0"))
+
+
+def _admin_users() -> set:
+    # Usuarios que ven el panel de depuración
+    return {name.strip() for name in str(get_setting("ADMIN_USERS", "")).split(",") if name.strip()}
+
+
+_LAZY_SETTINGS = {
+    "DB_CONFIG": _db_config,
+    "DATABASE_URL": _database_url,
+    "SSL_CONFIG": _ssl_config,
+    "DB_CONNECT_ARGS": _db_connect_args,
+    "DATABASE_READ_URL": _database_read_url,
+    "DB_READ_CONNECT_ARGS": _db_read_connect_args,
+    "SESSION_CONFIG": _session_config,
+    "METRICS_CONFIG": _metrics_config,
+    "PROFILER_CONFIG": _profiler_config,
+    "SNAPSHOTS_ENABLED": _snapshots_enabled,
+    "ADMIN_USERS": _admin_users,
+}
+
+
+def _resolve(name: str):
+    return getattr(sys.modules[__name__], name)
+
+
+def __getattr__(name: str):
+    if name in _LAZY_SETTINGS:
+        value = _LAZY_SETTINGS[name]()
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def reload_settings():
+    """
+    Forgets every resolved setting so the next access reads the sources again.
+    """
+    _secrets.cache_clear()
+    _dotenv.cache_clear()
+    for name in _LAZY_SETTINGS:
+        globals().pop(name, None)
+
+
+# Coste de bcrypt al guardar contraseñas
+BCRYPT_ROUNDS = 12
 
 # Configuración del Pool de Conexiones
 DB_POOL_CONFIG = {
@@ -38,9 +187,38 @@ DB_POOL_CONFIG = {
     "pool_recycle": 1800
 }
 
-# Configuración SSL
-SSL_CONFIG = {
-    "sslmode": "require"
+# Pool de la base de datos de lectura (DATABASE_READ_URL)
+DB_READ_POOL_CONFIG = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_timeout": 30,
+    "pool_recycle": 1800
+}
+
+# Consultas independientes de una página lanzadas en paralelo. El pool de hilos tiene tantos
+# hilos como conexiones admite el pool de lectura; cada ejecución usa como mucho max_per_run
+PREFETCH_CONFIG = {
+    "max_per_run": 4
+}
+
+# Segundos tras una escritura en los que las lecturas van al primario
+READ_YOUR_WRITES_SECONDS = 5
+
+# Configuración de la caché de consultas
+CACHE_CONFIG = {
+    "maxsize": 512,
+    "ttl": 300
+}
+
+# PRAGMAs aplicados a cada conexión SQLite (modo local de un solo nodo)
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "foreign_keys": "ON",
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+    "cache_size": -64000,
+    "mmap_size": 268435456
 }
 
 # Configuración de la Aplicación
@@ -50,9 +228,47 @@ APP_CONFIG = {
     "layout": "wide"
 }
 
+# Máximo de puntos por gráfico de peso (se reduce con medias diarias y LTTB)
+CHART_CONFIG = {
+    "weight_max_points": 500,
+    "group_weight_max_points": 2000
+}
+
+# Ventanas del gráfico de peso del grupo (días hacia atrás; None = todo)
+WEIGHT_PERIODS = {
+    "Todo": None,
+    "Último año": 365,
+    "Últimos 3 meses": 90,
+    "Último mes": 30
+}
+# Ventana inicial acotada: el historial completo ("Todo") solo se consulta si se elige
+DEFAULT_WEIGHT_PERIOD = "Últimos 3 meses"
+
+# Caché de figuras ya construidas, limitada por el tamaño total de su JSON
+FIGURE_CACHE_CONFIG = {
+    "max_bytes": 64 * 1024 * 1024
+}
+
+# Resultados precalculados por winter/scripts/aggregate.py (con WINTER_SNAPSHOTS=1)
+SNAPSHOT_CONFIG = {
+    "interval_seconds": 60,     # Pausa entre pasadas en modo --loop
+    "max_age_seconds": 600,     # Más antiguos se ignoran (el worker no está corriendo)
+    "refresh_seconds": 300      # Se recalculan aunque no haya cambios (menos que max_age_seconds)
+}
+
 POINTS_PER_ACTIVITY = {
     'physical_activity': 1,
     'diet_nutrition': 1,
     'rest_recovery': 1,
     'personal_development': 1
 }
+
+# Rangos mensuales: puntos mínimos del mes para alcanzar cada rango
+RANK_THRESHOLDS = {
+    'Estudiante': 0,
+    'Genin': 31,
+    'Chunin': 61,
+    'Jounin': 91,
+    'Sannin': 111,
+    'Hokage': 120
+}